@@ -0,0 +1,89 @@
+"""Benchmark batched activation against activating items one by one."""
+import time
+
+from argparse import ArgumentParser
+from itertools import chain
+from metameric import Scheduler
+from metameric.builder import Builder
+from metameric.prepare.weights import IA_WEIGHTS
+from metameric.run import read_input_file
+
+
+def build(items):
+    """Build the reference model."""
+    names = set(chain.from_iterable(IA_WEIGHTS))
+    rla = {k: 'global' for k in names}
+    rla['orthography'] = 'frequency'
+
+    return Builder(IA_WEIGHTS,
+                   rla,
+                   -.05,
+                   outputs=('orthography',),
+                   monitors=('orthography',),
+                   step_size=.5).build_model(items)
+
+
+def best_of(f, repeat=3):
+    """The shortest time of repeat calls to f."""
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        f()
+        times.append(time.time() - start)
+
+    return min(times)
+
+
+def report(items, n_items=200, max_cycles=350, batch_sizes=(8, 64)):
+    """Print the time it takes to activate items with each method."""
+    m = build(items)
+    X = items[:n_items]
+    kwargs = dict(max_cycles=max_cycles, strict=False, show_progressbar=False)
+    # Compile the kernels and the plan before timing.
+    list(m.activate(X[:5], **kwargs))
+
+    print("Items:\t\t\t\t{}".format(len(X)))
+    for record in ("full", "winner"):
+        t = best_of(lambda: list(m.activate(X, record=record, **kwargs)))
+        print("activate ({}):\t\t{:.3f} s".format(record, t))
+        for b in batch_sizes:
+            t = best_of(lambda: list(m.activate_batch(X,
+                                                      batch_size=b,
+                                                      record=record,
+                                                      **kwargs)))
+            print("activate_batch {} ({}):\t{:.3f} s".format(b, record, t))
+    t = best_of(lambda: m.reaction_times(X,
+                                         max_cycles=max_cycles,
+                                         show_progressbar=False))
+    print("reaction_times:\t\t\t{:.3f} s".format(t))
+    for b in batch_sizes:
+        scheduler = Scheduler(m, pool_size=b)
+        t = best_of(lambda: list(scheduler.run(X, **kwargs)))
+        print("Scheduler.run {} (winner):\t{:.3f} s".format(b, t))
+        t = best_of(lambda: scheduler.reaction_times(X,
+                                                     max_cycles=max_cycles,
+                                                     show_progressbar=False))
+        print("Scheduler.reaction_times {}:\t{:.3f} s".format(b, t))
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument("-i",
+                        "--input",
+                        default="example.csv",
+                        help="The reference lexicon.")
+    parser.add_argument("-n",
+                        "--n_items",
+                        default=200,
+                        type=int,
+                        help="The number of items to activate.")
+    parser.add_argument("--max_cycles",
+                        default=350,
+                        type=int,
+                        help="The maximum number of cycles")
+    args = parser.parse_args()
+
+    report(read_input_file(args.input),
+           n_items=args.n_items,
+           max_cycles=args.max_cycles)
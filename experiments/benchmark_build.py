@@ -0,0 +1,62 @@
+"""Benchmark building models for different lexicon sizes."""
+import numpy as np
+import string
+import time
+
+from itertools import chain
+from metameric.builder import Builder
+from metameric.prepare.weights import IA_WEIGHTS
+
+
+def make_items(n_words, length=4, n_features=14, seed=44):
+    """Create a random lexicon with letters and binary letter features."""
+    rng = np.random.RandomState(seed)
+    letters = list(string.ascii_lowercase)
+    codes = {x: rng.randint(0, 2, size=n_features) for x in letters}
+
+    words = set()
+    while len(words) < n_words:
+        words.add("".join(rng.choice(letters, size=length)))
+
+    items = []
+    for w in sorted(words):
+        features = []
+        for idx, c in enumerate(w):
+            features.extend([(str(x), idx) if v else ("{}_neg".format(x), idx)
+                             for x, v in enumerate(codes[c])])
+        items.append({"orthography": [w],
+                      "letters": [(c, idx) for idx, c in enumerate(w)],
+                      "letters-features": features,
+                      "frequency": rng.randint(1, 1000)})
+
+    return items
+
+
+def time_build(items, repeat=3):
+    """Time building a model on items."""
+    names = set(chain.from_iterable(IA_WEIGHTS))
+    rla = {k: 'global' for k in names}
+    rla['orthography'] = 'frequency'
+    builder = Builder(IA_WEIGHTS,
+                      rla,
+                      -.05,
+                      outputs=('orthography',),
+                      monitors=('orthography',),
+                      step_size=.5)
+
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        builder.build_model(items)
+        times.append(time.time() - start)
+
+    return min(times)
+
+
+if __name__ == "__main__":
+
+    print("words\tbuild (s)")
+    for n_words in [1000, 2500, 5000, 10000]:
+        items = make_items(n_words)
+        t = time_build(items)
+        print("{}\t{:.3f}".format(n_words, t))
@@ -0,0 +1,47 @@
+"""Benchmark the strength kernel for different lexicon sizes."""
+import numpy as np
+import timeit
+
+from metameric.core.metric import strength
+
+
+def time_strength(n_pre, n_post, n_active, repeat=20):
+    """Time a single call to strength with n_active active nodes."""
+    rng = np.random.RandomState(44)
+    mtr = rng.uniform(-.1, .1, size=(n_pre, n_post))
+    conn = np.zeros(n_pre) - .1
+    active = rng.choice(n_pre, n_active, replace=False)
+    conn[active] = rng.uniform(size=n_active)
+    activations = np.zeros(n_post)
+    resting = np.zeros(n_post) - .05
+
+    def kernel():
+        strength(np.zeros(n_post),
+                 activations,
+                 resting,
+                 [conn],
+                 [mtr],
+                 -.2,
+                 .07,
+                 1.0)
+
+    def dense():
+        np.maximum(conn, 0).dot(mtr)
+
+    k = timeit.timeit(kernel, number=repeat) / repeat
+    d = timeit.timeit(dense, number=repeat) / repeat
+    return k, d
+
+
+if __name__ == "__main__":
+
+    print("n_pre\tn_post\tactive\tstrength (ms)\tdense (ms)")
+    for n_pre in [2000, 10000, 40000]:
+        n_post = min(n_pre, 10000)
+        for n_active in [10, 50, 200, 1000]:
+            k, d = time_strength(n_pre, n_post, n_active)
+            print("{}\t{}\t{}\t{:.3f}\t\t{:.3f}".format(n_pre,
+                                                        n_post,
+                                                        n_active,
+                                                        k * 1000,
+                                                        d * 1000))
@@ -3,6 +3,7 @@ import random
 import pandas as pd
 
 from metameric.builder import Builder
+from metameric.core.cache import ResultCache
 from metameric.prepare.weights import IA_WEIGHTS
 from metameric.prepare.data import process_data
 from experiments.data import read_elp_format
@@ -49,6 +50,8 @@ if __name__ == "__main__":
     np.random.seed(44)
 
     n_cyc = 1000
+    # Reruns only simulate the items which were not simulated before.
+    cache = ResultCache("metameric_cache")
 
     for idx in tqdm(range(10)):
         w = deepcopy(sampler.sample(int(.75 * len(words))))
@@ -75,14 +78,13 @@ if __name__ == "__main__":
                     weight_adaptation=True)
 
         m = s.build_model(w)
-        result = m.activate(w,
-                            max_cycles=n_cyc,
-                            threshold=.7,
-                            strict=False)
-
-        cycles = np.array([len(x['orthography']) for x in result])
-        right = cycles == n_cyc
-        cycles[right] = -1
+        result = m.reaction_times(w,
+                                  max_cycles=n_cyc,
+                                  threshold=.7,
+                                  cache=cache)
+
+        cycles = result.cycles
+        cycles[result.timed_out] = -1
         for word, c in zip(w, cycles):
             results.append([word['orthography'][0],
                             idx,
@@ -65,11 +65,9 @@ if __name__ == "__main__":
                 weight_adaptation=True)
 
     m = s.build_model(w)
-    result = m.activate(w,
-                        max_cycles=n_cyc,
-                        threshold=.7,
-                        strict=False)
-
-    cycles = np.array([len(x['orthography']) for x in result])
-    right = cycles == n_cyc
-    cycles[right] = -1
+    result = m.reaction_times(w,
+                              max_cycles=n_cyc,
+                              threshold=.7)
+
+    cycles = result.cycles
+    cycles[result.timed_out] = -1
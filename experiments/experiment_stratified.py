@@ -3,6 +3,8 @@ import random
 import pandas as pd
 
 from metameric.builder import Builder
+from metameric.builder.builder import MetaMericError
+from metameric.core.cache import ResultCache
 from metameric.prepare.weights import IA_WEIGHTS
 from metameric.prepare.data import process_data
 from experiments.data import read_elp_format
@@ -12,6 +14,24 @@ from copy import deepcopy
 from binningsampler import BinnedSampler
 
 
+def prepare(words, negative_features, length_adaptation, space_character):
+    """Featurize words, and pad their orthography if space_character."""
+    words = process_data(words,
+                         decomposable=('orthography',),
+                         decomposable_names=('letters',),
+                         feature_layers=('letters',),
+                         feature_sets=('fourteen',),
+                         negative_features=negative_features,
+                         length_adaptation=length_adaptation)
+
+    m = max([len(x['orthography']) for x in words])
+    if space_character:
+        for w in words:
+            w['orthography'] = [x.ljust(m) for x in w['orthography']]
+
+    return words
+
+
 def accuracy(words, results, threshold=.7):
     """Compute accuracy."""
     score = []
@@ -57,6 +77,8 @@ if __name__ == "__main__":
     sampler = BinnedSampler(words, freqs)
     total = (2 ** 3) * 100
     n_cyc = 350
+    # Reruns only simulate the items which were not simulated before.
+    cache = ResultCache("metameric_cache")
 
     for idx, (le, ne, spa) in enumerate(product([True, False],
                                                 [True, False],
@@ -66,64 +88,61 @@ if __name__ == "__main__":
         negative_evidence = ne
         space_character = spa
 
+        inputs = ['features']
+        if negative_evidence:
+            inputs.append('features_neg')
+
+        weights = deepcopy(IA_WEIGHTS)
+        # Manually adapt weights to length 4
+        if not length_adaptation:
+            weights[("letters", "orthography")][0] /= 4
+            weights[("letters", "orthography")][1] *= 4
+            weights[("orthography", "letters")][0] /= 4
+            weights[("orthography", "letters")][1] *= 4
+
+        names = set(chain.from_iterable(weights))
+        rla = {k: 'global' for k in names}
+        rla['orthography'] = 'frequency'
+
+        def make_builder():
+            return Builder(weights,
+                           rla,
+                           -.05,
+                           outputs=('orthography',),
+                           monitors=('orthography',),
+                           step_size=.5,
+                           weight_adaptation=length_adaptation)
+
+        # Build a single network on all words, which is restricted to the
+        # words of each sample, instead of building a network per sample.
+        s = make_builder()
+        lexicon = prepare(deepcopy(list(words)), ne, spa, space_character)
+        full_model = s.build_model(lexicon)
+        position = {x['orthography']: i for i, x in enumerate(words)}
+
         np.random.seed(44)
 
         for idx_2 in tqdm(range(100)):
 
             print("{} of {}".format((idx * 100) + idx_2, total))
 
-            w = deepcopy(sampler.sample(num_to_sample))
-
-            logfreq = np.log10([x['frequency'] for x in w])
-            lengths = [len(x['orthography']) for x in w]
-            rt = np.array([x['rt'] for x in w])
-
-            w = process_data(w,
-                             decomposable=('orthography',),
-                             decomposable_names=('letters',),
-                             feature_layers=('letters',),
-                             feature_sets=('fourteen',),
-                             negative_features=ne,
-                             length_adaptation=spa)
-
-            m = max([len(x['orthography']) for x in w])
-            if space_character:
-                for w_ in w:
-                    w_['orthography'] = [x.ljust(m) for x in w_['orthography']]
-
-            inputs = ['features']
-            if negative_evidence:
-                inputs.append('features_neg')
-
-            weights = deepcopy(IA_WEIGHTS)
-            # Manually adapt weights to length 4
-            if not length_adaptation:
-                weights[("letters", "orthography")][0] /= 4
-                weights[("letters", "orthography")][1] *= 4
-                weights[("orthography", "letters")][0] /= 4
-                weights[("orthography", "letters")][1] *= 4
-
-            names = set(chain.from_iterable(weights))
-            rla = {k: 'global' for k in names}
-            rla['orthography'] = 'frequency'
-
-            s = Builder(weights,
-                        rla,
-                        -.05,
-                        outputs=('orthography',),
-                        monitors=('orthography',),
-                        step_size=.5,
-                        weight_adaptation=length_adaptation)
-
-            m = s.build_model(w)
-            result = m.activate(w,
-                                max_cycles=n_cyc,
-                                threshold=.7,
-                                strict=False)
-            cycles = np.array([len(x['orthography']) for x in result])
-            right = cycles == n_cyc
-            cycles[right] = -1
-            for x, word, c in zip(result, w, cycles):
+            sample = sampler.sample(num_to_sample)
+            try:
+                w = [lexicon[position[x['orthography']]] for x in sample]
+                m = s.restrict(full_model, w)
+            except MetaMericError:
+                # The sample is shorter than the longest word, and has
+                # fewer slots, so it needs its own network.
+                w = prepare(deepcopy(sample), ne, spa, space_character)
+                m = make_builder().build_model(w)
+
+            result = m.reaction_times(w,
+                                      max_cycles=n_cyc,
+                                      threshold=.7,
+                                      cache=cache)
+            cycles = result.cycles
+            cycles[result.timed_out] = -1
+            for word, c in zip(w, cycles):
                 results.append([word['orthography'],
                                 (idx * 100) + idx_2,
                                 word['rt'],
@@ -0,0 +1,77 @@
+"""Compare a single precision model against a double precision model."""
+import numpy as np
+import time
+
+from argparse import ArgumentParser
+from itertools import chain
+from metameric.builder import Builder
+from metameric.prepare.weights import IA_WEIGHTS
+from metameric.run import read_input_file
+
+
+def run(items, dtype, max_cycles, threshold):
+    """Build a model with a given dtype, and get the cycles for all items."""
+    names = set(chain.from_iterable(IA_WEIGHTS))
+    rla = {k: 'global' for k in names}
+    rla['orthography'] = 'frequency'
+
+    m = Builder(IA_WEIGHTS,
+                rla,
+                -.05,
+                outputs=('orthography',),
+                monitors=('orthography',),
+                step_size=.5,
+                dtype=dtype).build_model(items)
+
+    weights = [w for layer in m.layers.values() for w in layer.weights]
+    # Connections only store the structure of their weights.
+    dense = sum([np.prod(w.shape) * np.dtype(dtype).itemsize
+                 for w in weights])
+    actual = sum([w.nbytes for w in weights])
+    start = time.time()
+    result = m.reaction_times(items,
+                              max_cycles=max_cycles,
+                              threshold=threshold,
+                              show_progressbar=False)
+
+    return result.cycles, (dense, actual), time.time() - start
+
+
+def report(items, max_cycles=350, threshold=.7):
+    """Print a report comparing float32 and float64 cycle counts."""
+    c_64, mem_64, t_64 = run(items, np.float64, max_cycles, threshold)
+    c_32, mem_32, t_32 = run(items, np.float32, max_cycles, threshold)
+
+    diff = np.abs(c_64 - c_32)
+    timeout_64 = c_64 == max_cycles
+    timeout_32 = c_32 == max_cycles
+
+    print("Items:\t\t\t{}".format(len(items)))
+    for name, (dense, actual) in (("float64", mem_64), ("float32", mem_32)):
+        print("Weights {}:\t{:.1f} MB dense, {:.1f} MB "
+              "stored".format(name, dense / 2 ** 20, actual / 2 ** 20))
+    print("Time float64:\t\t{:.2f} s".format(t_64))
+    print("Time float32:\t\t{:.2f} s".format(t_32))
+    print("Identical cycles:\t{:.2%}".format(np.mean(diff == 0)))
+    print("Mean cycle difference:\t{:.4f}".format(diff.mean()))
+    print("Max cycle difference:\t{}".format(diff.max()))
+    print("Correlation:\t\t{:.6f}".format(np.corrcoef(c_64, c_32)[0, 1]))
+    print("Timeouts float64:\t{}".format(timeout_64.sum()))
+    print("Timeouts float32:\t{}".format(timeout_32.sum()))
+    print("Timeout mismatches:\t{}".format((timeout_64 != timeout_32).sum()))
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument("-i",
+                        "--input",
+                        default="example.csv",
+                        help="The reference lexicon.")
+    parser.add_argument("--max_cycles",
+                        default=350,
+                        type=int,
+                        help="The maximum number of cycles")
+    args = parser.parse_args()
+
+    report(read_input_file(args.input), max_cycles=args.max_cycles)
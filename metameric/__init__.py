@@ -1,5 +1,20 @@
 """metameric."""
-from .core import Network
+from .core import (Network,
+                   Scheduler,
+                   EncodedSet,
+                   ResultCache,
+                   UniformConnection,
+                   MaskConnection,
+                   SparseConnection,
+                   BlockDiagonalConnection)
 from .core.layer import Layer
 
-__all__ = ["Network", "Layer"]
+__all__ = ["Network",
+           "Layer",
+           "Scheduler",
+           "EncodedSet",
+           "ResultCache",
+           "UniformConnection",
+           "MaskConnection",
+           "SparseConnection",
+           "BlockDiagonalConnection"]
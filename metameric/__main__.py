@@ -1,4 +1,5 @@
 import argparse
+import numpy as np
 from metameric.run import make_run
 
 
@@ -7,9 +8,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Interactive Activation")
     parser.add_argument("-i",
                         "--input",
-                        required=True,
                         type=str,
-                        help="Path to the training file.")
+                        help="Path to the training file. Required, unless "
+                             "a saved model is passed.")
     parser.add_argument("-t",
                         "--test",
                         help="Path to the test file.")
@@ -71,13 +72,46 @@ if __name__ == "__main__":
                         action="store_const",
                         help="If this switch is passed, weight adaptation"
                              " is not performed")
+    parser.add_argument("--float32",
+                        const=np.float32,
+                        default=np.float64,
+                        action="store_const",
+                        help="If this switch is passed, the model is run "
+                             "in single precision, which halves the memory "
+                             "needed.")
+    parser.add_argument("--tolerance",
+                        type=float,
+                        help="If this is passed, items stop when the "
+                             "network reaches a steady state, in which "
+                             "activations change less than this value.")
+    parser.add_argument("--cache",
+                        type=str,
+                        help="A directory in which results are cached. If "
+                             "this is passed, items which were run before "
+                             "with the same model and parameters are not "
+                             "simulated again.")
+    parser.add_argument("--model",
+                        type=str,
+                        help="Path to a model saved with --save. If this is "
+                             "passed, the model is loaded instead of built, "
+                             "and the model parameters are ignored.")
+    parser.add_argument("--save",
+                        type=str,
+                        help="Path to which to save the model, so that it "
+                             "can be reused with --model.")
 
     args = parser.parse_args()
 
+    if args.input is None and args.model is None:
+        parser.error("Either --input or --model is required.")
+
     if args.test:
         test = args.test
     else:
         test = args.input
+    if test is None:
+        parser.error("A test file is required when running from a saved "
+                     "model.")
 
     make_run(args.input,
              test,
@@ -93,4 +127,9 @@ if __name__ == "__main__":
              args.max_cycles,
              args.decay,
              args.min,
-             args.W)
+             args.W,
+             args.float32,
+             args.tolerance,
+             args.cache,
+             args.model,
+             args.save)
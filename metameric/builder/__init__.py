@@ -1,4 +1,7 @@
 """Easily construct skeleton models."""
-from .builder import Builder, MatrixBuilder
+from .builder import (Builder,
+                      IncrementalBuilder,
+                      MatrixBuilder,
+                      parse_schema)
 
-__all__ = ["Builder", "MatrixBuilder"]
+__all__ = ["Builder", "IncrementalBuilder", "MatrixBuilder", "parse_schema"]
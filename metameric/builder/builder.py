@@ -1,7 +1,12 @@
 """Interface for building monomodels."""
 import numpy as np
 
-from ..core import Network
+from ..core import (Network,
+                    UniformConnection,
+                    MaskConnection,
+                    SparseConnection,
+                    BlockDiagonalConnection)
+from ..core.connection import NEGATIVE, POSITIVE
 from itertools import chain, product
 from collections import Counter, defaultdict
 
@@ -11,6 +16,92 @@ class MetaMericError(Exception):
     pass
 
 
+SCHEMA_KINDS = ("plain", "slot", "feature")
+
+
+def parse_schema(schema):
+    """
+    Parse a declared layer schema.
+
+    A schema declares, for each layer, which kind of values it has, so that
+    these do not have to be inferred from the items. The kind is either
+    "plain", for layers whose values are symbols, such as words, "slot",
+    for layers whose values are (symbol, slot index) tuples, such as
+    letters, or "feature", for slot layers which have more than one value
+    per slot, such as letter features. Slot and feature layers can also
+    declare their number of slots, as in "slot:4". Plain layers have no
+    slots, and can not declare a number of slots.
+
+    Parameters
+    ----------
+    schema : dict
+        A mapping from layer names to their kind. Each kind is either a
+        string, such as "plain" or "slot:4", or a (kind, number of slots)
+        tuple, where the number of slots can be None.
+
+    Returns
+    -------
+    schema : dict
+        A mapping from layer names to (kind, number of slots) tuples. The
+        number of slots is None if it was not declared.
+
+    """
+    parsed = {}
+    for k, v in schema.items():
+        if isinstance(v, str):
+            kind, _, num_slots = v.strip().partition(":")
+        else:
+            kind, num_slots = v
+        if kind not in SCHEMA_KINDS:
+            raise ValueError("The kind of {} should be one of {}, is now "
+                             "{}".format(k, SCHEMA_KINDS, kind))
+        if num_slots in ("", None):
+            num_slots = None
+        elif kind == "plain":
+            raise ValueError("{} is a plain layer, which has no slots, but "
+                             "declares {} slots".format(k, num_slots))
+        else:
+            num_slots = int(num_slots)
+        parsed[k] = (kind, num_slots)
+
+    return parsed
+
+
+def _pairs(key_a, idx_a, key_b, idx_b):
+    """
+    Get all pairs of a and b indices which have the same key.
+
+    Parameters
+    ----------
+    key_a : np.array
+        The key of each a index, e.g. the item it belongs to.
+    idx_a : np.array
+        The a indices.
+    key_b : np.array
+        The key of each b index.
+    idx_b : np.array
+        The b indices.
+
+    Returns
+    -------
+    rows : np.array
+        The a index of each pair.
+    cols : np.array
+        The b index of each pair.
+
+    """
+    order = np.argsort(key_b, kind="stable")
+    key_b = key_b[order]
+    idx_b = idx_b[order]
+    start = np.searchsorted(key_b, key_a, "left")
+    counts = np.searchsorted(key_b, key_a, "right") - start
+    rows = np.repeat(idx_a, counts)
+    # For every a index, take the run of b indices with the same key.
+    offsets = np.repeat(start + counts - np.cumsum(counts), counts)
+    cols = idx_b[np.arange(len(rows)) + offsets]
+    return rows, cols
+
+
 class Builder(object):
     """
     A factory class that builds networks.
@@ -47,6 +138,25 @@ class Builder(object):
         The step size by which to scale the activation.
     decay_rate : float
         The decay rate.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the network. Either np.float32 or
+        np.float64.
+    schema : dict, optional, default None
+        The declared kind of each layer, see parse_schema. If this is None,
+        the kinds are inferred from the items, which takes a pass over all
+        items for every layer.
+    parametric : bool, optional, default False
+        Whether to store every connection as a MaskConnection, which keeps
+        the structure of the connection apart from its positive and negative
+        weight. This allows the weights to be changed later using
+        Network.set_params. A mask takes one byte per weight, but is slower
+        to apply than a dense matrix.
+    sparse_density : float, optional, default .1
+        Connections between layers which are not both slot-based, in which
+        less than this fraction of the weights is positive, are stored as a
+        SparseConnection, which only stores the positions of the positive
+        weights. This is the case for the connections between letters and
+        words. Set this to 0 to store these connections as dense matrices.
 
     """
 
@@ -59,7 +169,11 @@ class Builder(object):
                  minimum=-.2,
                  step_size=1.0,
                  decay_rate=.07,
-                 weight_adaptation=True):
+                 weight_adaptation=True,
+                 dtype=np.float64,
+                 schema=None,
+                 parametric=False,
+                 sparse_density=.1):
         """Build a model out of a set of items."""
         self.layer_names = sorted(set(chain.from_iterable(weights.keys())))
         self.weights = weights
@@ -81,6 +195,10 @@ class Builder(object):
         self.step_size = step_size
         self.decay_rate = decay_rate
         self.weight_adaptation = weight_adaptation
+        self.dtype = dtype
+        self.schema = parse_schema(schema) if schema is not None else None
+        self.parametric = parametric
+        self.sparse_density = sparse_density
 
     def is_sequence(self, item):
         """Check whether a key is a sequence."""
@@ -96,20 +214,97 @@ class Builder(object):
         a, b = zip(*item)
         return any([x > 1 for x in Counter(b).values()])
 
+    def infer_layers(self, items):
+        """Infer the feature and slot layers from the items."""
+        for k in self.layer_names:
+            for i in items:
+                if self.is_feature(i[k]):
+                    self.feature_layers.add(k)
+                    break
+            for i in items:
+                if self.is_sequence(i[k]):
+                    self.slot_layers.add(k)
+                    break
+
+    def declare_layers(self):
+        """Set the feature and slot layers from the schema."""
+        missing = set(self.layer_names) - set(self.schema)
+        if missing:
+            raise MetaMericError("{} were not in the schema, which has "
+                                 "{}".format(sorted(missing),
+                                             sorted(self.schema)))
+        for k in self.layer_names:
+            kind, num_slots = self.schema[k]
+            if kind == "feature":
+                self.feature_layers.add(k)
+            if kind != "plain":
+                self.slot_layers.add(k)
+            if num_slots is not None:
+                self.num_slots[k] = num_slots
+
     def item_sequence(self, items, key):
         """Get items as a sequence."""
-        d = chain.from_iterable([i[key] for i in items])
+        d = set(chain.from_iterable([i[key] for i in items]))
         if key not in self.slot_layers:
             return sorted(d)
         else:
             d, idx = zip(*d)
             self.num_slots[key] = max(max(idx)+1, self.num_slots[key])
-            return sorted(d)
+            return sorted(set(d))
+
+    def entries(self, items, key):
+        """
+        Get the node indices of the values of all items for a key.
+
+        Parameters
+        ----------
+        items : list
+            A list of dicts.
+        key : str
+            The name of the layer.
 
-    def sum_over(self, items, key, field_to_sum):
-        """Sum over a field for a given key."""
+        Returns
+        -------
+        item_idx : np.array
+            The index of the item to which each value belongs.
+        node_idx : np.array
+            The index of each value in the unique items of the layer.
+        slot_idx : np.array or None
+            The slot of each value, if the layer is a slot layer.
+        neg : np.array or None
+            Whether each value is a negative feature, if the layer is a slot
+            layer.
+
+        """
+        u = self.unique_items[key]
+        values = [i[key] for i in items]
+        item_idx = np.repeat(np.arange(len(items)),
+                             [len(x) for x in values])
+        values = list(chain.from_iterable(values))
+        if key not in self.slot_layers:
+            node_idx = np.array([u[x] for x in values], dtype=np.intp)
+            return item_idx, node_idx, None, None
+
+        names = [x for x, _ in values]
+        node_idx = np.array([u[x] for x in names], dtype=np.intp)
+        slot_idx = np.array([y for _, y in values], dtype=np.intp)
+        neg = np.array([isinstance(x, str) and x.endswith("neg")
+                        for x in names], dtype=bool)
+        return item_idx, node_idx, slot_idx, neg
+
+    def sum_over(self, items, key, field_to_sum, sums=None):
+        """
+        Sum over a field for a given key.
+
+        If sums is passed, the sums of the items are added to it. sums can
+        be shorter than the number of unique items, in which case it is
+        padded with zeros.
+        """
         k_1 = self.unique_items[key]
-        sums = np.zeros(len(k_1))
+        if sums is None:
+            sums = np.zeros(len(k_1))
+        else:
+            sums = np.concatenate([sums, np.zeros(len(k_1) - len(sums))])
         for i in items:
             try:
                 f = i[field_to_sum]
@@ -134,6 +329,169 @@ class Builder(object):
             raise MetaMericError("{} were selected as layer names, but not "
                                  "present in your items".format(z))
 
+    def adapted_weights(self, a, b):
+        """
+        Get the positive and negative weight of the connection from a to b.
+
+        Returns None if the layers are not connected.
+        """
+        try:
+            pos, neg = self.weights[(a, b)]
+        except KeyError:
+            return None
+
+        # This prevents the creation of layers with all zero weights.
+        if not pos and not neg:
+            return None
+
+        num_slots = self.adaptation(a, b)
+        if num_slots is not None:
+            pos = pos / num_slots
+            neg = neg * num_slots
+
+        return pos, neg
+
+    def adaptation(self, a, b):
+        """
+        Get the number of slots the connection from a to b is adapted to.
+
+        Returns None if the weights are not adapted.
+        """
+        # Check whether the layers are slot-based layers.
+        a_slot = a in self.slot_layers
+        b_slot = b in self.slot_layers
+
+        f = a in self.feature_layers or b in self.feature_layers
+
+        # If one or both are slots, and none are feature layers, adapt
+        # the weights to the length of the longest input.
+        # Gets overridden by the weight adaptation switch.
+        if self.weight_adaptation and (a_slot or b_slot) and not f:
+            return max(self.num_slots.get(a, 1), self.num_slots.get(b, 1))
+        return None
+
+    def block_shape(self, a, b):
+        """
+        Get the shape of the matrix from a to b.
+
+        If both layers are slot layers, this is the shape of a single slot.
+        """
+        a_slot = a in self.slot_layers
+        b_slot = b in self.slot_layers
+
+        # Note all unique items and their number.
+        num_u_a = len(self.unique_items[a])
+        num_u_b = len(self.unique_items[b])
+
+        # Form the matrices.
+        if a_slot and not b_slot:
+            dim_a = num_u_a * self.num_slots.get(a, 1)
+        else:
+            dim_a = num_u_a
+        if not a_slot and b_slot:
+            dim_b = num_u_b * self.num_slots.get(b, 1)
+        else:
+            dim_b = num_u_b
+
+        return dim_a, dim_b
+
+    def positive_indices(self, entries_a, entries_b, a, b):
+        """
+        Get the indices of all positive connections from a to b.
+
+        Parameters
+        ----------
+        entries_a : tuple
+            The entries of layer a, as returned by entries.
+        entries_b : tuple
+            The entries of layer b, as returned by entries.
+        a : str
+            The name of the layer the connection comes from.
+        b : str
+            The name of the layer the connection goes to.
+
+        Returns
+        -------
+        rows : np.array
+            The row index of each positive connection.
+        cols : np.array
+            The column index of each positive connection. If both layers are
+            slot layers, the indices are those of a single slot.
+
+        """
+        u_a = self.unique_items[a]
+        u_b = self.unique_items[b]
+        item_a, idx_a, slot_a, neg_a = entries_a
+        item_b, idx_b, slot_b, neg_b = entries_b
+        if a in self.slot_layers and b in self.slot_layers:
+            # If both layers are slot layers, we can only link
+            # items with the same slot index together.
+            n = max(self.num_slots[a], self.num_slots[b])
+            rows, cols = _pairs(item_a * n + slot_a,
+                                idx_a,
+                                item_b * n + slot_b,
+                                idx_b)
+            rows, cols = [rows], [cols]
+
+            # Explicitly add the space character.
+            # and set its weights
+            if a not in self.feature_layers and neg_b.any():
+                cols.append(idx_b[neg_b])
+                rows.append(np.full(len(cols[-1]), u_a[" "], dtype=np.intp))
+
+            if b not in self.feature_layers and neg_a.any():
+                rows.append(idx_a[neg_a])
+                cols.append(np.full(len(rows[-1]), u_b[" "], dtype=np.intp))
+
+            return np.concatenate(rows), np.concatenate(cols)
+
+        if a in self.slot_layers:
+            idx_a = idx_a + (len(u_a) * slot_a)
+        if b in self.slot_layers:
+            idx_b = idx_b + (len(u_b) * slot_b)
+        return _pairs(item_a, idx_a, item_b, idx_b)
+
+    def is_uniform(self, a, b, rows, cols):
+        """
+        Check whether the connection from a to b is uniform.
+
+        This is the case for connections from a layer which is not slot-based
+        to itself, if every node is only positively connected to itself, such
+        as the lateral inhibition between words. These connections are
+        stored as a UniformConnection instead of a dense matrix.
+        """
+        if a != b or a in self.slot_layers:
+            return False
+        return bool(np.all(rows == cols))
+
+    def is_sparse(self, a, b, rows, cols):
+        """
+        Check whether the connection from a to b should be sparse.
+
+        This is the case if not both layers are slot-based, and less than
+        sparse_density of the weights are positive. These connections are
+        stored as a SparseConnection instead of a dense matrix.
+        """
+        if a in self.slot_layers and b in self.slot_layers:
+            return False
+        dim_a, dim_b = self.block_shape(a, b)
+        return len(rows) < self.sparse_density * dim_a * dim_b
+
+    def rla_profile(self, sums):
+        """
+        Turn the summed RLA variable of each node into an RLA profile.
+
+        The resting levels are the global RLA times the profile.
+        """
+        resting = np.log10(sums)
+        resting -= resting.min()
+        resting /= max(resting)
+        return 1.0 - resting
+
+    def variable_rla(self, sums):
+        """Turn the summed RLA variable of each node into resting levels."""
+        return self.global_rla * self.rla_profile(sums)
+
     def build_model(self, items):
         """
         Builds a network by iterating over all items and building layers.
@@ -168,21 +526,18 @@ class Builder(object):
         # Initialize the metameric.
         m = Network(minimum=self.minimum,
                     step_size=self.step_size,
-                    decay_rate=self.decay_rate)
+                    decay_rate=self.decay_rate,
+                    dtype=self.dtype)
+        m.global_rla = self.global_rla
 
         self.num_slots = defaultdict(int)
 
         self.feature_layers = set()
         self.slot_layers = set()
-        for k in self.layer_names:
-            for i in items:
-                if self.is_feature(i[k]):
-                    self.feature_layers.add(k)
-                    break
-            for i in items:
-                if self.is_sequence(i[k]):
-                    self.slot_layers.add(k)
-                    break
+        if self.schema is not None:
+            self.declare_layers()
+        else:
+            self.infer_layers(items)
 
         self.unique_items = {k: set(self.item_sequence(items, k))
                              for k in self.layer_names}
@@ -205,133 +560,403 @@ class Builder(object):
             # If the resting is denoted as "global", every
             # node has the same rla.
             if self.rla[k] == 'global':
-                resting = np.ones(len(self.unique_items[k])) * self.global_rla
+                profile = np.ones(len(self.unique_items[k]))
             else:
-                resting = self.sum_over(items, k, self.rla[k])
-                resting = np.log10(resting)
-                resting -= resting.min()
-                resting /= max(resting)
-                resting = self.global_rla * (1.0 - resting)
+                profile = self.rla_profile(self.sum_over(items,
+                                                         k,
+                                                         self.rla[k]))
 
             node_names, _ = zip(*sorted(self.unique_items[k].items(),
                                         key=lambda x: x[1]))
             if k in self.slot_layers:
-                resting = np.concatenate([resting] * self.num_slots[k])
+                profile = np.concatenate([profile] * self.num_slots[k])
                 n = []
                 for idx in range(self.num_slots[k]):
                     n.extend([(x, idx) for x in node_names])
                 node_names = n
 
             m.create_layer(k,
-                           resting,
+                           self.global_rla * profile,
                            node_names,
                            k in self.outputs,
                            k in self.monitors,
                            k in self.feature_layers)
+            m.rla_profile[k] = profile
+
+        # The node indices of the values of all items, for each layer.
+        entries = {}
 
         # a and b are keys.
         for a, b in product(self.layer_names, self.layer_names):
-            try:
-                pos, neg = self.weights[(a, b)]
-            except KeyError:
+            weights = self.adapted_weights(a, b)
+            if weights is None:
                 continue
+            pos, neg = weights
+            num_slots = self.adaptation(a, b)
+            if num_slots is not None:
+                m.adaptation[(a, b)] = num_slots
+
+            # Compute the indices of all positive connections at once.
+            for k in (a, b):
+                if k not in entries:
+                    entries[k] = self.entries(items, k)
+            rows, cols = self.positive_indices(entries[a], entries[b], a, b)
 
-            # This prevents the creation of layers with all zero weights.
-            if not pos and not neg:
+            # Connections in which all weights are the same, apart from the
+            # diagonal, are not stored as a matrix.
+            if self.is_uniform(a, b, rows, cols):
+                m.connect_layers(a,
+                                 b,
+                                 UniformConnection(self.block_shape(a, b),
+                                                   neg,
+                                                   pos,
+                                                   dtype=self.dtype))
                 continue
 
-            # Check whether the layers are slot-based layers.
-            a_slot = a in self.slot_layers
-            b_slot = b in self.slot_layers
-
-            f = a in self.feature_layers or b in self.feature_layers
-
-            # If one or both are slots, and none are feature layers, adapt
-            # the weights to the length of the longest input.
-            # Gets overridden by the weight adaptation switch.
-            if self.weight_adaptation and (a_slot or b_slot) and not f:
-                true_num_slots = max(self.num_slots.get(a, 1),
-                                     self.num_slots.get(b, 1))
-                pos = pos / true_num_slots
-                neg = neg * true_num_slots
-
-            # Note all unique items and their number.
-            u_a = self.unique_items[a]
-            u_b = self.unique_items[b]
-            num_u_a = len(u_a)
-            num_u_b = len(u_b)
-
-            # Form the matrices.
-            if a_slot and not b_slot:
-                dim_a = num_u_a * self.num_slots.get(a, 1)
-            else:
-                dim_a = num_u_a
-            if not a_slot and b_slot:
-                dim_b = num_u_b * self.num_slots.get(b, 1)
-            else:
-                dim_b = num_u_b
+            if self.is_sparse(a, b, rows, cols):
+                m.connect_layers(a,
+                                 b,
+                                 SparseConnection.from_indices(
+                                     self.block_shape(a, b),
+                                     rows,
+                                     cols,
+                                     pos,
+                                     neg,
+                                     dtype=self.dtype))
+                continue
 
             # Create the matrix.
-            mtr = np.zeros((dim_a,
-                            dim_b))
-
             # By default, connections are negative.
-            mtr = mtr + neg
-            # Iterate over items to set the weights
-            for i in items:
-                a_values = i[a]
-                b_values = i[b]
-                if a_slot and b_slot:
-                    # If both layers are slot layers, we can only link
-                    # items with the same slot index together.
-                    for ((x, i1), (y, i2)) in product(a_values, b_values):
-                        if i1 != i2:
-                            continue
-                        mtr[(u_a[x], u_b[y])] = pos
-
-                    # Explicitly add the space character.
-                    # and set its weights
-                    if a not in self.feature_layers:
-                        for x, y in b_values:
-                            if x.endswith("neg"):
-                                mtr[u_a[" "], u_b[x]] = pos
-
-                    if b not in self.feature_layers:
-                        for x, y in a_values:
-                            if x.endswith("neg"):
-                                mtr[u_a[x], u_b[" "]] = pos
-                else:
-                    if a_slot:
-                        idx_a = [u_a[x] + (num_u_a * y) for x, y in a_values]
-                    else:
-                        idx_a = [u_a[x] for x in a_values]
-                    if b_slot:
-                        idx_b = [u_b[x] + (num_u_b * y) for x, y in b_values]
-                    else:
-                        idx_b = [u_b[x] for x in b_values]
-                    mtr[np.ix_(idx_a, idx_b)] = pos
+            # A parametric connection stores codes instead of weights.
+            if self.parametric:
+                mtr = np.full(self.block_shape(a, b), NEGATIVE, dtype=np.uint8)
+                mtr[rows, cols] = POSITIVE
+            else:
+                mtr = np.full(self.block_shape(a, b), neg, dtype=self.dtype)
+                mtr[rows, cols] = pos
 
             # If both layers are slot-based, only items with the same slot
             # number can be connected.
             # So cells of unconnected items have to be explicitly set to 0.
             # if we don't do this, every item would have inhibitory connections
             # to other items in other slots.
-            if a_slot and b_slot:
+            # All slots share the same block, which is only stored once,
+            # unless the network is parametric.
+            if a in self.slot_layers and b in self.slot_layers:
                 x, y = mtr.shape
+                if not self.parametric:
+                    mtr = BlockDiagonalConnection(
+                        (x * self.num_slots[a], y * self.num_slots[b]),
+                        mtr,
+                        min(self.num_slots[a], self.num_slots[b]),
+                        dtype=self.dtype)
+                    m.connect_layers(a, b, mtr)
+                    continue
                 new_mtr = np.zeros((x * self.num_slots[a],
-                                    y * self.num_slots[b]))
+                                    y * self.num_slots[b]),
+                                   dtype=mtr.dtype)
                 for idx in range(self.num_slots[a]):
                     s_a, e_a = x * idx, x * (idx + 1)
                     s_b, e_b = y * idx, y * (idx + 1)
                     new_mtr[s_a:e_a, s_b:e_b] = mtr
                 mtr = new_mtr
 
+            if self.parametric:
+                mtr = MaskConnection(mtr, pos, neg, dtype=self.dtype)
             m.connect_layers(a, b, mtr)
 
         # Check whether the model is valid
         m.check()
         return m
 
+    def restrict(self, network, items):
+        """
+        Restrict a network to the nodes of a subset of its items.
+
+        This masks out all nodes which a network built on the subset would
+        not have, and recomputes the variable RLA of the remaining nodes
+        over the subset, using Network.set_mask. The restricted network
+        gives the same results as a network built on the subset with
+        build_model, without building it. This makes it cheap to run many
+        resampled lexicons which are drawn from the same set of items.
+
+        The subset has to have the same number of slots in every slot layer
+        as the network, because the number of slots determines the weights
+        of the slot layers.
+
+        Parameters
+        ----------
+        network : Network
+            The network to restrict. This has to be the last network built
+            by this builder.
+        items : list or None
+            A subset of the items the network was built with. If this is
+            None, the mask is removed, and the network uses all its nodes
+            again.
+
+        Returns
+        -------
+        instance : Network
+            The network, with its mask set.
+
+        """
+        if items is None:
+            network.set_mask(None)
+            return network
+        items = list(items)
+        self._check(items, self.layer_names)
+
+        mask = {}
+        profiles = {}
+        for k in self.layer_names:
+            u = self.unique_items[k]
+            values = set(chain.from_iterable([i[k] for i in items]))
+            num_slots = 1
+            if k in self.slot_layers:
+                names, slots = zip(*values) if values else ((), ())
+                num_slots = max(slots, default=-1) + 1
+                if self.schema is not None and self.schema[k][1]:
+                    num_slots = max(num_slots, self.schema[k][1])
+                if num_slots != self.num_slots[k]:
+                    raise MetaMericError("The subset has {} slots in {}, but "
+                                         "the network has {}. Build the "
+                                         "network on the subset "
+                                         "instead.".format(num_slots,
+                                                           k,
+                                                           self.num_slots[k]))
+                values = set(names)
+                if k not in self.feature_layers:
+                    values.add(" ")
+            try:
+                idx = np.array(sorted(u[x] for x in values), dtype=np.intp)
+            except KeyError:
+                raise MetaMericError("The subset has nodes in {} which are "
+                                     "not in the network.".format(k))
+            keep = np.zeros(len(u), dtype=bool)
+            keep[idx] = True
+            if len(keep) * num_slots != len(network.layers[k].resting):
+                raise ValueError("{} does not belong to the last network "
+                                 "built by this builder.".format(k))
+            mask[k] = np.tile(keep, num_slots)
+
+            if self.rla[k] != "global":
+                sums = self.sum_over(items, k, self.rla[k])
+                profile = np.ones(len(u))
+                profile[idx] = self.rla_profile(sums[idx])
+                profiles[k] = np.tile(profile, num_slots)
+
+        network.set_mask(mask, profiles)
+        return network
+
+
+class IncrementalBuilder(Builder):
+    """
+    A builder which can add items to the networks it builds.
+
+    The parameters are the same as those of the Builder. After building a
+    network with build_model, new items can be added to it with add_items,
+    which grows the layers and weight matrices of the network in place,
+    instead of building the network again.
+
+    Weight matrices are stored in buffers which are larger than the
+    matrices themselves, and the network uses views into these buffers.
+    Whenever a buffer is too small, its capacity is doubled, so that adding
+    items one at a time has an amortized cost which only depends on the
+    number of nodes the new items are connected to.
+
+    Uniform connections are replaced by a larger UniformConnection, as long
+    as the new items keep them uniform. Otherwise, they are turned into a
+    dense buffer. For parametric networks, the buffers hold the masks of
+    the connections, and the current weights of the network are kept.
+    Connections are never stored as a SparseConnection, because these can
+    not grow in place.
+
+    New nodes are appended to their layers, so the node order differs from
+    that of a network built on all items at once. Apart from the order, the
+    weights and resting levels are identical.
+    Items can only add nodes to layers which are not slot-based. If new
+    items contain new symbols in a slot layer, or are longer than all
+    previous items, the network has to be built again, because all weights
+    of the slot layer change.
+    """
+
+    def build_model(self, items):
+        """
+        Builds a network by iterating over all items and building layers.
+
+        Parameters
+        ----------
+        items : list
+            A list of dicts, where each dictionary has all the layers of the
+            model as keys.
+
+        Returns
+        -------
+        instance : Network
+            An initialized network.
+
+        """
+        m = super(IncrementalBuilder, self).build_model(items)
+        self.network = m
+        # The summed RLA variable of each node in variable RLA layers.
+        self.sums = {k: self.sum_over(items, k, v)
+                     for k, v in self.rla.items()
+                     if v != "global" and k in self.layer_names}
+        self.buffers = {}
+        for k, layer in m.layers.items():
+            for src, mtr in zip(layer._from_connections, layer.weights):
+                if isinstance(mtr, MaskConnection):
+                    mtr = mtr.mask
+                self.buffers[(src.name, k)] = mtr
+
+        return m
+
+    def is_sparse(self, a, b, rows, cols):
+        """Sparse connections can not grow, so they are never used."""
+        return False
+
+    def add_items(self, network, new_items):
+        """
+        Add items to a network which was built by this builder.
+
+        Parameters
+        ----------
+        network : Network
+            The network to add the items to. This has to be the last network
+            built by this builder.
+        new_items : list
+            A list of dicts, with the same keys as the items the network
+            was built with.
+
+        Returns
+        -------
+        instance : Network
+            The network, with the new items added.
+
+        """
+        if network is not getattr(self, "network", None):
+            raise ValueError("Items can only be added to the last network "
+                             "that was built by this builder.")
+        if network.node_mask is not None:
+            raise ValueError("Items can not be added to a masked network. "
+                             "Remove the mask using set_mask(None) first.")
+        new_items = list(new_items)
+        self._check(new_items, self.layer_names)
+
+        for k in self.slot_layers:
+            values = set(chain.from_iterable([i[k] for i in new_items]))
+            if not values:
+                continue
+            names, slots = zip(*values)
+            diff = set(names) - set(self.unique_items[k])
+            if diff or max(slots) >= self.num_slots[k]:
+                raise MetaMericError("The new items have symbols or slots in "
+                                     "{}, which is a slot layer, that are not "
+                                     "in the network. Build the network "
+                                     "again instead.".format(k))
+
+        # Append the new nodes to all other layers.
+        for k in self.layer_names:
+            if k in self.slot_layers:
+                continue
+            u = self.unique_items[k]
+            values = set(chain.from_iterable([i[k] for i in new_items]))
+            new_nodes = sorted(values - set(u))
+            for x in new_nodes:
+                u[x] = len(u)
+
+            layer = network.layers[k]
+            if self.rla[k] == 'global':
+                profile = np.concatenate([network.rla_profile[k],
+                                          np.ones(len(new_nodes))])
+            else:
+                # The normalization of the RLA variable can change, so all
+                # resting levels are updated.
+                self.sums[k] = self.sum_over(new_items,
+                                             k,
+                                             self.rla[k],
+                                             self.sums[k])
+                profile = self.rla_profile(self.sums[k])
+            # The global RLA of the network can differ from that of the
+            # builder, if it was changed with set_params.
+            resting = network.global_rla * profile
+            layer.add_nodes(resting[len(layer.resting):], new_nodes)
+            layer.resting[:] = resting
+            network.rla_profile[k] = profile
+
+        entries = {k: self.entries(new_items, k) for k in self.layer_names}
+        for (a, b), buf in self.buffers.items():
+            rows, cols = self.positive_indices(entries[a], entries[b], a, b)
+            layer = network.layers[b]
+            idx = layer._from_connections.index(network.layers[a])
+
+            # Keep the current weights of connections which can change them.
+            mtr = layer.weights[idx]
+            if isinstance(mtr, MaskConnection):
+                pos, neg = mtr.pos, mtr.neg
+            elif isinstance(mtr, UniformConnection):
+                pos, neg = mtr.diagonal, mtr.value
+            else:
+                pos, neg = self.adapted_weights(a, b)
+            parametric = isinstance(mtr, MaskConnection) or (
+                self.parametric and isinstance(mtr, UniformConnection))
+            if parametric:
+                fill_pos, fill_neg = POSITIVE, NEGATIVE
+            else:
+                fill_pos, fill_neg = pos, neg
+
+            if a in self.slot_layers and b in self.slot_layers:
+                # Slot layers do not grow, so only the new positive
+                # connections are set, in every slot.
+                if isinstance(buf, BlockDiagonalConnection):
+                    buf.blocks[..., rows, cols] = fill_pos
+                    continue
+                x, y = self.block_shape(a, b)
+                for slot in range(self.num_slots[a]):
+                    buf[rows + x * slot, cols + y * slot] = fill_pos
+                continue
+
+            n_a, n_b = mtr.shape
+            dim_a, dim_b = self.block_shape(a, b)
+            if isinstance(buf, UniformConnection):
+                if self.is_uniform(a, b, rows, cols):
+                    buf = self.buffers[(a, b)] = UniformConnection(
+                        (dim_a, dim_b), neg, pos, dtype=self.dtype)
+                    layer.weights[idx] = buf
+                    continue
+                if parametric:
+                    buf = np.full(buf.shape, NEGATIVE, dtype=np.uint8)
+                    np.fill_diagonal(buf, POSITIVE)
+                else:
+                    buf = buf.toarray()
+                self.buffers[(a, b)] = buf
+            if dim_a > buf.shape[0] or dim_b > buf.shape[1]:
+                cap_a, cap_b = buf.shape
+                if dim_a > cap_a:
+                    cap_a = max(dim_a, 2 * cap_a)
+                if dim_b > cap_b:
+                    cap_b = max(dim_b, 2 * cap_b)
+                new_buf = np.empty((cap_a, cap_b), dtype=buf.dtype)
+                new_buf[:n_a, :n_b] = buf[:n_a, :n_b]
+                buf = self.buffers[(a, b)] = new_buf
+
+            # By default, connections are negative.
+            buf[n_a:dim_a, :dim_b] = fill_neg
+            buf[:n_a, n_b:dim_b] = fill_neg
+            buf[rows, cols] = fill_pos
+            if parametric:
+                layer.weights[idx] = MaskConnection(buf[:dim_a, :dim_b],
+                                                    pos,
+                                                    neg,
+                                                    dtype=self.dtype)
+            else:
+                layer.weights[idx] = buf[:dim_a, :dim_b]
+
+        # The layers have changed size, so the network has to be compiled
+        # again.
+        network.invalidate()
+        return network
+
 
 class MatrixBuilder(object):
     """A builder that uses matrices to connect items to each other."""
@@ -344,7 +969,8 @@ class MatrixBuilder(object):
                  minimum=-.2,
                  step_size=1.0,
                  decay_rate=.07,
-                 weight_adaptation=True):
+                 weight_adaptation=True,
+                 dtype=np.float64):
         """Build a model out of a set of items."""
         self.layer_names = sorted(set(chain(*weights.keys())))
         self.weights = weights
@@ -366,6 +992,7 @@ class MatrixBuilder(object):
         self.step_size = step_size
         self.decay_rate = decay_rate
         self.weight_adaptation = weight_adaptation
+        self.dtype = dtype
 
     def build_model(self, matrices):
         """
@@ -398,7 +1025,8 @@ class MatrixBuilder(object):
         # Initialize the metameric.
         m = Network(minimum=self.minimum,
                     step_size=self.step_size,
-                    decay_rate=self.decay_rate)
+                    decay_rate=self.decay_rate,
+                    dtype=self.dtype)
 
         for (a, b), mtr in matrices.items():
             if a not in m.layers:
@@ -426,7 +1054,7 @@ class MatrixBuilder(object):
                                b in self.monitors)
 
         for (src, dest), mtr in matrices.items():
-            mtr = np.copy(mtr)
+            mtr = np.array(mtr, dtype=self.dtype)
             pos, neg = self.weights[(src, dest)]
             m.connect_layers(src, dest, mtr)
 
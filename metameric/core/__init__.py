@@ -1,5 +1,20 @@
 """Core stuff."""
 from .network import Network
 from .layer import Layer
+from .scheduler import Scheduler
+from .encoding import EncodedSet
+from .cache import ResultCache
+from .connection import (UniformConnection,
+                         MaskConnection,
+                         SparseConnection,
+                         BlockDiagonalConnection)
 
-__all__ = ["Layer", "Network"]
+__all__ = ["Layer",
+           "Network",
+           "Scheduler",
+           "EncodedSet",
+           "ResultCache",
+           "UniformConnection",
+           "MaskConnection",
+           "SparseConnection",
+           "BlockDiagonalConnection"]
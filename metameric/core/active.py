@@ -0,0 +1,408 @@
+"""Simulation of large layers which only updates their active nodes."""
+import numpy as np
+
+from .connection import SparseConnection, UniformConnection
+from .metric import update
+from .plan import ExecutionPlan
+
+
+class ActiveSetPlan(ExecutionPlan):
+    """
+    An execution plan which only updates the active nodes of some layers.
+
+    In a large layer, such as a layer of words, most nodes never receive
+    input which differs from that of the other nodes in the layer. Through
+    a SparseConnection, all nodes receive the same negative input, apart
+    from the nodes which are positively connected to an active node. Through
+    a UniformConnection, all nodes receive the same input, apart from the
+    nodes which are active themselves. All other nodes share the same net
+    input, which is called the background input.
+
+    The nodes which have only ever received the background input are the
+    background nodes. Their activation is an affine function of their
+    resting level, K * resting + R, in which K and R are the same for all
+    background nodes. A cycle therefore updates all background nodes at
+    once by updating K and R, and only the other nodes, the active set, are
+    updated one by one. Nodes join the active set as soon as their input
+    differs from the background input, and stay in it until the end of the
+    item. The active set is computed with the same operations, in the same
+    order, as the full network, so that active nodes are exact, apart from
+    the rounding error of their activation at the moment they joined.
+
+    This rounding error is bounded per item, to first order: every cycle
+    adds the rounding error of a single update of a background node, and
+    scales the error so far by the factor of the update. The largest bound
+    of all items is available as error.
+
+    If the background activation could become positive, and send output,
+    or reach the minimum activation, all nodes join the active set, so that
+    the item continues as in the full network.
+
+    The active set only pays off if it is a small part of a very large
+    layer. Every letter in a slot excites all words with that letter in
+    that slot, so that in a lexicon of random five letter words, about a
+    fifth of all words are active. In such a lexicon, the active set is
+    slower than the full network up to about 20000 words, and faster
+    beyond that.
+
+    The plan only differs from an ExecutionPlan between begin and end,
+    which are called by Network.reaction_times. Between these calls, the
+    activations of background nodes in the state are out of date, but
+    never positive, so that they send the same output as their real
+    activation.
+
+    Parameters
+    ----------
+    network : Network
+        The network to compile.
+    layers : tuple of str
+        The names of the layers to simulate with an active set. All
+        connections to these layers have to be a SparseConnection or a
+        UniformConnection.
+
+    Attributes
+    ----------
+    error : float
+        The largest bound on the absolute error of the activation of any
+        node, over all items since the plan was compiled or reset_error was
+        called.
+
+    """
+
+    def __init__(self, network, layers):
+        """Init function."""
+        super(ActiveSetPlan, self).__init__(network)
+        if isinstance(layers, str):
+            layers = (layers,)
+        self.layers = tuple(layers)
+        if network.node_mask is not None:
+            raise ValueError("Masked networks can not be simulated with an "
+                             "active set.")
+        state = self.state
+        dtype = state.activations.dtype
+
+        self._active_layers = []
+        blocks = self.operator.blocks
+        in_active = set()
+        for k in self.layers:
+            if k not in network.layers:
+                raise ValueError("{} is not a layer of the network".format(k))
+            if network.layers[k].static:
+                raise ValueError("{} is a static layer, and can not be "
+                                 "simulated with an active set.".format(k))
+            sl = state.slices[k]
+            incoming = []
+            for idx, (src, dest, mtr) in enumerate(blocks):
+                if dest != sl:
+                    continue
+                if not isinstance(mtr, (SparseConnection,
+                                        UniformConnection)):
+                    raise ValueError("All connections to {} should be a "
+                                     "SparseConnection or a "
+                                     "UniformConnection, but the connection "
+                                     "from block {} is a "
+                                     "{}".format(k, idx, type(mtr).__name__))
+                in_active.add(idx)
+                src_name = [x for x, y in state.slices.items() if y == src][0]
+                incoming.append((src_name, state.activations[src], mtr))
+            self._active_layers.append(_ActiveLayer(k,
+                                                    state.activations[sl],
+                                                    state.resting[sl],
+                                                    state.ext_input[sl],
+                                                    incoming,
+                                                    dtype))
+        self._by_name = {x.name: x for x in self._active_layers}
+
+        # The blocks, and the dynamic layers, which are updated as usual.
+        self._in_active = in_active
+        self._other_bound = [x for idx, x in enumerate(self._bound)
+                             if idx not in in_active]
+        self._other_folded = []
+        self._other_slices = [sl for k, sl in sorted(state.slices.items(),
+                                                     key=lambda x:
+                                                     x[1].start)
+                              if sl.start >= state.n_static and
+                              k not in self._by_name]
+        self._other_monitors = [state.activations[state.slices[k]]
+                                for k in network.monitors
+                                if k not in self._by_name]
+        self._active_monitors = [self._by_name[k] for k in network.monitors
+                                 if k in self._by_name]
+        self._running = False
+        self.error = 0.0
+
+    def _fold(self):
+        """Compute the constant input of the static layers."""
+        super(ActiveSetPlan, self)._fold()
+        self._other_folded = [x for idx, x in zip(self._folded_blocks,
+                                                  self._folded_bound)
+                              if idx not in self._in_active]
+
+    def reset_error(self):
+        """Reset the error bound."""
+        self.error = 0.0
+
+    def begin(self):
+        """
+        Start simulating an item with active sets.
+
+        All nodes which are not at their resting level, or which receive
+        external input, start in the active set.
+        """
+        for layer in self._active_layers:
+            layer.begin(self.network.minimum)
+        self._running = True
+
+    def end(self):
+        """Stop simulating with active sets, and update the background."""
+        if not self._running:
+            return
+        for layer in self._active_layers:
+            self.error = max(self.error, layer.end())
+        self._running = False
+
+    def step(self, track=False):
+        """
+        Perform a single synchronous cycle.
+
+        Parameters
+        ----------
+        track : bool, optional, default False
+            Whether to keep the activations from before the cycle. This is
+            not supported while simulating with active sets.
+
+        """
+        if not self._running:
+            return super(ActiveSetPlan, self).step(track)
+        if track:
+            raise ValueError("Steady states can not be tracked while "
+                             "simulating with active sets.")
+
+        network = self.network
+        state = self.state
+        check = bool(self._static) and not self._folded
+        n_static = state.n_static
+
+        if check:
+            self._static_previous[:] = self._static_activations
+        state.net[:n_static] = state.ext_input[:n_static]
+        self._static_net *= network.step_size
+        for sl in self._other_slices:
+            state.net[sl] = state.ext_input[sl]
+        self.operator.apply(self._other_folded if self._folded
+                            else self._other_bound)
+        # The net input of all active layers is computed before any of them
+        # is updated, as in a synchronous cycle.
+        for layer in self._active_layers:
+            layer.net_input(self._by_name)
+
+        for sl in self._other_slices:
+            update(state.net[sl],
+                   state.activations[sl],
+                   state.resting[sl],
+                   network.minimum,
+                   network.decay_rate,
+                   network.step_size)
+        for sl in [slice(0, n_static)] + self._other_slices:
+            x = state.activations[sl]
+            x += state.net[sl]
+            np.clip(x, network.minimum, 1.0, out=x)
+        for layer in self._active_layers:
+            layer.update(network.minimum,
+                         network.decay_rate,
+                         network.step_size)
+
+        if check and self._static_unchanged():
+            self._fold()
+
+    def converged(self, threshold):
+        """Check whether all monitor layers have crossed the threshold."""
+        if not self._running:
+            return super(ActiveSetPlan, self).converged(threshold)
+        if not self._monitors:
+            return False
+        for x in self._other_monitors:
+            if not x.max() > threshold:
+                return False
+        for layer in self._active_monitors:
+            if not layer.any_above(threshold, self.network.minimum):
+                return False
+        return True
+
+
+class _ActiveLayer(object):
+    """
+    The active set and background trajectory of a single layer.
+
+    The net input, activations, resting levels and external input of the
+    active nodes are kept in compact arrays, which are only rebuilt when
+    nodes join the active set.
+    """
+
+    def __init__(self, name, activations, resting, ext_input, incoming, dtype):
+        """Init function."""
+        self.name = name
+        self.activations = activations
+        self.resting = resting
+        self.ext_input = ext_input
+        self.incoming = incoming
+        self.dtype = np.dtype(dtype)
+        self.eps = np.finfo(self.dtype).eps
+        self.is_active = np.zeros(len(activations), dtype=bool)
+        self.active = np.zeros(0, dtype=np.intp)
+        self.background_net = self.dtype.type(0)
+
+    def begin(self, minimum):
+        """Start a new item, with all nodes at rest in the background."""
+        self.minimum = minimum
+        self.is_active[:] = (self.activations != self.resting)
+        self.is_active |= self.ext_input != 0
+        # The activation of background nodes is K * resting + R.
+        self.K = 1.0
+        self.R = 0.0
+        self.error = 0.0
+        self._scatter = {}
+        self._compact()
+        self._check_background()
+
+    def end(self):
+        """Write the activation of all background nodes, and get the error."""
+        background = np.flatnonzero(~self.is_active)
+        self.activations[background] = self.background(background)
+        return self.error + self.eps
+
+    def background(self, idx):
+        """Get the activation of background nodes."""
+        return (self.K * self.resting[idx] + self.R).astype(self.dtype)
+
+    def _compact(self):
+        """Rebuild the compact arrays of the active set."""
+        active = np.flatnonzero(self.is_active)
+        self.active = active
+        self.a = self.activations[active]
+        self.r = self.resting[active]
+        self.e = self.ext_input[active]
+        self._scatter.clear()
+        rest = self.resting[~self.is_active]
+        if len(rest):
+            self.lo, self.hi = rest.min(), rest.max()
+        else:
+            self.lo = self.hi = None
+
+    def _bounds(self):
+        """The lowest and highest activation of the background nodes."""
+        ends = [self.K * self.lo + self.R, self.K * self.hi + self.R]
+        return min(ends), max(ends)
+
+    def _check_background(self):
+        """Activate all nodes if the background nodes could send output."""
+        if self.lo is None:
+            return
+        lo, hi = self._bounds()
+        if hi > 0 or lo < self.minimum:
+            self.join(np.flatnonzero(~self.is_active))
+
+    def join(self, idx):
+        """Move background nodes into the active set."""
+        idx = idx[~self.is_active[idx]]
+        if not len(idx):
+            return
+        self.activations[idx] = self.background(idx)
+        self.is_active[idx] = True
+        self._compact()
+
+    def _positive(self, name, c, layers):
+        """Get the indices of the positive nodes of a presynaptic layer."""
+        if name in layers:
+            layer = layers[name]
+            return layer.active[layer.a > 0]
+        return np.flatnonzero(c > 0)
+
+    def _positions(self, key, rows, mtr):
+        """Get the positions in the active set a sparse block scatters to."""
+        cached = self._scatter.get(key)
+        if cached is not None and np.array_equal(cached[0], rows):
+            return cached[1], cached[2]
+        starts = mtr.indptr[rows]
+        counts = mtr.indptr[rows + 1] - starts
+        cols = mtr.indices[np.repeat(starts - np.cumsum(counts) + counts,
+                                     counts) + np.arange(counts.sum())]
+        self.join(cols)
+        positions = np.searchsorted(self.active, cols)
+        self._scatter[key] = (rows, positions, counts)
+        return positions, counts
+
+    def net_input(self, layers):
+        """Compute the net input of the active nodes and the background."""
+        t = self.dtype.type
+        # All nodes which receive input which differs from the background
+        # join first. Until then, their net input is the background input,
+        # so that this does not change the result.
+        inputs = []
+        for key, (name, c, mtr) in enumerate(self.incoming):
+            rows = self._positive(name, c, layers)
+            if not len(rows):
+                continue
+            if isinstance(mtr, SparseConnection):
+                self._positions(key, rows, mtr)
+            elif mtr.diagonal != mtr.value:
+                self.join(rows[rows < min(mtr.shape)])
+            inputs.append((key, rows, c, mtr))
+
+        n = self.e.copy()
+        self.background_net = t(0)
+        for key, rows, c, mtr in inputs:
+            values = c[rows]
+            # Sums are sequential, as in the kernels.
+            total = np.cumsum(values)[-1]
+            if isinstance(mtr, SparseConnection):
+                positions, counts = self._positions(key, rows, mtr)
+                delta = t(mtr.pos) - t(mtr.neg)
+                np.add.at(n, positions, np.repeat(delta * values, counts))
+                if mtr.neg != 0:
+                    n += t(mtr.neg) * total
+                    self.background_net += t(mtr.neg) * total
+            else:
+                n += t(mtr.value) * total
+                self.background_net += t(mtr.value) * total
+                diagonal = rows[rows < min(mtr.shape)]
+                if len(diagonal):
+                    positions = np.searchsorted(self.active, diagonal)
+                    n[positions] += ((t(mtr.diagonal) - t(mtr.value)) *
+                                     c[diagonal])
+        self.n = n
+
+    def update(self, minimum, decay, step_size):
+        """Update the active nodes and the background trajectory."""
+        n, a = self.n, self.a
+        update(n, a, self.r, minimum, decay, step_size)
+        a += n
+        np.clip(a, minimum, 1.0, out=a)
+        self.activations[self.active] = a
+
+        if self.lo is None:
+            return
+        # The update of a background node is affine in its activation and
+        # resting level.
+        n = float(self.background_net)
+        if n > 0:
+            factor = 1.0 - step_size * (n + decay)
+            offset = step_size * n
+        else:
+            factor = 1.0 + step_size * (n - decay)
+            offset = -step_size * n * minimum
+        self.K = factor * self.K + step_size * decay
+        self.R = factor * self.R + offset
+        # Every update rounds a handful of terms which are at most 2 + 2|n|.
+        self.error = (abs(factor) * self.error +
+                      self.eps * (4.0 + 6.0 * abs(n)))
+        self._check_background()
+
+    def any_above(self, threshold, minimum):
+        """Check whether any node is above the threshold."""
+        if (self.a > threshold).any():
+            return True
+        if self.lo is None:
+            return False
+        _, hi = self._bounds()
+        return hi > threshold
@@ -0,0 +1,269 @@
+"""Simultaneous simulation of multiple items."""
+import copy
+import numpy as np
+
+from .metric import propagate_batch, update_batch
+
+
+class BatchState(object):
+    """
+    The state of a number of simulations which are run side by side.
+
+    The state has the same flat layout as the ExecutionPlan of the network,
+    with one row per slot: the activations, external input and net input of
+    all slots are preallocated B * N matrices, where B is the number of
+    slots and N the number of nodes in the network. A cycle applies every
+    block of the plan to all rows in a single kernel call, which processes
+    the rows one after another with the same kernels as a single item, so
+    that every slot gets exactly the same result as Network.activate. The
+    number of calls per cycle is therefore the same as for a single item,
+    and does not depend on the number of slots.
+
+    Rows can be loaded and retired independently. Only the rows up to the
+    last live slot are updated, and free slots are filled from the front,
+    so that a batch which is not full only pays for the rows in use.
+
+    Every slot has its own copy of the recorder, which is started once, and
+    reset whenever a new item is loaded into the slot. Without a recorder,
+    nothing is recorded, and the state of a slot can be read before it is
+    retired.
+
+    Parameters
+    ----------
+    network : Network
+        The network to simulate.
+    size : int
+        The number of slots in the batch.
+    recorder : Recorder or None
+        The recorder to copy for each slot.
+    max_cycles : int
+        The maximum number of cycles an item can run for.
+
+    Attributes
+    ----------
+    activations : np.array
+        The B * N activations of all slots.
+    ext_input : np.array
+        The B * N external input of all slots.
+    cycles : np.array
+        The number of cycles each slot has been running for.
+    live : np.array
+        A boolean mask which denotes which slots are currently running.
+    items : list
+        The item which is loaded into each slot.
+    rows : int
+        The number of rows which are updated, which is one more than the
+        index of the last live slot.
+
+    """
+
+    def __init__(self, network, size, recorder, max_cycles):
+        """Init function."""
+        self.network = network
+        self.size = size
+        plan = network.plan if network.plan is not None else network.compile()
+        state = plan.state
+        shape = (size, len(state))
+        dtype = state.activations.dtype
+        self.activations = np.zeros(shape, dtype=dtype)
+        self.ext_input = np.zeros(shape, dtype=dtype)
+        self.net = np.zeros(shape, dtype=dtype)
+        self.resting = np.copy(state.resting)
+        self.slices = state.slices
+
+        self._blocks = [(dest, src, mtr)
+                        for src, dest, mtr in plan.operator.blocks]
+        self._dynamic = slice(state.n_static, len(state))
+        self._n_static = state.n_static
+        self._dynamic_resting = self.resting[self._dynamic]
+        self._monitors = list(plan.monitors)
+        self._masked = plan._masked
+
+        self.cycles = np.zeros(size, dtype=np.intp)
+        self.live = np.zeros(size, dtype=bool)
+        self.items = [None] * size
+        self.rows = 0
+        # Scratch buffers for checking convergence.
+        self._max = np.zeros(size, dtype=dtype)
+        self._above = np.zeros(size, dtype=bool)
+        self._done = np.zeros(size, dtype=bool)
+
+        self.recorders = []
+        self._record = recorder is not None and recorder.per_cycle
+        if recorder is None:
+            return
+        for slot in range(size):
+            r = copy.copy(recorder)
+            r.start(_Row(network, self.activations[slot], self.slices),
+                    max_cycles)
+            self.recorders.append(r)
+
+    def load(self, slot, x, input_layers):
+        """
+        Reset a slot and clamp a new item onto it.
+
+        Parameters
+        ----------
+        slot : int
+            The index of the slot.
+        x : dict
+            The item to clamp.
+        input_layers : dict
+            The layers onto which the item is clamped.
+
+        """
+        self.activations[slot] = self.resting
+        self.ext_input[slot] = 0
+        for name, layer in input_layers.items():
+            self.network._clamp(self.ext_input[slot, self.slices[name]],
+                                layer,
+                                x)
+
+        self.cycles[slot] = 0
+        self.live[slot] = True
+        self.items[slot] = x
+        if self.recorders:
+            self.recorders[slot].reset()
+        self.rows = max(self.rows, slot + 1)
+
+    def retire(self, slot):
+        """Stop running a slot, and return the result of its recorder."""
+        result = None
+        if self.recorders:
+            result = self.recorders[slot].result(int(self.cycles[slot]))
+        self.live[slot] = False
+        self.items[slot] = None
+        while self.rows and not self.live[self.rows - 1]:
+            self.rows -= 1
+
+        return result
+
+    def step(self, clamp_cycles=None):
+        """
+        Perform a single synchronous cycle on all rows in use.
+
+        The operations are those of ExecutionPlan.step, without folding the
+        input of static layers. Free slots among the rows in use are
+        updated as well, but their results are never used.
+
+        Parameters
+        ----------
+        clamp_cycles : int, optional, default None
+            Slots which have run for this number of cycles are unclamped
+            before the update.
+
+        """
+        network = self.network
+        n = self.rows
+        net = self.net[:n]
+        activations = self.activations[:n]
+
+        if clamp_cycles is not None:
+            unclamp = self._above[:n]
+            np.equal(self.cycles[:n], clamp_cycles, out=unclamp)
+            if unclamp.any():
+                self.ext_input[:n][unclamp] = 0
+
+        np.copyto(net, self.ext_input[:n])
+        # Static layers only receive external input.
+        net[:, :self._n_static] *= network.step_size
+        for dest, src, mtr in self._blocks:
+            propagate_batch(self.net, self.activations, mtr, dest, src, n)
+        update_batch(self.net,
+                     self.activations,
+                     self._dynamic_resting,
+                     network.minimum,
+                     network.decay_rate,
+                     network.step_size,
+                     self._dynamic,
+                     n)
+
+        activations += net
+        np.clip(activations, network.minimum, 1.0, out=activations)
+        if self._masked is not None:
+            activations[:, self._masked] = network.minimum
+        self.cycles[:n] += 1
+
+        if self._record:
+            for slot in np.flatnonzero(self.live[:n]):
+                self.recorders[slot].record(self.cycles[slot] - 1)
+
+    def converged(self, threshold):
+        """
+        Check which of the rows in use have crossed the threshold.
+
+        Returns
+        -------
+        done : np.array
+            A boolean mask over the rows in use. This is a scratch buffer,
+            which is overwritten by the next call.
+
+        """
+        n = self.rows
+        done = self._done[:n]
+        if not self._monitors:
+            done[:] = False
+            return done
+        done[:] = True
+        for sl in self._monitors:
+            np.max(self.activations[:n, sl], axis=1, out=self._max[:n])
+            np.greater(self._max[:n], threshold, out=self._above[:n])
+            done &= self._above[:n]
+        return done
+
+    def finished(self, threshold, max_cycles, strict=True):
+        """
+        Get the live slots which have finished after the last cycle.
+
+        Parameters
+        ----------
+        threshold : float
+            The activation threshold of the monitor layers.
+        max_cycles : int
+            The maximum number of cycles to run an item for.
+        strict : bool, optional, default True
+            Whether to raise an error if a slot reached max_cycles without
+            crossing the threshold.
+
+        Returns
+        -------
+        slots : np.array
+            The slots which crossed the threshold or reached max_cycles.
+        recognized : np.array
+            Whether each of these slots crossed the threshold.
+
+        """
+        n = self.rows
+        done = self.converged(threshold)
+        timeout = self.cycles[:n] >= max_cycles
+        slots = np.flatnonzero((done | timeout) & self.live[:n])
+        if strict:
+            for slot in slots:
+                if not done[slot]:
+                    raise ValueError("Maximum cycles reached, maximum "
+                                     "activation was {}, input was {}"
+                                     "".format(self.max_activation(slot),
+                                               self.items[slot]))
+        return slots, done[slots]
+
+    def max_activation(self, slot):
+        """The maximum activation of the monitor layers for a slot."""
+        return max([self.activations[slot, sl].max()
+                    for sl in self._monitors])
+
+
+class _Row(object):
+    """
+    A single slot of a batch, as seen by a recorder.
+
+    The output layers are shallow copies of those of the network, of which
+    the activations are the columns of the slot's row.
+    """
+
+    def __init__(self, network, activations, slices):
+        """Init function."""
+        self.outputs = {}
+        for k, layer in network.outputs.items():
+            view = copy.copy(layer)
+            view.activations = activations[slices[k]]
+            self.outputs[k] = view
@@ -0,0 +1,215 @@
+"""A persistent, content-addressed cache of reaction times."""
+import hashlib
+import numpy as np
+import os
+import tempfile
+
+from .connection import Connection
+from .encoding import EncodedSet, signature
+
+
+def fingerprint(network):
+    """
+    Get a stable hash of everything which determines the output of a network.
+
+    The hash covers the scalar parameters and dtype of the network, and the
+    node names, resting levels, roles, node masks and weights of all layers.
+
+    Parameters
+    ----------
+    network : Network
+        The network to hash.
+
+    Returns
+    -------
+    fingerprint : str
+        The hexadecimal digest of the hash.
+
+    """
+    h = hashlib.sha256()
+    h.update(repr((float(network.minimum),
+                   float(network.step_size),
+                   float(network.decay_rate),
+                   network.dtype.str)).encode("utf-8"))
+    for k in sorted(network.layers):
+        layer = network.layers[k]
+        h.update(repr((k,
+                       signature(layer),
+                       k in network.outputs,
+                       k in network.monitors,
+                       k in network.feature)).encode("utf-8"))
+        h.update(np.ascontiguousarray(layer.resting).tobytes())
+        if network.node_mask is not None and k in network.node_mask:
+            h.update(b"mask")
+            h.update(network.node_mask[k].tobytes())
+        for src, mtr in zip(layer._from_connections, layer.weights):
+            if isinstance(mtr, Connection):
+                h.update(repr((src.name,
+                               mtr.shape,
+                               mtr.kind,
+                               sorted(mtr.params.items()))).encode("utf-8"))
+                for _, x in sorted(mtr.arrays.items()):
+                    h.update(np.ascontiguousarray(x).tobytes())
+                continue
+            h.update(repr((src.name, mtr.shape)).encode("utf-8"))
+            h.update(np.ascontiguousarray(mtr).tobytes())
+
+    return h.hexdigest()
+
+
+class ResultCache(object):
+    """
+    A cache of reaction times in a local directory.
+
+    Every item is stored in its own file, which is named after a hash of
+    the network, the parameters of the run and the encoded item. A rerun
+    with the same network and parameters therefore only simulates the items
+    which are not in the cache yet.
+    If the files in the directory exceed max_bytes, the least recently used
+    files are removed.
+
+    Parameters
+    ----------
+    path : str
+        The directory in which to store the results. It is created if it
+        does not exist.
+    max_bytes : int, optional, default 2 ** 30
+        The maximum size of the cache on disk.
+
+    Attributes
+    ----------
+    hits : int
+        The number of items which were found in the cache.
+    misses : int
+        The number of items which had to be simulated.
+
+    """
+
+    def __init__(self, path, max_bytes=2 ** 30):
+        """Init function."""
+        if max_bytes <= 0:
+            raise ValueError("max_bytes should be > 0, is now "
+                             "{}".format(max_bytes))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        self.nbytes = sum([os.path.getsize(x) for x, _ in self._files()])
+
+    def _files(self):
+        """Get the paths and modification times of all cached files."""
+        for d in os.scandir(self.path):
+            if not d.is_dir():
+                continue
+            for f in os.scandir(d.path):
+                if f.is_file() and not f.name.startswith("."):
+                    yield f.path, f.stat().st_mtime
+
+    def _file(self, key):
+        """Get the path of the file for a key."""
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key, dtype):
+        """Get a cached record, or None if key is not in the cache."""
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) != dtype.itemsize:
+            return None
+        # Touch the file, which marks it as recently used.
+        os.utime(path)
+        return np.frombuffer(data, dtype=dtype)[0]
+
+    def put(self, key, record):
+        """Store a record under a key."""
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = record.tobytes()
+        # Write to a temporary file first, so that concurrent readers never
+        # see a partial record.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.nbytes += len(data)
+
+    def evict(self):
+        """Remove the least recently used files until the cache fits."""
+        if self.nbytes <= self.max_bytes:
+            return
+        files = sorted(self._files(), key=lambda x: x[1])
+        self.nbytes = sum([os.path.getsize(x) for x, _ in files])
+        for path, _ in files:
+            if self.nbytes <= self.max_bytes:
+                break
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.nbytes -= size
+
+    def reaction_times(self, network, X, **kwargs):
+        """
+        Get the reaction times of X, using cached results where possible.
+
+        Parameters
+        ----------
+        network : Network
+            The network to run.
+        X : list of dictionaries or EncodedSet
+            The inputs to the model.
+        kwargs : dict
+            The keyword arguments of Network.reaction_times.
+
+        Returns
+        -------
+        result : np.recarray
+            The same record array as Network.reaction_times.
+
+        """
+        # Imported here to avoid a circular import.
+        from .network import RT_DTYPE
+
+        inputs = kwargs.get("inputs")
+        if not isinstance(X, EncodedSet):
+            X = network.encode(X, inputs)
+        X.check(network._input_layers(inputs))
+        if kwargs.get("layer") is None:
+            kwargs["layer"] = next(iter(network.outputs))
+
+        params = {k: v for k, v in kwargs.items()
+                  if k not in ("show_progressbar", "n_jobs")}
+        h = hashlib.sha256()
+        h.update(network.fingerprint().encode("utf-8"))
+        h.update(repr(sorted(params.items())).encode("utf-8"))
+        h.update(repr(RT_DTYPE.descr).encode("utf-8"))
+
+        result = np.zeros(len(X), dtype=RT_DTYPE)
+        keys = []
+        missing = []
+        for idx, x in enumerate(X):
+            item = h.copy()
+            for k in sorted(x):
+                item.update(k.encode("utf-8"))
+                item.update(x[k].tobytes())
+            key = item.hexdigest()
+            keys.append(key)
+            record = self.get(key, RT_DTYPE)
+            if record is None:
+                missing.append(idx)
+            else:
+                result[idx] = record
+
+        self.hits += len(X) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = network.reaction_times([X[idx] for idx in missing],
+                                              **kwargs)
+            for idx, record in zip(missing, computed):
+                result[idx] = record
+                self.put(keys[idx], result[idx])
+            self.evict()
+
+        return np.rec.array(result)
@@ -0,0 +1,665 @@
+"""
+Weight matrices which are not stored as dense arrays.
+
+A connection is used in the same place as a dense weight matrix: it has a
+shape and a dtype, can be passed to Network.connect_layers, and is applied
+by the same kernels. Instead of storing every weight, a connection stores
+the structure of its weights, and adds its input to the net input of a
+layer with a dedicated kernel.
+
+Every connection has a kind, which is a short name used when saving and
+sharing networks, some scalar parameters, and some arrays. A connection can
+be recreated from these using make_connection.
+
+Connections which are defined by a positive and a negative weight, such as
+the ones created by the Builder, can change these weights in place using
+set_weights, without changing their structure.
+"""
+import numpy as np
+import pyximport
+pyximport.install(setup_args={"include_dirs": np.get_include()})
+from .metric import (block_diagonal,  # noqa: E402
+                     block_diagonal_batch,
+                     masked,
+                     masked_batch,
+                     sparse,
+                     sparse_batch,
+                     uniform,
+                     uniform_batch)
+
+
+# The codes of a MaskConnection.
+NONE = 0
+NEGATIVE = 1
+POSITIVE = 2
+
+
+class Connection(object):
+    """
+    Base class of all connections.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the equivalent dense weight matrix.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the weights.
+
+    """
+
+    kind = None
+    # Whether the weights can be changed using set_weights.
+    parametric = False
+
+    def __init__(self, shape, dtype=np.float64):
+        """Init function."""
+        shape = tuple(int(x) for x in shape)
+        if len(shape) != 2:
+            raise ValueError("A connection should have 2 dimensions, got "
+                             "shape {}".format(shape))
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self):
+        """The number of dimensions, which is always 2."""
+        return 2
+
+    @property
+    def params(self):
+        """The scalar parameters of the connection."""
+        return {}
+
+    @property
+    def arrays(self):
+        """The arrays of the connection."""
+        return {}
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the arrays of the connection."""
+        return sum([x.nbytes for x in self.arrays.values()])
+
+    @classmethod
+    def from_spec(cls, shape, params, arrays, dtype=np.float64):
+        """Create a connection from its shape, parameters and arrays."""
+        kwargs = dict(params)
+        kwargs.update(arrays)
+        return cls(shape, dtype=dtype, **kwargs)
+
+    def astype(self, dtype):
+        """Get the same connection with a different dtype."""
+        return self.from_spec(self.shape, self.params, self.arrays, dtype)
+
+    def set_weights(self, pos, neg):
+        """Set the positive and negative weight of the connection."""
+        raise NotImplementedError("A {} can not change its "
+                                  "weights".format(type(self).__name__))
+
+    def propagate(self, net, c):
+        """Add the input of the positive nodes in c to net, in place."""
+        raise NotImplementedError
+
+    def propagate_batch(self, net, c, dest, src, n):
+        """
+        Apply propagate to each of the first n rows of a batch.
+
+        The columns src of every row of c are propagated into the columns
+        dest of the same row of net. Subclasses replace this by a kernel
+        which processes all rows in a single call.
+        """
+        for r in range(n):
+            self.propagate(net[r, dest], c[r, src])
+
+    def dot(self, x):
+        """
+        Get the product of x and the weights.
+
+        This is equivalent to x.dot(weights) for a dense matrix, where x is
+        either a vector or a matrix with one row per item.
+        """
+        raise NotImplementedError
+
+    def columns(self, idx):
+        """Get the dense weights of a set of columns."""
+        raise NotImplementedError
+
+    def toarray(self):
+        """Get the equivalent dense weight matrix."""
+        return self.columns(np.arange(self.shape[1]))
+
+    def __repr__(self):
+        """Return a description of the connection."""
+        return "{} with shape {}".format(type(self).__name__, self.shape)
+
+
+class UniformConnection(Connection):
+    """
+    A connection in which all weights are the same.
+
+    The weights on the diagonal, which connect each node to the node with
+    the same index, can have a different value. This describes lateral
+    inhibition, in which every node inhibits all other nodes in its layer
+    by the same amount.
+
+    The net input of node j is value times the summed positive input,
+    corrected for the input of node j itself, so that applying the
+    connection takes time and memory linear in the number of nodes, instead
+    of quadratic.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the equivalent dense weight matrix.
+    value : float
+        The value of all weights which are not on the diagonal.
+    diagonal : float, optional, default None
+        The value of the weights on the diagonal. If this is None, the
+        diagonal has the same value as all other weights.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the weights.
+
+    """
+
+    kind = "uniform"
+    parametric = True
+
+    def __init__(self, shape, value, diagonal=None, dtype=np.float64):
+        """Init function."""
+        super(UniformConnection, self).__init__(shape, dtype)
+        if diagonal is None:
+            diagonal = value
+        self.set_weights(diagonal, value)
+
+    @property
+    def params(self):
+        """The scalar parameters of the connection."""
+        return {"value": self.value, "diagonal": self.diagonal}
+
+    def set_weights(self, pos, neg):
+        """
+        Set the positive and negative weight of the connection.
+
+        The positive weight is the weight on the diagonal, the negative
+        weight is the weight of all other connections.
+        """
+        # Round the weights to the dtype, like a dense matrix would.
+        self.value = float(self.dtype.type(neg))
+        self.diagonal = float(self.dtype.type(pos))
+
+    def propagate(self, net, c):
+        """Add the input of the positive nodes in c to net, in place."""
+        uniform(net, c, self.value, self.diagonal)
+
+    def propagate_batch(self, net, c, dest, src, n):
+        """Apply propagate to each of the first n rows of a batch."""
+        uniform_batch(net, c, self.value, self.diagonal, dest, src, n)
+
+    def dot(self, x):
+        """
+        Get the product of x and the weights.
+
+        This is equivalent to x.dot(weights) for a dense matrix, where x is
+        either a vector or a matrix with one row per item.
+        """
+        x = np.asarray(x)
+        k = min(self.shape)
+        total = x.sum(-1)[..., None]
+        out = np.empty(x.shape[:-1] + (self.shape[1],),
+                       dtype=np.result_type(x, self.dtype))
+        out[...] = self.value * total
+        out[..., :k] += (self.diagonal - self.value) * x[..., :k]
+        return out
+
+    def columns(self, idx):
+        """Get the dense weights of a set of columns."""
+        idx = np.asarray(idx, dtype=np.intp)
+        out = np.full((self.shape[0], len(idx)), self.value, dtype=self.dtype)
+        on_diagonal = np.flatnonzero(idx < self.shape[0])
+        out[idx[on_diagonal], on_diagonal] = self.diagonal
+        return out
+
+
+class MaskConnection(Connection):
+    """
+    A connection in which every weight is positive, negative or absent.
+
+    The structure of the connection is stored as a mask with a code for
+    every weight: NONE (0) for weights which are 0, NEGATIVE (1) for weights
+    which are neg, and POSITIVE (2) for weights which are pos. The mask uses
+    a single byte per weight, and the weights can be changed using
+    set_weights without touching the mask.
+
+    Applying the connection gives exactly the same result as applying the
+    equivalent dense matrix.
+
+    Parameters
+    ----------
+    mask : np.array
+        A M * N matrix of codes. Its rows should be contiguous.
+    pos : float
+        The positive weight.
+    neg : float
+        The negative weight.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the weights.
+
+    """
+
+    kind = "mask"
+    parametric = True
+
+    def __init__(self, mask, pos, neg, dtype=np.float64):
+        """Init function."""
+        mask = np.asarray(mask)
+        if mask.dtype == bool:
+            mask = mask.view(np.uint8)
+        # The kernel looks the codes up in a table without checking them.
+        if mask.size and (mask.min() < NONE or mask.max() > POSITIVE):
+            raise ValueError("The codes of the mask should be between {} "
+                             "and {}".format(NONE, POSITIVE))
+        mask = np.asarray(mask, dtype=np.uint8)
+        if mask.ndim == 2 and mask.strides[1] != 1:
+            mask = np.ascontiguousarray(mask)
+        super(MaskConnection, self).__init__(mask.shape, dtype)
+        self.mask = mask
+        self.set_weights(pos, neg)
+
+    @classmethod
+    def from_spec(cls, shape, params, arrays, dtype=np.float64):
+        """Create a connection from its shape, parameters and arrays."""
+        return cls(arrays["mask"], params["pos"], params["neg"], dtype)
+
+    @property
+    def params(self):
+        """The scalar parameters of the connection."""
+        return {"pos": self.pos, "neg": self.neg}
+
+    @property
+    def arrays(self):
+        """The arrays of the connection."""
+        return {"mask": self.mask}
+
+    def set_weights(self, pos, neg):
+        """Set the positive and negative weight of the connection."""
+        # Round the weights to the dtype, like a dense matrix would.
+        self.pos = float(self.dtype.type(pos))
+        self.neg = float(self.dtype.type(neg))
+
+    @property
+    def table(self):
+        """The weight belonging to each code."""
+        return np.array([0, self.neg, self.pos], dtype=self.dtype)
+
+    def propagate(self, net, c):
+        """Add the input of the positive nodes in c to net, in place."""
+        masked(net, c, self.mask, self.pos, self.neg)
+
+    def propagate_batch(self, net, c, dest, src, n):
+        """Apply propagate to each of the first n rows of a batch."""
+        masked_batch(net, c, self.mask, self.pos, self.neg, dest, src, n)
+
+    def dot(self, x):
+        """
+        Get the product of x and the weights.
+
+        This is equivalent to x.dot(weights) for a dense matrix, where x is
+        either a vector or a matrix with one row per item.
+        """
+        x = np.asarray(x)
+        # Only the rows of non-zero inputs are turned into weights.
+        active = np.flatnonzero(x.reshape(-1, x.shape[-1]).any(0))
+        return x[..., active].dot(self.table[self.mask[active]])
+
+    def columns(self, idx):
+        """Get the dense weights of a set of columns."""
+        return self.table[self.mask[:, idx]]
+
+    def toarray(self):
+        """Get the equivalent dense weight matrix."""
+        return self.table[self.mask]
+
+
+class SparseConnection(Connection):
+    """
+    A connection in which every weight is either pos or neg.
+
+    Most weights are neg, and the positions of the pos weights are stored
+    as a sparse matrix in compressed sparse row (CSR) format: the columns of
+    the pos weights of row i are indices[indptr[i]:indptr[i + 1]]. This
+    describes connections such as those between letters and words, in
+    which every word is only positively connected to its own letters.
+
+    The net input of a node is neg times the summed positive input, plus
+    pos - neg times the input of its positive connections, so that the cost
+    of applying the connection scales with the number of positive weights
+    of the active nodes, and the dense matrix is never created.
+
+    Because the input is summed in a different order, the net input can
+    differ from that of the equivalent dense matrix by a rounding error.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the equivalent dense weight matrix.
+    indptr : np.array
+        The start of the columns of each row in indices, with one more
+        element than the number of rows.
+    indices : np.array
+        The columns of the pos weights, sorted within each row.
+    pos : float
+        The positive weight.
+    neg : float
+        The negative weight.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the weights.
+
+    """
+
+    kind = "sparse"
+    parametric = True
+
+    def __init__(self, shape, indptr, indices, pos, neg, dtype=np.float64):
+        """Init function."""
+        super(SparseConnection, self).__init__(shape, dtype)
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int32)
+        if len(indptr) != self.shape[0] + 1 or indptr[0] != 0 or \
+                indptr[-1] != len(indices) or np.any(np.diff(indptr) < 0):
+            raise ValueError("indptr does not fit a matrix with shape {} "
+                             "and {} indices".format(self.shape,
+                                                     len(indices)))
+        if len(indices) and not 0 <= indices.min() <= indices.max() < \
+                self.shape[1]:
+            raise ValueError("The indices should be between 0 and "
+                             "{}".format(self.shape[1]))
+        self.indptr = indptr
+        self.indices = indices
+        self.set_weights(pos, neg)
+
+    @classmethod
+    def from_indices(cls, shape, rows, cols, pos, neg, dtype=np.float64):
+        """
+        Create a connection from the indices of its positive weights.
+
+        Parameters
+        ----------
+        shape : tuple
+            The shape of the equivalent dense weight matrix.
+        rows : np.array
+            The row of each positive weight.
+        cols : np.array
+            The column of each positive weight. Pairs of rows and columns
+            can occur more than once.
+        pos : float
+            The positive weight.
+        neg : float
+            The negative weight.
+        dtype : np.dtype, optional, default np.float64
+            The floating point type of the weights.
+
+        Returns
+        -------
+        connection : SparseConnection
+            The connection.
+
+        """
+        keys = np.unique(np.asarray(rows, dtype=np.int64) * shape[1] +
+                         np.asarray(cols, dtype=np.int64))
+        rows, cols = np.divmod(keys, shape[1])
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        return cls(shape, indptr, cols, pos, neg, dtype)
+
+    @classmethod
+    def from_spec(cls, shape, params, arrays, dtype=np.float64):
+        """Create a connection from its shape, parameters and arrays."""
+        return cls(shape,
+                   arrays["indptr"],
+                   arrays["indices"],
+                   params["pos"],
+                   params["neg"],
+                   dtype)
+
+    @property
+    def params(self):
+        """The scalar parameters of the connection."""
+        return {"pos": self.pos, "neg": self.neg}
+
+    @property
+    def arrays(self):
+        """The arrays of the connection."""
+        return {"indptr": self.indptr, "indices": self.indices}
+
+    def set_weights(self, pos, neg):
+        """Set the positive and negative weight of the connection."""
+        # Round the weights to the dtype, like a dense matrix would.
+        self.pos = float(self.dtype.type(pos))
+        self.neg = float(self.dtype.type(neg))
+
+    def _rows(self):
+        """Get the row of every positive weight."""
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def propagate(self, net, c):
+        """Add the input of the positive nodes in c to net, in place."""
+        # The kernel does not check the indices, which were checked
+        # against the number of columns when the connection was created.
+        if len(net) != self.shape[1]:
+            raise ValueError("net should have {} elements, "
+                             "has {}".format(self.shape[1], len(net)))
+        sparse(net, c, self.indptr, self.indices, self.pos, self.neg)
+
+    def propagate_batch(self, net, c, dest, src, n):
+        """Apply propagate to each of the first n rows of a batch."""
+        width = len(range(*dest.indices(net.shape[1])))
+        if width != self.shape[1]:
+            raise ValueError("dest should have {} columns, "
+                             "has {}".format(self.shape[1], width))
+        sparse_batch(net,
+                     c,
+                     self.indptr,
+                     self.indices,
+                     self.pos,
+                     self.neg,
+                     dest,
+                     src,
+                     n)
+
+    def dot(self, x):
+        """
+        Get the product of x and the weights.
+
+        This is equivalent to x.dot(weights) for a dense matrix, where x is
+        either a vector or a matrix with one row per item.
+        """
+        x = np.asarray(x)
+        flat = x.reshape(-1, x.shape[-1])
+        out = np.empty((len(flat), self.shape[1]),
+                       dtype=np.result_type(x, self.dtype))
+        out[...] = self.neg * flat.sum(-1)[:, None]
+        for i in np.flatnonzero(flat.any(0)):
+            cols = self.indices[self.indptr[i]:self.indptr[i + 1]]
+            out[:, cols] += (self.pos - self.neg) * flat[:, i, None]
+        return out.reshape(x.shape[:-1] + (self.shape[1],))
+
+    def columns(self, idx):
+        """Get the dense weights of a set of columns."""
+        idx = np.asarray(idx, dtype=np.intp)
+        idx, inverse = np.unique(idx, return_inverse=True)
+        position = np.full(self.shape[1], -1, dtype=np.intp)
+        position[idx] = np.arange(len(idx))
+        out = np.full((self.shape[0], len(idx)), self.neg, dtype=self.dtype)
+        cols = position[self.indices]
+        found = cols >= 0
+        out[self._rows()[found], cols[found]] = self.pos
+        return out[:, inverse.ravel()]
+
+    def toarray(self):
+        """Get the equivalent dense weight matrix."""
+        out = np.full(self.shape, self.neg, dtype=self.dtype)
+        out[self._rows(), self.indices] = self.pos
+        return out
+
+
+class BlockDiagonalConnection(Connection):
+    """
+    A connection which only connects nodes within the same block.
+
+    The equivalent dense matrix is 0, except for num_blocks blocks on its
+    diagonal, which connect the i-th block of rows to the i-th block of
+    columns. This describes connections between two slot-based layers, in
+    which nodes are only connected to nodes in the same slot. Every block
+    is applied as a separate dense matrix, so the memory and work scale
+    with the number of slots, instead of its square.
+
+    All blocks can be the same block, which is then only stored once.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the equivalent dense weight matrix. This can be larger
+        than the blocks together, in which case the remaining rows and
+        columns are 0.
+    blocks : np.array
+        Either a num_blocks * x * y array with a block per slot, or a single
+        x * y block which is shared by all slots.
+    num_blocks : int, optional, default None
+        The number of blocks. Only has to be passed for a shared block.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the weights.
+
+    """
+
+    kind = "block"
+
+    def __init__(self, shape, blocks, num_blocks=None, dtype=np.float64):
+        """Init function."""
+        super(BlockDiagonalConnection, self).__init__(shape, dtype)
+        blocks = np.asarray(blocks, dtype=self.dtype)
+        if blocks.ndim == 3 and num_blocks is None:
+            num_blocks = len(blocks)
+        if blocks.ndim not in (2, 3) or num_blocks is None or \
+                (blocks.ndim == 3 and len(blocks) != num_blocks):
+            raise ValueError("blocks should be a single block with "
+                             "num_blocks, or one block per slot, got shape "
+                             "{} and {} blocks".format(blocks.shape,
+                                                       num_blocks))
+        x, y = blocks.shape[-2:]
+        if num_blocks * x > self.shape[0] or num_blocks * y > self.shape[1]:
+            raise ValueError("{} blocks with shape {} do not fit a matrix "
+                             "with shape {}".format(num_blocks,
+                                                    (x, y),
+                                                    self.shape))
+        if blocks.shape[-1] > 1 and blocks.strides[-1] != blocks.itemsize:
+            blocks = np.ascontiguousarray(blocks)
+        self.blocks = blocks
+        self.num_blocks = int(num_blocks)
+        # A shared block is applied as a stack of views of itself.
+        self._stacked = np.broadcast_to(blocks, (self.num_blocks, x, y))
+
+    @property
+    def params(self):
+        """The scalar parameters of the connection."""
+        return {"num_blocks": self.num_blocks}
+
+    @property
+    def arrays(self):
+        """The arrays of the connection."""
+        return {"blocks": self.blocks}
+
+    def propagate(self, net, c):
+        """Add the input of the positive nodes in c to net, in place."""
+        block_diagonal(net, c, self._stacked)
+
+    def propagate_batch(self, net, c, dest, src, n):
+        """Apply propagate to each of the first n rows of a batch."""
+        block_diagonal_batch(net, c, self._stacked, dest, src, n)
+
+    def dot(self, x):
+        """
+        Get the product of x and the weights.
+
+        This is equivalent to x.dot(weights) for a dense matrix, where x is
+        either a vector or a matrix with one row per item.
+        """
+        x = np.asarray(x)
+        n, a, b = self._stacked.shape
+        flat = x.reshape(-1, x.shape[-1])
+        out = np.zeros((len(flat), self.shape[1]),
+                       dtype=np.result_type(x, self.dtype))
+        per_slot = flat[:, :n * a].reshape(len(flat), n, a)
+        out[:, :n * b] = np.einsum("isx,sxy->isy",
+                                   per_slot,
+                                   self._stacked).reshape(len(flat), -1)
+        return out.reshape(x.shape[:-1] + (self.shape[1],))
+
+    def columns(self, idx):
+        """Get the dense weights of a set of columns."""
+        idx = np.asarray(idx, dtype=np.intp)
+        n, a, b = self._stacked.shape
+        out = np.zeros((self.shape[0], len(idx)), dtype=self.dtype)
+        inside = np.flatnonzero(idx < n * b)
+        slot, col = np.divmod(idx[inside], b)
+        rows = slot[:, None] * a + np.arange(a)
+        out[rows, inside[:, None]] = self._stacked[slot, :, col]
+        return out
+
+    def toarray(self):
+        """Get the equivalent dense weight matrix."""
+        n, a, b = self._stacked.shape
+        out = np.zeros(self.shape, dtype=self.dtype)
+        for idx, block in enumerate(self._stacked):
+            out[idx * a:(idx + 1) * a, idx * b:(idx + 1) * b] = block
+        return out
+
+
+CONNECTIONS = {x.kind: x for x in (UniformConnection,
+                                   MaskConnection,
+                                   SparseConnection,
+                                   BlockDiagonalConnection)}
+
+
+def make_connection(kind, shape, params, arrays, dtype=np.float64):
+    """
+    Create a connection from its kind, parameters and arrays.
+
+    Parameters
+    ----------
+    kind : str
+        The kind of the connection.
+    shape : tuple
+        The shape of the equivalent dense weight matrix.
+    params : dict
+        The scalar parameters of the connection.
+    arrays : dict
+        The arrays of the connection.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the weights.
+
+    Returns
+    -------
+    connection : Connection
+        The connection.
+
+    """
+    try:
+        cls = CONNECTIONS[kind]
+    except KeyError:
+        raise ValueError("{} is not a known kind of connection, the known "
+                         "kinds are {}".format(kind, sorted(CONNECTIONS)))
+    return cls.from_spec(shape, params, arrays, dtype)
+
+
+def dot(x, weights):
+    """Get x.dot(weights), for dense matrices and connections alike."""
+    if isinstance(weights, Connection):
+        return weights.dot(x)
+    return x.dot(weights)
+
+
+def columns(weights, idx):
+    """Get a set of columns, for dense matrices and connections alike."""
+    if isinstance(weights, Connection):
+        return weights.columns(idx)
+    return weights[:, idx]
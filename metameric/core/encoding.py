@@ -0,0 +1,159 @@
+"""Encoded sets of inputs, in which all symbols are resolved to indices."""
+import hashlib
+import numpy as np
+
+
+def signature(layer):
+    """Get a hash of the node names of a layer."""
+    names = repr(tuple(layer.node_names)).encode("utf-8")
+    return hashlib.sha1(names).hexdigest()
+
+
+class EncodedItem(dict):
+    """
+    A single encoded item.
+
+    This is a dictionary with layer names as keys, and arrays with the
+    indices of the nodes which are clamped as values.
+    """
+
+    pass
+
+
+class EncodedSet(object):
+    """
+    A set of items, encoded into node indices for each input layer.
+
+    For every input layer, the indices of the clamped nodes of all items are
+    stored in a single integer array. The indices of the i-th item are
+    indices[offsets[i]:offsets[i + 1]]. Iterating over an encoded set gives
+    an EncodedItem per item, which is clamped onto the network with a
+    single assignment per layer.
+
+    Encoded sets are created using Network.encode, and can be passed
+    anywhere a list of items is accepted.
+
+    Parameters
+    ----------
+    indices : dict
+        A mapping from layer names to the concatenated node indices of all
+        items.
+    offsets : dict
+        A mapping from layer names to the offsets of each item in indices.
+    signatures : dict
+        A mapping from layer names to a hash of their node names, which is
+        used to check whether a set was encoded for a given network.
+
+    """
+
+    def __init__(self, indices, offsets, signatures):
+        """Init function."""
+        if set(indices) != set(offsets) or set(indices) != set(signatures):
+            raise ValueError("indices, offsets and signatures should have "
+                             "the same layers.")
+        lengths = {len(v) - 1 for v in offsets.values()}
+        if len(lengths) > 1:
+            raise ValueError("All layers should have the same number of "
+                             "items, got {}".format(lengths))
+        self.indices = indices
+        self.offsets = offsets
+        self.signatures = signatures
+        self._len = lengths.pop() if lengths else 0
+
+    def __len__(self):
+        """The number of items."""
+        return self._len
+
+    def __getitem__(self, i):
+        """Get a single item, or a subset of items if i is a slice."""
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                raise ValueError("Only contiguous slices are supported.")
+            stop = max(start, stop)
+            indices = {}
+            offsets = {}
+            for k, o in self.offsets.items():
+                indices[k] = self.indices[k][o[start]:o[stop]]
+                offsets[k] = o[start:stop + 1] - o[start]
+            return EncodedSet(indices, offsets, self.signatures)
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("index {} is out of range".format(i))
+        return EncodedItem({k: self.indices[k][o[i]:o[i + 1]]
+                            for k, o in self.offsets.items()})
+
+    def __iter__(self):
+        """Iterate over the items."""
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def layers(self):
+        """The names of the encoded layers."""
+        return tuple(sorted(self.indices))
+
+    def check(self, layers):
+        """
+        Check whether the set was encoded for a set of layers.
+
+        Parameters
+        ----------
+        layers : dict
+            A dictionary of Layers, usually the input layers of a network.
+
+        """
+        for k, layer in layers.items():
+            if k not in self.signatures:
+                raise ValueError("{} was not encoded, the encoded layers are "
+                                 "{}".format(k, self.layers))
+            if self.signatures[k] != signature(layer):
+                raise ValueError("{} was encoded for a layer with different "
+                                 "nodes.".format(k))
+
+    def save(self, path):
+        """
+        Save the encoded set to a .npz file.
+
+        Parameters
+        ----------
+        path : str
+            The path to which to save the set.
+
+        """
+        arrays = {"layers": np.array(self.layers)}
+        for idx, k in enumerate(self.layers):
+            arrays["indices_{}".format(idx)] = self.indices[k]
+            arrays["offsets_{}".format(idx)] = self.offsets[k]
+            arrays["signature_{}".format(idx)] = np.array(self.signatures[k])
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an encoded set from a .npz file.
+
+        Parameters
+        ----------
+        path : str
+            The path from which to load the set.
+
+        Returns
+        -------
+        encoded : EncodedSet
+            The loaded set.
+
+        """
+        indices = {}
+        offsets = {}
+        signatures = {}
+        with np.load(path, allow_pickle=False) as f:
+            for idx, k in enumerate(f["layers"]):
+                k = str(k)
+                indices[k] = f["indices_{}".format(idx)]
+                offsets[k] = f["offsets_{}".format(idx)]
+                signatures[k] = str(f["signature_{}".format(idx)])
+
+        return cls(indices, offsets, signatures)
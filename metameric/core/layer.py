@@ -1,7 +1,6 @@
 """Layers in competitive networks."""
 import numpy as np
-import pyximport
-pyximport.install(setup_args={"include_dirs": np.get_include()}) # noqa
+from .connection import Connection, dot
 from .metric import strength
 
 
@@ -26,13 +25,18 @@ class Layer(object):
         The rate at which activations decay back to their resting state.
         In general, this number should be small (.07) to obtain interesting
         effects.
+    name : string, optional, default ""
+        The name of the layer.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type of the activations and weights of this layer.
+        Either np.float32 or np.float64.
 
     Attributes
     ----------
     connections : list of Layer
         A list of Layers with which this layer is connected.
-    weights : np.array
-        A tmatrix which details how the incoming connections influence the
+    weights : list of np.array or Connection
+        The matrices which detail how the incoming connections influence the
         activation of the current layer.
     activations : np.array
         The activation of the current layer at the current time.
@@ -51,24 +55,26 @@ class Layer(object):
                  minimum,
                  step_size,
                  decay_rate,
-                 name=""):
+                 name="",
+                 dtype=np.float64):
         """Init function."""
         if len(resting) != len(node_names):
             raise ValueError("Node names and resting level activations do "
                              "not have the same length: {} and {}"
                              "".format(len(resting), len(node_names)))
-        self.activations = np.zeros_like(resting, dtype=np.float64)
+        self.dtype = np.dtype(dtype)
+        self.activations = np.zeros_like(resting, dtype=self.dtype)
         self.name2idx = {k: idx for idx, k in enumerate(node_names)}
         self.idx2name = {v: k for k, v in self.name2idx.items()}
         self._from_connections = []
         self._to_connections = []
         self.weights = []
-        self.resting = np.copy(resting).astype(np.float64)
+        self.resting = np.copy(resting).astype(self.dtype)
         self.minimum = minimum
         self.decay_rate = decay_rate
         self.name = name
         self.step_size = step_size
-        self.ext_input = np.zeros_like(resting, dtype=np.float64)
+        self.ext_input = np.zeros_like(resting, dtype=self.dtype)
 
     @property
     def connections(self):
@@ -94,7 +100,7 @@ class Layer(object):
         ----------
         layer : Layer
             The layer to be connected to the current layer.
-        weights : np.array
+        weights : np.array or Connection
             A M * N matrix, where M is the dimensionality of the incoming
             connection, and N is the dimensionality of the current layer's
             activations.
@@ -104,10 +110,49 @@ class Layer(object):
             raise ValueError("Transfer matrix is not correct shape.")
         if weights.shape[1] != self.activations.shape[0]:
             raise ValueError("Transfer matrix is not correct shape.")
+        if isinstance(weights, Connection):
+            weights = weights.astype(self.dtype)
+        else:
+            # The strength kernel reads the rows of the matrix as contiguous
+            # blocks of memory, and needs the same dtype as the activations.
+            # Views with contiguous rows, such as the top left corner of a
+            # larger matrix, are not copied.
+            weights = np.asarray(weights, dtype=self.dtype)
+            if weights.strides[1] != weights.itemsize:
+                weights = np.ascontiguousarray(weights)
 
         self._from_connections.append(layer)
         self.weights.append(weights)
 
+    def add_nodes(self, resting, node_names):
+        """
+        Add nodes to the layer.
+
+        The new nodes start at their resting level activation. Note that
+        the weight matrices of the layer are not resized.
+
+        Parameters
+        ----------
+        resting : np.array
+            The resting level activations of the new nodes.
+        node_names : list of string
+            The names of the new nodes.
+
+        """
+        if len(resting) != len(node_names):
+            raise ValueError("Node names and resting level activations do "
+                             "not have the same length: {} and {}"
+                             "".format(len(resting), len(node_names)))
+        resting = np.asarray(resting, dtype=self.dtype)
+        offset = len(self.resting)
+        for idx, k in enumerate(node_names, offset):
+            self.name2idx[k] = idx
+            self.idx2name[idx] = k
+        self.resting = np.concatenate([self.resting, resting])
+        self.activations = np.concatenate([self.activations, resting])
+        self.ext_input = np.concatenate([self.ext_input,
+                                         np.zeros_like(resting)])
+
     def add_to_connection(self, layer):
         """
         Add a connection to the layer.
@@ -139,8 +184,8 @@ class Layer(object):
 
     def reset(self):
         """Reset the activations to resting level."""
-        self.activations = np.copy(self.resting)
-        self.ext_input *= 0
+        self.activations[:] = self.resting
+        self.ext_input[:] = 0
 
     def net_input(self):
         """
@@ -154,7 +199,7 @@ class Layer(object):
         net = {}
         for mtr, layer in zip(self.weights, self._from_connections):
             a = layer.activations.clip(.0, 1.0)
-            net[layer.name] = a.dot(mtr)
+            net[layer.name] = dot(a, mtr)
 
         return net
 
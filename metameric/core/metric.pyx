@@ -1,37 +1,535 @@
 cimport cython
 cimport numpy as np
 import numpy as np
+from cython cimport floating
+from libc.stdlib cimport malloc, free
 
 
 @cython.wraparound(False)
 @cython.boundscheck(False)
-def strength(np.ndarray[np.float64_t, ndim=1] net,
-             np.ndarray[np.float64_t, ndim=1] activations,
-             np.ndarray[np.float64_t, ndim=1] resting,
-             list conn,
-             list mtrs,
-             np.float64_t minimum,
-             np.float64_t decay,
-             np.float64_t step_size):
-    """Fast function for calculating association strength."""
-    cdef np.intp_t i, j, z
-    cdef np.intp_t n_neurons = activations.shape[0]
-    cdef np.ndarray[np.float64_t, ndim=1] c
-    cdef np.ndarray[np.float64_t, ndim=2] mtr
-    # There are as many conn as mtr.
-    for z in range(len(conn)):
-        c = conn[z]
-        mtr = mtrs[z]
-        for i in range(c.shape[0]):
-            if c[i] > 0:
-                for j in range(n_neurons):
-                    net[j] += c[i] * mtr[i, j]
+cdef void accumulate(floating[::1] net,
+                     const floating[::1] c,
+                     const floating[:, :] mtr):
+    """
+    Add the contribution of the positive nodes in c to net.
+
+    The indices of the active presynaptic nodes are first gathered into a
+    compact list, after which only their rows of mtr are visited. Rows are
+    processed four at a time, so that every element of net is loaded and
+    stored once for every four rows, instead of once for every row.
+    The cost of this function therefore scales with the number of active
+    presynaptic nodes, and not with the size of the presynaptic layer.
+    The rows of mtr have to be contiguous, but mtr itself can be a view
+    into a larger matrix, see check_rows.
+    """
+    cdef np.intp_t i, j, k
+    cdef np.intp_t n_active = 0
+    cdef np.intp_t n_neurons = net.shape[0]
+    cdef floating v0, v1, v2, v3
+    cdef const floating *r0
+    cdef const floating *r1
+    cdef const floating *r2
+    cdef const floating *r3
+    cdef floating *out = &net[0]
+    cdef np.intp_t *active = <np.intp_t *> malloc(c.shape[0] *
+                                                  sizeof(np.intp_t))
+    if active == NULL:
+        raise MemoryError()
+
+    for i in range(c.shape[0]):
+        if c[i] > 0:
+            active[n_active] = i
+            n_active += 1
+
+    k = 0
+    while k + 4 <= n_active:
+        v0 = c[active[k]]
+        v1 = c[active[k + 1]]
+        v2 = c[active[k + 2]]
+        v3 = c[active[k + 3]]
+        r0 = &mtr[active[k], 0]
+        r1 = &mtr[active[k + 1], 0]
+        r2 = &mtr[active[k + 2], 0]
+        r3 = &mtr[active[k + 3], 0]
+        for j in range(n_neurons):
+            out[j] += v0 * r0[j] + v1 * r1[j] + v2 * r2[j] + v3 * r3[j]
+        k += 4
+    while k < n_active:
+        v0 = c[active[k]]
+        r0 = &mtr[active[k], 0]
+        for j in range(n_neurons):
+            out[j] += v0 * r0[j]
+        k += 1
+
+    free(active)
+
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+cdef void accumulate_uniform(floating[::1] net,
+                             const floating[::1] c,
+                             floating value,
+                             floating diagonal):
+    """
+    Add the contribution of the positive nodes in c through a uniform matrix.
+
+    All weights of the matrix are value, except those on the diagonal, which
+    are diagonal. Every node therefore receives value times the summed
+    positive activation of c, after which the active nodes are corrected
+    for the part of the sum which came from themselves. This takes a single
+    pass over c and net, instead of a pass over the whole matrix.
+    """
+    cdef np.intp_t i, j
+    cdef np.intp_t n_active = 0
+    cdef np.intp_t n = min(c.shape[0], net.shape[0])
+    cdef floating total = 0
+    cdef floating *out = &net[0]
+    cdef np.intp_t *active = <np.intp_t *> malloc(c.shape[0] *
+                                                  sizeof(np.intp_t))
+    if active == NULL:
+        raise MemoryError()
+
+    for i in range(c.shape[0]):
+        if c[i] > 0:
+            active[n_active] = i
+            n_active += 1
+            total += c[i]
+
+    if n_active > 0:
+        for j in range(net.shape[0]):
+            out[j] += value * total
+        for i in range(n_active):
+            j = active[i]
+            if j < n:
+                out[j] += (diagonal - value) * c[j]
+
+    free(active)
+
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+cdef void accumulate_masked(floating[::1] net,
+                            const floating[::1] c,
+                            const unsigned char[:, :] mask,
+                            floating pos,
+                            floating neg):
+    """
+    Add the contribution of the positive nodes in c through a mask.
+
+    Every element of the mask is a code, which is looked up in a table of
+    weights: 0 for no connection, neg for 1, and pos for 2. For every active
+    presynaptic node, the products of its activation and the three weights
+    are computed once, after which its row only needs lookups. The products
+    and the order of the sums are the same as in accumulate, so that the
+    result is identical to that of the equivalent dense matrix.
+    """
+    cdef np.intp_t i, j, k
+    cdef np.intp_t n_active = 0
+    cdef np.intp_t n_neurons = net.shape[0]
+    cdef floating table[3]
+    cdef floating s0[3]
+    cdef floating s1[3]
+    cdef floating s2[3]
+    cdef floating s3[3]
+    cdef floating v0, v1, v2, v3
+    cdef const unsigned char *r0
+    cdef const unsigned char *r1
+    cdef const unsigned char *r2
+    cdef const unsigned char *r3
+    cdef floating *out = &net[0]
+    cdef np.intp_t *active = <np.intp_t *> malloc(c.shape[0] *
+                                                  sizeof(np.intp_t))
+    if active == NULL:
+        raise MemoryError()
+
+    table[0] = 0
+    table[1] = neg
+    table[2] = pos
+
+    for i in range(c.shape[0]):
+        if c[i] > 0:
+            active[n_active] = i
+            n_active += 1
+
+    k = 0
+    while k + 4 <= n_active:
+        v0 = c[active[k]]
+        v1 = c[active[k + 1]]
+        v2 = c[active[k + 2]]
+        v3 = c[active[k + 3]]
+        r0 = &mask[active[k], 0]
+        r1 = &mask[active[k + 1], 0]
+        r2 = &mask[active[k + 2], 0]
+        r3 = &mask[active[k + 3], 0]
+        for i in range(3):
+            s0[i] = v0 * table[i]
+            s1[i] = v1 * table[i]
+            s2[i] = v2 * table[i]
+            s3[i] = v3 * table[i]
+        for j in range(n_neurons):
+            out[j] += s0[r0[j]] + s1[r1[j]] + s2[r2[j]] + s3[r3[j]]
+        k += 4
+    while k < n_active:
+        v0 = c[active[k]]
+        r0 = &mask[active[k], 0]
+        for i in range(3):
+            s0[i] = v0 * table[i]
+        for j in range(n_neurons):
+            out[j] += s0[r0[j]]
+        k += 1
+
+    free(active)
+
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+cdef void accumulate_sparse(floating[::1] net,
+                            const floating[::1] c,
+                            const np.int64_t[::1] indptr,
+                            const np.int32_t[::1] indices,
+                            floating pos,
+                            floating neg):
+    """
+    Add the contribution of the positive nodes in c through a sparse matrix.
+
+    All weights of the matrix are neg, except those in the sparse matrix
+    given by indptr and indices, which are pos. Every node receives neg
+    times the summed positive activation of c, and the nodes which are
+    positively connected to an active node receive pos - neg times its
+    activation on top of that. Only the positive weights of the active
+    nodes are visited.
+    """
+    cdef np.intp_t i, p
+    cdef floating total = 0
+    cdef floating x
+    cdef floating delta = pos - neg
+    cdef floating *out = &net[0]
 
-    for i in range(n_neurons):
+    for i in range(c.shape[0]):
+        if c[i] > 0:
+            total += c[i]
+            x = delta * c[i]
+            for p in range(indptr[i], indptr[i + 1]):
+                out[indices[p]] += x
+
+    if total > 0 and neg != 0:
+        for i in range(net.shape[0]):
+            out[i] += neg * total
+
+
+cdef void check_rows(const floating[:, :] mtr) except *:
+    """Check whether the rows of a matrix are contiguous."""
+    if mtr.shape[1] > 1 and mtr.strides[1] != sizeof(floating):
+        raise ValueError("The rows of the weight matrix are not contiguous.")
+
+
+@cython.wraparound(False)
+@cython.boundscheck(False)
+cdef void nonlinearity(floating[::1] net,
+                       const floating[::1] activations,
+                       const floating[::1] resting,
+                       double minimum,
+                       double decay,
+                       double step_size):
+    """Turn net input into a change in activation, in place."""
+    cdef np.intp_t i
+    for i in range(net.shape[0]):
         if net[i] > 0:
             net[i] *= 1.0 - activations[i]
         else:
             net[i] *= activations[i] - minimum
         net[i] -= decay * (activations[i] - resting[i])
+        net[i] *= step_size
+
+
+def propagate(floating[::1] net,
+              const floating[::1] c,
+              mtr):
+    """
+    Add the input of the positive nodes in c through mtr to net.
+
+    mtr is either a dense matrix, or a connection, which adds its input
+    using its own kernel.
+    """
+    cdef const floating[:, :] dense
+    if isinstance(mtr, np.ndarray):
+        dense = mtr
+        check_rows(dense)
+        accumulate(net, c, dense)
+    else:
+        mtr.propagate(net, c)
+
+
+def block_diagonal(floating[::1] net,
+                   const floating[::1] c,
+                   const floating[:, :, :] blocks):
+    """
+    Add the input of the positive nodes in c through a block-diagonal matrix.
+
+    The i-th block connects the i-th part of c to the i-th part of net, and
+    is applied as a dense matrix. Blocks can share their memory, e.g. if
+    blocks is a broadcast view of a single block.
+    """
+    cdef np.intp_t s
+    cdef np.intp_t x = blocks.shape[1]
+    cdef np.intp_t y = blocks.shape[2]
+    if y > 1 and blocks.strides[2] != sizeof(floating):
+        raise ValueError("The rows of the blocks are not contiguous.")
+    if blocks.shape[0] * x > c.shape[0] or blocks.shape[0] * y > net.shape[0]:
+        raise ValueError("The blocks do not fit c and net.")
+    for s in range(blocks.shape[0]):
+        accumulate(net[s * y:(s + 1) * y], c[s * x:(s + 1) * x], blocks[s])
+
+
+def masked(floating[::1] net,
+           const floating[::1] c,
+           const unsigned char[:, :] mask,
+           double pos,
+           double neg):
+    """Add the input of the positive nodes in c through a mask of codes."""
+    if mask.shape[1] > 1 and mask.strides[1] != 1:
+        raise ValueError("The rows of the mask are not contiguous.")
+    accumulate_masked(net, c, mask, <floating>pos, <floating>neg)
+
+
+def sparse(floating[::1] net,
+           const floating[::1] c,
+           const np.int64_t[::1] indptr,
+           const np.int32_t[::1] indices,
+           double pos,
+           double neg):
+    """Add the input of the positive nodes in c through a sparse matrix."""
+    if indptr.shape[0] != c.shape[0] + 1:
+        raise ValueError("indptr should have one more element than c.")
+    accumulate_sparse(net, c, indptr, indices, <floating>pos, <floating>neg)
+
+
+def uniform(floating[::1] net,
+            const floating[::1] c,
+            double value,
+            double diagonal):
+    """Add the input of the positive nodes in c through a uniform matrix."""
+    accumulate_uniform(net, c, <floating>value, <floating>diagonal)
+
+
+def update(floating[::1] net,
+           const floating[::1] activations,
+           const floating[::1] resting,
+           double minimum,
+           double decay,
+           double step_size):
+    """
+    Turn net input into a change in activation, in place.
+
+    The update of a single neuron is given by the following equation.
+
+        if net_i > 0:
+            add_i = net_i * (1.0 - activation_i)
+        else:
+            add_i = net_i * (activation_i - minimum)
+        delta_i = (add_i - (decay * (activation_i - resting_i))) * step_size
+    """
+    nonlinearity(net, activations, resting, minimum, decay, step_size)
+
+
+cdef tuple columns(sl, np.intp_t width):
+    """Get the start and stop of a slice of columns."""
+    start, stop, step = sl.indices(width)
+    if step != 1 or stop <= start:
+        raise ValueError("The columns should be a non-empty slice with a "
+                         "step of 1.")
+    return start, stop
+
+
+cdef void check_batch(const floating[:, ::1] net,
+                      const floating[:, ::1] c,
+                      np.intp_t n) except *:
+    """Check whether net and c have at least n rows."""
+    if n > net.shape[0] or n > c.shape[0]:
+        raise ValueError("n is {}, but net has {} rows and c has {} "
+                         "rows".format(n, net.shape[0], c.shape[0]))
+
+
+def propagate_batch(floating[:, ::1] net,
+                    const floating[:, ::1] c,
+                    mtr,
+                    dest,
+                    src,
+                    np.intp_t n):
+    """
+    Apply propagate to each of the first n rows of a batch.
+
+    Every row of net and c is the flat state of a separate item. The
+    columns src of c are propagated through mtr into the columns dest of
+    net, by the same kernels as propagate, so that every row gets exactly
+    the same result as it would on its own. mtr is either a dense matrix,
+    or a connection, which adds its input using its own batch kernel.
+    """
+    cdef const floating[:, :] dense
+    cdef np.intp_t r, d0, d1, s0, s1
+    if not isinstance(mtr, np.ndarray):
+        mtr.propagate_batch(net, c, dest, src, n)
+        return
+    check_batch(net, c, n)
+    d0, d1 = columns(dest, net.shape[1])
+    s0, s1 = columns(src, c.shape[1])
+    dense = mtr
+    check_rows(dense)
+    if dense.shape[0] != s1 - s0 or dense.shape[1] != d1 - d0:
+        raise ValueError("The matrix does not fit the columns.")
+    for r in range(n):
+        accumulate(net[r, d0:d1], c[r, s0:s1], dense)
+
+
+def block_diagonal_batch(floating[:, ::1] net,
+                         const floating[:, ::1] c,
+                         const floating[:, :, :] blocks,
+                         dest,
+                         src,
+                         np.intp_t n):
+    """Apply block_diagonal to each of the first n rows of a batch."""
+    cdef np.intp_t r, s, d0, d1, s0, s1
+    cdef np.intp_t x = blocks.shape[1]
+    cdef np.intp_t y = blocks.shape[2]
+    check_batch(net, c, n)
+    d0, d1 = columns(dest, net.shape[1])
+    s0, s1 = columns(src, c.shape[1])
+    if y > 1 and blocks.strides[2] != sizeof(floating):
+        raise ValueError("The rows of the blocks are not contiguous.")
+    if blocks.shape[0] * x > s1 - s0 or blocks.shape[0] * y > d1 - d0:
+        raise ValueError("The blocks do not fit c and net.")
+    for r in range(n):
+        for s in range(blocks.shape[0]):
+            accumulate(net[r, d0 + s * y:d0 + (s + 1) * y],
+                       c[r, s0 + s * x:s0 + (s + 1) * x],
+                       blocks[s])
+
+
+def masked_batch(floating[:, ::1] net,
+                 const floating[:, ::1] c,
+                 const unsigned char[:, :] mask,
+                 double pos,
+                 double neg,
+                 dest,
+                 src,
+                 np.intp_t n):
+    """Apply masked to each of the first n rows of a batch."""
+    cdef np.intp_t r, d0, d1, s0, s1
+    check_batch(net, c, n)
+    d0, d1 = columns(dest, net.shape[1])
+    s0, s1 = columns(src, c.shape[1])
+    if mask.shape[1] > 1 and mask.strides[1] != 1:
+        raise ValueError("The rows of the mask are not contiguous.")
+    if mask.shape[0] != s1 - s0 or mask.shape[1] != d1 - d0:
+        raise ValueError("The mask does not fit the columns.")
+    for r in range(n):
+        accumulate_masked(net[r, d0:d1],
+                          c[r, s0:s1],
+                          mask,
+                          <floating>pos,
+                          <floating>neg)
+
+
+def sparse_batch(floating[:, ::1] net,
+                 const floating[:, ::1] c,
+                 const np.int64_t[::1] indptr,
+                 const np.int32_t[::1] indices,
+                 double pos,
+                 double neg,
+                 dest,
+                 src,
+                 np.intp_t n):
+    """Apply sparse to each of the first n rows of a batch."""
+    cdef np.intp_t r, d0, d1, s0, s1
+    check_batch(net, c, n)
+    d0, d1 = columns(dest, net.shape[1])
+    s0, s1 = columns(src, c.shape[1])
+    if indptr.shape[0] != s1 - s0 + 1:
+        raise ValueError("indptr should have one more element than c.")
+    for r in range(n):
+        accumulate_sparse(net[r, d0:d1],
+                          c[r, s0:s1],
+                          indptr,
+                          indices,
+                          <floating>pos,
+                          <floating>neg)
+
+
+def uniform_batch(floating[:, ::1] net,
+                  const floating[:, ::1] c,
+                  double value,
+                  double diagonal,
+                  dest,
+                  src,
+                  np.intp_t n):
+    """Apply uniform to each of the first n rows of a batch."""
+    cdef np.intp_t r, d0, d1, s0, s1
+    check_batch(net, c, n)
+    d0, d1 = columns(dest, net.shape[1])
+    s0, s1 = columns(src, c.shape[1])
+    for r in range(n):
+        accumulate_uniform(net[r, d0:d1],
+                           c[r, s0:s1],
+                           <floating>value,
+                           <floating>diagonal)
+
+
+def update_batch(floating[:, ::1] net,
+                 const floating[:, ::1] activations,
+                 const floating[::1] resting,
+                 double minimum,
+                 double decay,
+                 double step_size,
+                 dest,
+                 np.intp_t n):
+    """
+    Apply update to the columns dest of each of the first n rows of a batch.
+
+    resting contains the resting levels of the nodes in dest only.
+    """
+    cdef np.intp_t r, d0, d1
+    check_batch(net, activations, n)
+    d0, d1 = columns(dest, net.shape[1])
+    if d1 - d0 != resting.shape[0]:
+        raise ValueError("resting should have as many elements as there "
+                         "are columns.")
+    for r in range(n):
+        nonlinearity(net[r, d0:d1],
+                     activations[r, d0:d1],
+                     resting,
+                     minimum,
+                     decay,
+                     step_size)
+
+
+def strength(floating[::1] net,
+             const floating[::1] activations,
+             const floating[::1] resting,
+             list conn,
+             list mtrs,
+             double minimum,
+             double decay,
+             double step_size):
+    """
+    Fast function for calculating association strength.
+
+    The change in activation is computed in place: net should contain the
+    external input when passed in, and is returned. All arrays should have
+    the same dtype, which is either float32 or float64. Connections in
+    mtrs are applied using their own kernel.
+    """
+    cdef np.intp_t z
+    cdef const floating[::1] c
+    cdef const floating[:, :] mtr
+    # There are as many conn as mtr.
+    for z in range(len(conn)):
+        if not isinstance(mtrs[z], np.ndarray):
+            mtrs[z].propagate(net, conn[z])
+            continue
+        c = conn[z]
+        mtr = mtrs[z]
+        check_rows(mtr)
+        accumulate(net, c, mtr)
+    nonlinearity(net, activations, resting, minimum, decay, step_size)
 
-    return net * step_size
+    return np.asarray(net)
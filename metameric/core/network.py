@@ -2,10 +2,41 @@
 import numpy as np
 
 from collections import defaultdict
+from itertools import islice
 from .layer import Layer
+from .connection import Connection, columns
+from .batch import BatchState
+from .plan import ExecutionPlan
+from .active import ActiveSetPlan
+from .record import get_recorder
+from .encoding import EncodedItem, EncodedSet, signature
+from .state import SnapshotCache
+from .cache import ResultCache, fingerprint
+from .storage import save_network, load_network
+from .parallel import parallel_map
 from tqdm import tqdm
 
 
+RT_DTYPE = np.dtype([("cycles", np.intp),
+                     ("winner", np.intp),
+                     ("activation", np.float64),
+                     ("timed_out", bool),
+                     ("steady", bool)])
+
+
+def _item_key(x):
+    """Get a hashable key for an encoded item."""
+    return tuple((k, x[k].tobytes()) for k in sorted(x))
+
+
+def _length(X):
+    """Get the number of items, or None if X has no length."""
+    try:
+        return len(X)
+    except TypeError:
+        return None
+
+
 class Network(object):
     """
     Interactive activation.
@@ -25,6 +56,10 @@ class Network(object):
     decay_rate : float, optional, default .07
         The decay rate used in the update equations. The decay rate specifies
         the rate at which nodes decay back to their resting state.
+    dtype : np.dtype, optional, default np.float64
+        The floating point type used for all activations and weights in the
+        network. Can be either np.float32 or np.float64. Using np.float32
+        halves the memory needed, at the cost of precision.
 
     Attributes
     ----------
@@ -46,13 +81,37 @@ class Network(object):
         layer.
     checked : bool
         Whether the model has been successfully checked.
+    plan : ExecutionPlan or None
+        The compiled form of the network, which is created by compile.
+    global_rla : float or None
+        The global resting level activation, if the network was built by a
+        Builder.
+    rla_profile : dict
+        For each layer, the resting level activations divided by the global
+        resting level activation. These are set by the Builder, and used by
+        set_params to change the global resting level activation.
+    adaptation : dict
+        For each connection, as a (from layer, to layer) tuple, the number
+        of slots its weights were adapted to by the Builder. The positive
+        weight was divided by this number, and the negative weight was
+        multiplied by it.
+    node_mask : dict or None
+        For each masked layer, a boolean array which is False for the nodes
+        which are masked out. See set_mask.
+    mask_profile : dict
+        The RLA profiles which replace those in rla_profile while the
+        network is masked.
+    active_set_error : float or None
+        The bound on the error in activation of the last call to
+        reaction_times with an active set. See ActiveSetPlan.
 
     """
 
     def __init__(self,
                  minimum=-.2,
                  step_size=1.0,
-                 decay_rate=.07):
+                 decay_rate=.07,
+                 dtype=np.float64):
         """Init function."""
         self.layers = {}
         self.minimum = np.float64(minimum)
@@ -68,11 +127,23 @@ class Network(object):
             raise ValueError("Decay rate should be a positive number, is now"
                              "".format(decay_rate))
         self.decay_rate = np.float64(decay_rate)
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError("dtype should be either float32 or float64, is "
+                             "now {}".format(self.dtype))
         self.outputs = {}
         self.monitors = {}
         self.inputs = {}
         self.feature = {}
         self.checked = False
+        self.plan = None
+        self._fingerprint = None
+        self.global_rla = None
+        self.rla_profile = {}
+        self.adaptation = {}
+        self.node_mask = None
+        self.mask_profile = {}
+        self.active_set_error = None
 
     def __getitem__(self, k):
         """Get a single layer by name."""
@@ -129,9 +200,11 @@ class Network(object):
                       self.minimum,
                       self.step_size,
                       self.decay_rate,
-                      name=layer_name)
+                      name=layer_name,
+                      dtype=self.dtype)
 
         self.layers[layer_name] = layer
+        self.invalidate()
         if is_feature:
             self.feature[layer_name] = layer
         if is_output:
@@ -139,7 +212,129 @@ class Network(object):
         if is_monitor:
             self.monitors[layer_name] = layer
 
-    def _create_mask(self, x):
+    def set_params(self,
+                   weights=None,
+                   global_rla=None,
+                   decay_rate=None,
+                   step_size=None):
+        """
+        Change the parameters of the network without building it again.
+
+        Only the parameters which are passed are changed. Changing the
+        weights requires connections which store their structure separately
+        from their weights, such as those created by a Builder with
+        parametric=True, and takes constant time per connection. Changing the
+        global resting level activation takes time linear in the number of
+        nodes.
+
+        Parameters
+        ----------
+        weights : dict, optional, default None
+            A dictionary with (from layer, to layer) tuples as keys, and
+            (positive weight, negative weight) tuples as values, in the same
+            format as the weights of a Builder. The weights are adapted to
+            the number of slots in the same way as by the Builder.
+        global_rla : float, optional, default None
+            The global resting level activation.
+        decay_rate : float, optional, default None
+            The decay rate.
+        step_size : float, optional, default None
+            The step size.
+
+        """
+        if step_size is not None and not .0 < step_size <= 1.0:
+            raise ValueError("Step size should be greater than 0 and smaller "
+                             "or equal to 1.0, is now {}".format(step_size))
+        if decay_rate is not None and decay_rate <= .0:
+            raise ValueError("Decay rate should be a positive number, is now "
+                             "{}".format(decay_rate))
+        if global_rla is not None and not self.rla_profile:
+            raise ValueError("The global RLA can only be changed for networks "
+                             "built by a Builder.")
+
+        connections = []
+        for (a, b), (pos, neg) in (weights or {}).items():
+            try:
+                layer = self.layers[b]
+                idx = layer._from_connections.index(self.layers[a])
+            except (KeyError, ValueError):
+                raise ValueError("{} is not connected to {}.".format(a, b))
+            mtr = layer.weights[idx]
+            if not isinstance(mtr, Connection) or not mtr.parametric:
+                raise ValueError("The weights from {} to {} are a {}, and "
+                                 "can not be changed. Build the network with "
+                                 "parametric=True "
+                                 "instead.".format(a, b, type(mtr).__name__))
+            connections.append((mtr, self.adaptation.get((a, b), 1), pos, neg))
+
+        for mtr, num_slots, pos, neg in connections:
+            mtr.set_weights(pos / num_slots, neg * num_slots)
+
+        if global_rla is not None:
+            self.global_rla = global_rla
+            self._update_resting()
+        if decay_rate is not None:
+            self.decay_rate = np.float64(decay_rate)
+        if step_size is not None:
+            self.step_size = step_size
+        for layer in self.layers.values():
+            layer.decay_rate = self.decay_rate
+            layer.step_size = self.step_size
+
+        self.invalidate()
+
+    def set_mask(self, mask, rla_profile=None):
+        """
+        Restrict the network to a subset of its nodes.
+
+        Nodes which are masked out are held at the minimum activation, so
+        that they never send input to other nodes, never cross the
+        threshold, and never win. The other nodes behave as if the masked
+        nodes do not exist. Builder.restrict creates masks which make the
+        network equivalent to a network built on a subset of its items.
+
+        Parameters
+        ----------
+        mask : dict or None
+            A dictionary with layer names as keys, and boolean arrays as
+            values, which are True for nodes that are kept. Layers which are
+            not in the dictionary keep all their nodes. If this is None, the
+            mask is removed.
+        rla_profile : dict, optional, default None
+            RLA profiles which replace those in rla_profile while the mask is
+            set. This is used when the resting levels of the subset differ
+            from those of the whole network, such as for a variable RLA.
+
+        """
+        if mask is None:
+            mask, rla_profile = None, None
+        else:
+            mask = {k: np.asarray(v, dtype=bool) for k, v in mask.items()}
+        rla_profile = rla_profile or {}
+        for k in set(mask or {}) | set(rla_profile):
+            if k not in self.rla_profile:
+                raise ValueError("{} has no RLA profile. Only layers of "
+                                 "networks built by a Builder can be "
+                                 "masked.".format(k))
+            if len((mask or rla_profile).get(k, self.rla_profile[k])) != \
+                    len(self.layers[k].resting):
+                raise ValueError("The mask of {} does not have the same "
+                                 "length as the layer.".format(k))
+
+        self.node_mask = mask
+        self.mask_profile = rla_profile
+        self._update_resting()
+        self.invalidate()
+
+    def _update_resting(self):
+        """Set the resting levels from the RLA profiles and the node mask."""
+        for k, profile in self.rla_profile.items():
+            resting = self.global_rla * self.mask_profile.get(k, profile)
+            if self.node_mask is not None and k in self.node_mask:
+                resting = np.where(self.node_mask[k], resting, self.minimum)
+            self.layers[k].resting[:] = resting
+
+    def _create_mask(self, x, cache=None):
         """Create a valid mask given a prime."""
         mask = defaultdict(list)
         for k, v in x.items():
@@ -153,7 +348,13 @@ class Network(object):
             except (ValueError, TypeError):
                 pass
 
-        return self.expand(dict(mask))
+        if cache is None:
+            return self.expand(dict(mask))
+        # Masks only depend on the length of the prime in each layer.
+        key = tuple(sorted((k, len(v)) for k, v in mask.items()))
+        if key not in cache:
+            cache[key] = self.expand(dict(mask))
+        return cache[key]
 
     def prime(self,
               X,
@@ -162,42 +363,246 @@ class Network(object):
               prime_cycles=5,
               mask_cycles=5,
               threshold=.7,
-              strict=True):
-        """Priming experiment."""
+              strict=True,
+              max_memory=2 ** 28):
+        """
+        Priming experiment.
+
+        The state of the network after the prime and mask phases only
+        depends on the prime and the mask. It is snapshotted and reused for
+        all targets which share the same prime, so that each distinct
+        prefix is only simulated once.
+
+        Parameters
+        ----------
+        X : list of dictionaries or EncodedSet
+            The targets.
+        primes : list of dictionaries
+            The prime of each target.
+        max_cycles : int, optional, default 30
+            The maximum number of cycles to run each target for.
+        prime_cycles : int, optional, default 5
+            The number of cycles the prime is presented for.
+        mask_cycles : int, optional, default 5
+            The number of cycles the mask is presented for.
+        threshold : float, optional, default .7
+            The activation threshold. See activate.
+        strict : bool
+            Whether to halt execution if the threshold is not reached when
+            max_cycles have passed.
+        max_memory : int, optional, default 2 ** 28
+            The maximum number of bytes used by cached prefixes. If this is
+            exceeded, the least recently used prefixes are discarded. If
+            this is 0, nothing is cached.
+
+        """
         outputs = []
         if prime_cycles <= 0:
             raise ValueError("Your number of prime cycles is 0, please "
                              "raise it or use the regular activate() function")
-        for x, prime in tqdm(zip(X, primes)):
-
-            # Use "#" as mask.
-            mask = self._create_mask(prime)
-            out = self.activate([prime],
-                                prime_cycles,
-                                True,
-                                threshold=1.0,
-                                strict=False)[0]
-            interm = self.activate([mask],
-                                   mask_cycles,
-                                   False,
-                                   threshold=threshold,
-                                   strict=False)[0]
-            result = self.activate([x],
-                                   max_cycles,
-                                   False,
-                                   threshold=threshold,
-                                   strict=strict)[0]
+        if not isinstance(X, EncodedSet):
+            X = self.encode(X)
+        X.check(self.inputs)
+        # Use "#" as mask.
+        primes = list(primes)
+        cache = {}
+        masks = self.encode([self._create_mask(x, cache) for x in primes])
+        primes = self.encode(primes)
+        prefixes = SnapshotCache(max_memory)
 
-            for x in out:
-                if interm:
-                    out[x] = np.concatenate([out[x], interm[x], result[x]])
-                else:
-                    out[x] = np.concatenate([out[x], result[x]])
+        for x, prime, mask in tqdm(zip(X, primes, masks)):
 
-            outputs.append(out)
+            key = (_item_key(prime), _item_key(mask))
+            cached = prefixes.get(key)
+            if cached is None:
+                out = next(self.activate([prime],
+                                         prime_cycles,
+                                         reset=True,
+                                         threshold=1.0,
+                                         strict=False,
+                                         show_progressbar=False))
+                interm = next(self.activate([mask],
+                                            mask_cycles,
+                                            reset=False,
+                                            threshold=threshold,
+                                            strict=False,
+                                            show_progressbar=False))
+                prefix = {k: np.concatenate([out[k], interm[k]])
+                          for k in out}
+                snapshot = self.snapshot()
+                nbytes = sum([v.nbytes for v in snapshot])
+                nbytes += sum([v.nbytes for v in prefix.values()])
+                prefixes.put(key, (snapshot, prefix), nbytes)
+            else:
+                snapshot, prefix = cached
+                self.restore(snapshot)
+
+            result = next(self.activate([x],
+                                        max_cycles,
+                                        reset=False,
+                                        threshold=threshold,
+                                        strict=strict,
+                                        show_progressbar=False))
+
+            outputs.append({k: np.concatenate([v, result[k]])
+                            for k, v in prefix.items()})
 
         return outputs
 
+    def snapshot(self):
+        """
+        Copy the activations and external input of all nodes.
+
+        The network can be returned to this state using restore, which
+        allows a simulation to be forked from a common starting point.
+
+        Returns
+        -------
+        snapshot : Snapshot
+            The copied state.
+
+        """
+        plan = self.plan if self.plan is not None else self.compile()
+        return plan.state.snapshot()
+
+    def restore(self, snapshot):
+        """
+        Return the network to a state created by snapshot.
+
+        Parameters
+        ----------
+        snapshot : Snapshot
+            The state to restore. Must have been created by the same
+            network.
+
+        """
+        plan = self.plan if self.plan is not None else self.compile()
+        plan.state.restore(snapshot)
+        plan.invalidate()
+
+    def _check_run(self, max_cycles, clamp_cycles, threshold):
+        """Check the arguments of a run, and return the clamp cycles."""
+        if not self.checked:
+            raise ValueError("Your model is not checked.")
+        if max_cycles <= 0:
+            raise ValueError("max_cycles must be > 0, is now "
+                             "{}".format(max_cycles))
+        if threshold > 1.0 or threshold <= .0:
+            raise ValueError("Threshold should be 0 < x <= 1.0, is now "
+                             "{}".format(threshold))
+        if clamp_cycles is None:
+            clamp_cycles = max_cycles
+        if clamp_cycles <= 0:
+            raise ValueError("Clamp cycles should be > 0, is now "
+                             "{}".format(clamp_cycles))
+
+        if 0 < clamp_cycles < 1.0:
+            clamp_cycles = max_cycles * clamp_cycles
+
+        return clamp_cycles
+
+    def _check_steady(self, tolerance, patience, max_cycles, clamp_cycles):
+        """Check the steady state arguments, and return the first cycle."""
+        if tolerance is not None and tolerance < 0:
+            raise ValueError("tolerance should be >= 0, is now "
+                             "{}".format(tolerance))
+        if patience <= 0:
+            raise ValueError("patience should be > 0, is now "
+                             "{}".format(patience))
+        # A steady state before the input is unclamped is not a fixed point.
+        if clamp_cycles < max_cycles:
+            return clamp_cycles
+        return 0
+
+    def _input_layers(self, inputs=None):
+        """Get the layers onto which inputs are clamped."""
+        if inputs:
+            return {k: self.layers[k] for k in inputs}
+        return self.inputs
+
+    def _check_items(self, X, input_layers):
+        """Check whether an encoded set was encoded for the input layers."""
+        if isinstance(X, EncodedSet):
+            X.check(input_layers)
+
+    def encode(self, X, inputs=None):
+        """
+        Encode a set of items into node indices for each input layer.
+
+        The symbols of all items are resolved to the indices of their nodes
+        once, so that clamping an encoded item is a single assignment per
+        input layer. The encoded set can be passed to activate,
+        reaction_times, activate_batch and prime instead of X, and can be
+        saved to disk to skip encoding in later runs.
+
+        Parameters
+        ----------
+        X : list of dictionaries
+            The inputs to the model. The dictionaries have layer names as their
+            keys, and tuples of symbols as their values.
+        inputs : tuple of strings
+            The layers to encode. If this is None, the input layers of the
+            network are encoded.
+
+        Returns
+        -------
+        encoded : EncodedSet
+            The encoded items.
+
+        """
+        if not self.checked:
+            raise ValueError("Your model is not checked.")
+        input_layers = self._input_layers(inputs)
+        indices = {k: [] for k in input_layers}
+        offsets = {k: [0] for k in input_layers}
+        for x in X:
+            for k, layer in input_layers.items():
+                data = x[k] if isinstance(x, dict) else x
+                if isinstance(data, np.ndarray):
+                    raise ValueError("Inputs which are arrays can not be "
+                                     "encoded.")
+                if not isinstance(data, (tuple, set, list)):
+                    data = [data]
+                indices[k].extend([layer.name2idx[p] for p in data])
+                offsets[k].append(len(indices[k]))
+
+        return EncodedSet({k: np.array(v, dtype=np.intp)
+                           for k, v in indices.items()},
+                          {k: np.array(v, dtype=np.intp)
+                           for k, v in offsets.items()},
+                          {k: signature(v) for k, v in input_layers.items()})
+
+    def _clamp(self, ext_input, layer, x):
+        """Write the external input of item x for a layer to ext_input."""
+        if isinstance(x, EncodedItem):
+            ext_input[x[layer.name]] = 1
+            return
+        if isinstance(x, dict):
+            data = x[layer.name]
+        else:
+            data = x
+        if isinstance(data, np.ndarray):
+            ext_input[:] = data
+        else:
+            if not isinstance(data, (tuple, set, list)):
+                data = [data]
+            ext_input[[layer.name2idx[p] for p in data]] = 1
+
+    def _present(self, x, input_layers, reset=True):
+        """Reset the network, and clamp an item onto the input layers."""
+        # Reset all layers to their resting levels.
+        if reset:
+            self._reset()
+
+        # Clamp the inputs
+        for name, layer in input_layers.items():
+            # Can be necessary if someone wants to clamp orthography
+            # Reset only the input layer to 0
+            layer.reset()
+            self._clamp(layer.ext_input, layer, x)
+        if self.plan is not None:
+            self.plan.invalidate()
+
     def activate(self,
                  X,
                  max_cycles=30,
@@ -207,15 +612,19 @@ class Network(object):
                  strict=True,
                  inputs=None,
                  shallow_run=False,
-                 show_progressbar=True):
+                 show_progressbar=True,
+                 record="full",
+                 n_jobs=1,
+                 tolerance=None,
+                 patience=5):
         """
         Activate the model by clamping an input and letting it oscillate.
 
         Parameters
         ----------
-        X : list of dictionaries
+        X : list of dictionaries or EncodedSet
             The inputs to the model. The dictionaries have layer names as their
-            keys, and tuples of symbols as their values.
+            keys, and tuples of symbols as their values. See encode.
         max_cycles : int, optional, default 30
             The maximum number of cycles to run the activation for.
         clamp_cycles : int or float, optional, default None
@@ -238,111 +647,504 @@ class Network(object):
             Use this field to override the behavior of the network and to
             specify your own inputs.
         shallow_run : bool, optional, default False
-            If a run is shallow, only the final activations are returned.
+            If a run is shallow, only the names and activations of the
+            positive nodes are returned. This is equivalent to passing
+            "active" as record, and overrides it.
         show_progressbar : bool, optional, default True
             Whether to show the progress bar.
+        record : str or Recorder, optional, default "full"
+            The policy with which the output layers are recorded. This can
+            be a Recorder from metameric.core.record, or the name of one of
+            the following policies:
+                "full": the activations of all nodes at every cycle.
+                "final": the activations of all nodes after the last cycle.
+                "winner": the number of cycles, and the name and activation
+                of the most active node.
+                "active": the active nodes at every cycle.
+            Recording every k-th cycle, the k most active nodes, or a subset
+            of nodes is done by passing an Every, TopK or Subset recorder.
+        n_jobs : int, optional, default 1
+            The number of processes to use. If this is not 1, the items are
+            divided over worker processes, which share the weights of the
+            network through shared memory. Results are still returned in
+            order. If this is -1, one process per cpu is used.
+        tolerance : float, optional, default None
+            If this is not None, a run also ends when the network has
+            reached a steady state: when the maximum absolute change in
+            activation over all nodes has been at most tolerance for
+            patience consecutive cycles, after the input has been unclamped.
+            Such an item has converged without being recognized, and is
+            treated as an item which reached max_cycles: its result is
+            padded forward with its last state up to max_cycles.
+            If tolerance is 0, this only happens at an exact fixed point,
+            which the remaining cycles would not have left, so that the
+            result is identical to that of a full run. Otherwise, the
+            padding is an approximation: the remaining cycles would have
+            kept changing the activations by small amounts, which add up
+            to more than tolerance.
+        patience : int, optional, default 5
+            The number of consecutive cycles the change has to stay at or
+            below tolerance.
 
         """
-        if not self.checked:
-            raise ValueError("Your model is not checked.")
-        if max_cycles <= 0:
-            raise ValueError("max_cycles must be > 0, is now "
-                             "{}".format(max_cycles))
-        if threshold > 1.0 or threshold <= .0:
-            raise ValueError("Threshold should be 0 < x <= 1.0, is now "
-                             "{}".format(threshold))
-        if clamp_cycles is None:
-            clamp_cycles = max_cycles
-        if clamp_cycles <= 0:
-            raise ValueError("Clamp cycles should be > 0, is now "
-                             "{}".format(clamp_cycles))
-
-        if 0 < clamp_cycles < 1.0:
-            clamp_cycles = max_cycles * clamp_cycles
-
-        if inputs:
-            input_layers = {k: self.layers[k] for k in inputs}
-        else:
-            input_layers = self.inputs
+        clamp_cycles = self._check_run(max_cycles, clamp_cycles, threshold)
+        release = self._check_steady(tolerance,
+                                     patience,
+                                     max_cycles,
+                                     clamp_cycles)
+        input_layers = self._input_layers(inputs)
+        self._check_items(X, input_layers)
+        if shallow_run:
+            record = "active"
+        if n_jobs != 1:
+            if not reset:
+                raise ValueError("Items can only be run in parallel if the "
+                                 "network is reset between items.")
+            results = parallel_map(self,
+                                   "activate",
+                                   X,
+                                   n_jobs,
+                                   max_cycles=max_cycles,
+                                   clamp_cycles=clamp_cycles,
+                                   threshold=threshold,
+                                   strict=strict,
+                                   inputs=inputs,
+                                   record=record,
+                                   tolerance=tolerance,
+                                   patience=patience)
+            with tqdm(total=_length(X), disable=not show_progressbar) as bar:
+                for chunk in results:
+                    for result in chunk:
+                        yield result
+                    bar.update(len(chunk))
+            return
+        recorder = get_recorder(record)
+        plan = self.plan if self.plan is not None else self.compile()
+        recorder.start(self, max_cycles)
+        track = tolerance is not None
 
         for x in tqdm(X, disable=not show_progressbar):
 
-            # Reset all layers to their resting levels.
-            if reset:
-                self._reset()
-
-            # Clamp the inputs
-            for name, layer in input_layers.items():
-                if isinstance(x, dict):
-                    data = x[name]
-                else:
-                    data = x
-                # Can be necessary if someone wants to clamp orthography
-                # Reset only the input layer to 0
-                layer.reset()
-                if isinstance(data, np.ndarray):
-                    layer.ext_input[:] = np.copy(data)
-                else:
-                    if not isinstance(data, (tuple, set, list)):
-                        data = [data]
-                    layer.ext_input[[layer.name2idx[p] for p in data]] = 1
-
-            # Prepare the activations
-            activations = defaultdict(list)
+            self._present(x, input_layers, reset)
+            recorder.reset()
+            recognized = False
+            steady = 0
 
             for idx in range(max_cycles):
 
                 if clamp_cycles is not None and idx == clamp_cycles:
                     for name, layer in self.layers.items():
                         layer.ext_input *= 0
+                    plan.invalidate()
 
                 # Let the network oscillate once.
-                self._single_cycle()
+                plan.step(track)
 
                 # Copy to the output buffer.
-                for k, l in self.outputs.items():
-                    if shallow_run:
-                        activations[k].append(list(l.active()))
-                    else:
-                        act = np.copy(l.activations)
-                        activations[k].append(act)
+                recorder.record(idx)
 
                 # Check the monitor layers for convergence
-                if self.monitors:
-                    if np.all([np.any(l.activations > threshold)
-                               for l in self.monitors.values()]):
+                if plan.converged(threshold):
+                    recognized = True
+                    break
+
+                # Check whether the network has reached a steady state.
+                if track:
+                    steady = steady + 1 if plan.change() <= tolerance else 0
+                    if steady >= patience and idx >= release:
+                        # The remaining cycles would record the same state.
+                        recorder.pad(idx + 1, max_cycles)
+                        idx = max_cycles - 1
                         break
-            else:
 
-                # If the maximum number of cycles has been reached, we
-                # might throw an error, depending on the value of the strict
-                # flag.
-                if strict:
-                    max_activation = max([max(x.activations)
-                                          for x in self.monitors.values()])
-                    raise ValueError("Maximum cycles reached, maximum "
-                                     "activation was {}, input was {}"
-                                     "".format(max_activation, x))
-
-            if shallow_run:
-                yield dict(activations)
-            else:
-                yield {k: np.array(v) for k, v in activations.items()}
+            # If the maximum number of cycles has been reached, we
+            # might throw an error, depending on the value of the strict
+            # flag.
+            if strict and not recognized:
+                max_activation = max([max(x.activations)
+                                      for x in self.monitors.values()])
+                raise ValueError("Maximum cycles reached, maximum "
+                                 "activation was {}, input was {}"
+                                 "".format(max_activation, x))
+
+            yield recorder.result(idx + 1)
+
+    def reaction_times(self,
+                       X,
+                       max_cycles=30,
+                       clamp_cycles=None,
+                       threshold=.7,
+                       inputs=None,
+                       layer=None,
+                       show_progressbar=True,
+                       n_jobs=1,
+                       tolerance=None,
+                       patience=5,
+                       cache=None,
+                       active_set=None):
+        """
+        Get the number of cycles it takes for each item to be recognized.
+
+        This gives the same cycle counts as activate, but nothing is recorded
+        during a run. The network is always reset between items.
+
+        Parameters
+        ----------
+        X : list of dictionaries or EncodedSet
+            The inputs to the model. The dictionaries have layer names as their
+            keys, and tuples of symbols as their values. See encode.
+        max_cycles : int, optional, default 30
+            The maximum number of cycles to run the activation for.
+        clamp_cycles : int or float, optional, default None
+            The number of cycles to clamp the input for. See activate.
+        threshold : float, optional, default .7
+            The activation threshold. Once all monitor layers reach this
+            activation level, the item is recognized.
+        inputs : tuple of strings
+            Use this field to override the behavior of the network and to
+            specify your own inputs.
+        layer : str, optional, default None
+            The layer from which to take the winning node. If this is None,
+            the first output layer is used.
+        show_progressbar : bool, optional, default True
+            Whether to show the progress bar.
+        n_jobs : int, optional, default 1
+            The number of processes to use. See activate.
+        tolerance : float, optional, default None
+            The tolerance for steady state detection. See activate.
+        patience : int, optional, default 5
+            The number of consecutive cycles the change has to stay below
+            tolerance. See activate.
+        cache : str or ResultCache, optional, default None
+            If this is not None, results are looked up in and stored to a
+            ResultCache, or to a ResultCache in the directory with this
+            name. Only items which are not in the cache are simulated.
+        active_set : str or tuple of str, optional, default None
+            The names of large layers, such as a layer of words, in which
+            only the nodes whose input differs from that of the rest of the
+            layer are updated one by one. All other nodes are updated at
+            once in closed form. This is exact up to rounding errors, and
+            the bound on these errors is stored in active_set_error. See
+            ActiveSetPlan. Can not be combined with tolerance or n_jobs.
+
+        Returns
+        -------
+        result : np.recarray
+            A record array with one row per item, with the following fields:
+                cycles: the number of cycles the item ran for.
+                winner: the index of the most active node in layer. Use
+                the idx2name of the layer to get its name.
+                activation: the activation of the winning node.
+                timed_out: whether the threshold was not reached within
+                max_cycles.
+                steady: whether the item converged to a steady state
+                without being recognized. These items also timed out, and
+                their winner is taken from the steady state.
+
+        """
+        clamp_cycles = self._check_run(max_cycles, clamp_cycles, threshold)
+        release = self._check_steady(tolerance,
+                                     patience,
+                                     max_cycles,
+                                     clamp_cycles)
+        input_layers = self._input_layers(inputs)
+        self._check_items(X, input_layers)
+        if layer is None:
+            layer = next(iter(self.outputs))
+        if active_set is not None:
+            if isinstance(active_set, str):
+                active_set = (active_set,)
+            active_set = tuple(active_set)
+            if tolerance is not None or n_jobs != 1:
+                raise ValueError("An active set can not be combined with "
+                                 "tolerance or n_jobs.")
+        if cache is not None:
+            if not isinstance(cache, ResultCache):
+                cache = ResultCache(cache)
+            return cache.reaction_times(self,
+                                        X,
+                                        max_cycles=max_cycles,
+                                        clamp_cycles=clamp_cycles,
+                                        threshold=threshold,
+                                        inputs=inputs,
+                                        layer=layer,
+                                        show_progressbar=show_progressbar,
+                                        n_jobs=n_jobs,
+                                        tolerance=tolerance,
+                                        patience=patience,
+                                        active_set=active_set)
+        if n_jobs != 1:
+            results = parallel_map(self,
+                                   "reaction_times",
+                                   X,
+                                   n_jobs,
+                                   max_cycles=max_cycles,
+                                   clamp_cycles=clamp_cycles,
+                                   threshold=threshold,
+                                   inputs=inputs,
+                                   layer=layer,
+                                   tolerance=tolerance,
+                                   patience=patience)
+            chunks = []
+            with tqdm(total=_length(X), disable=not show_progressbar) as bar:
+                for chunk in results:
+                    chunks.append(chunk)
+                    bar.update(len(chunk))
+            if not chunks:
+                return np.rec.array(np.zeros(0, dtype=RT_DTYPE))
+            return np.rec.array(np.concatenate(chunks))
+        if active_set is not None:
+            if getattr(self.plan, "layers", None) != active_set:
+                self.compile(active_set)
+            plan = self.plan
+            plan.reset_error()
+        else:
+            plan = self.plan if self.plan is not None else self.compile()
+        activations = self.layers[layer].activations
+        ext_input = plan.state.ext_input
+        track = tolerance is not None
+
+        result = []
+        for x in tqdm(X, disable=not show_progressbar):
+
+            self._present(x, input_layers)
+            timed_out = True
+            settled = False
+            steady = 0
+            if active_set is not None:
+                plan.begin()
+            try:
+                for idx in range(max_cycles):
+                    if idx == clamp_cycles:
+                        ext_input[:] = 0
+                        plan.invalidate()
+                    plan.step(track)
+                    if plan.converged(threshold):
+                        timed_out = False
+                        break
+                    if track:
+                        steady = (steady + 1 if plan.change() <= tolerance
+                                  else 0)
+                        if steady >= patience and idx >= release:
+                            settled = True
+                            idx = max_cycles - 1
+                            break
+            finally:
+                if active_set is not None:
+                    plan.end()
+
+            winner = activations.argmax()
+            result.append((idx + 1,
+                           winner,
+                           activations[winner],
+                           timed_out,
+                           settled))
+
+        if active_set is not None:
+            self.active_set_error = plan.error
+        return np.rec.array(np.array(result, dtype=RT_DTYPE))
+
+    def activate_batch(self,
+                       X,
+                       batch_size=64,
+                       max_cycles=30,
+                       clamp_cycles=None,
+                       threshold=.7,
+                       strict=True,
+                       inputs=None,
+                       show_progressbar=True,
+                       record="full"):
+        """
+        Activate the model on batches of items simultaneously.
+
+        This gives the same results as activate, but simulates batch_size
+        items at the same time. The state of all items in a batch is kept in
+        preallocated matrices with one row per item, and every cycle calls
+        each kernel once for the whole batch, instead of once per item.
+        Items which have converged stop being updated, while the remaining
+        items in the batch continue.
+
+        Batching pays off when the cost of a cycle is dominated by the
+        fixed cost of calling the kernels, as in networks with small layers
+        or sparse connections, and when little is recorded per cycle. See
+        experiments/benchmark_batch.py.
+
+        The network is always reset between items, and the state of the
+        layers in the network is not modified.
+
+        Parameters
+        ----------
+        X : list of dictionaries
+            The inputs to the model. The dictionaries have layer names as their
+            keys, and tuples of symbols as their values.
+        batch_size : int, optional, default 64
+            The number of items to simulate at the same time.
+        max_cycles : int, optional, default 30
+            The maximum number of cycles to run the activation for.
+        clamp_cycles : int or float, optional, default None
+            The number of cycles to clamp the input for. See activate.
+        threshold : float, optional, default .7
+            The activation threshold. Once one of the output layers reaches
+            this activation level, the item is considered to be finished.
+        strict : bool
+            Whether to halt execution if the threshold is not reached when
+            max_cycles have passed.
+        inputs : tuple of strings
+            Use this field to override the behavior of the network and to
+            specify your own inputs.
+        show_progressbar : bool, optional, default True
+            Whether to show the progress bar.
+        record : str or Recorder, optional, default "full"
+            The policy with which the output layers are recorded. See
+            activate.
+
+        """
+        clamp_cycles = self._check_run(max_cycles, clamp_cycles, threshold)
+        if batch_size <= 0:
+            raise ValueError("batch_size must be > 0, is now "
+                             "{}".format(batch_size))
+        input_layers = self._input_layers(inputs)
+        self._check_items(X, input_layers)
+
+        total = _length(X)
+        X = iter(X)
+        state = BatchState(self, batch_size, get_recorder(record), max_cycles)
+
+        with tqdm(total=total, disable=not show_progressbar) as bar:
+            while True:
+                batch = list(islice(X, batch_size))
+                if not batch:
+                    break
+                for slot, x in enumerate(batch):
+                    state.load(slot, x, input_layers)
+
+                results = [None] * len(batch)
+                while state.rows:
+                    state.step(clamp_cycles)
+                    slots, _ = state.finished(threshold, max_cycles, strict)
+                    for slot in slots:
+                        results[slot] = state.retire(slot)
+
+                bar.update(len(batch))
+                for result in results:
+                    yield result
+
+    def compile(self, active_set=None):
+        """
+        Freeze the network into an ExecutionPlan.
+
+        The plan moves the activations, resting levels and external inputs
+        of all layers into flat preallocated buffers, of which the arrays of
+        the layers become views. All connections are combined into a single
+        block operator over these buffers, so that a cycle is a single
+        operator application followed by the nonlinearity, and does not
+        allocate any memory.
+
+        Compiling happens automatically before the first cycle, and the plan
+        is shared by activate, prime and diagnostic_run. It has to be redone
+        after the topology of the network changes, which happens
+        automatically when layers are created or connected.
+
+        Parameters
+        ----------
+        active_set : tuple of str, optional, default None
+            If this is not None, the network is compiled into an
+            ActiveSetPlan, which can simulate these layers with an active
+            set. Outside of reaction_times with an active set, this plan
+            behaves like an ExecutionPlan.
+
+        Returns
+        -------
+        plan : ExecutionPlan
+            The compiled network.
+
+        """
+        if active_set is not None:
+            self.plan = ActiveSetPlan(self, active_set)
+            return self.plan
+        self.plan = ExecutionPlan(self)
+        return self.plan
+
+    def invalidate(self):
+        """
+        Forget everything which was derived from the network.
+
+        This removes the compiled plan, and the fingerprint which identifies
+        the network in a ResultCache. Methods which change the network, such
+        as connect_layers, set_params and set_mask, call this themselves.
+        Call it after changing weights or resting levels in place.
+        """
+        self.plan = None
+        self._fingerprint = None
+
+    def fingerprint(self):
+        """
+        Get a hash of everything which determines the output of the network.
+
+        The hash is computed once, and reused until the network is
+        invalidated, so that it does not have to read all weights again,
+        which, for a memory-mapped network, would read them from disk.
+
+        Returns
+        -------
+        fingerprint : str
+            The hexadecimal digest of the hash, see cache.fingerprint.
+
+        """
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self)
+        return self._fingerprint
+
+    def save(self, path):
+        """
+        Save the network to a directory.
+
+        The directory contains a manifest.json with the parameters, layers
+        and connections of the network, and a .npy file for every resting
+        level vector and weight matrix. See metameric.core.storage for a
+        description of the format.
+
+        Parameters
+        ----------
+        path : str
+            The directory to save the network to.
+
+        """
+        save_network(self, path)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """
+        Load a network which was saved using save.
+
+        Parameters
+        ----------
+        path : str
+            The directory the network was saved to.
+        mmap : bool, optional, default True
+            Whether to memory-map the weight matrices, which makes loading
+            almost instant. Memory-mapped weights are read from disk when
+            they are first used.
+
+        Returns
+        -------
+        network : Network
+            The loaded network.
+
+        """
+        return load_network(path, mmap)
 
     def _single_cycle(self):
         """Perform a single pass through the network."""
-        updates = {}
+        if self.plan is None:
+            self.compile()
+        self.plan.step()
 
-        # The updates are synchronous, so all updates are first calculated,
-        # and then applied simultaneously.
-        for k, layer in self.layers.items():
-            # Static layers don't get updated.
-            updates[k] = layer.activate()
-        for k, v in updates.items():
-            self.layers[k].activations[:] += v
-            self.layers[k].activations = np.clip(self.layers[k].activations,
-                                                 a_min=self.minimum,
-                                                 a_max=1.0)
+    def _converged(self, threshold):
+        """Check whether all monitor layers have crossed the threshold."""
+        if self.plan is None:
+            self.compile()
+        return self.plan.converged(threshold)
 
     def _collect_net(self):
         """Convenience function for diagnostic."""
@@ -359,6 +1161,8 @@ class Network(object):
         """Reset the activation of all nodes back to their resting levels."""
         for layer in self.layers.values():
             layer.reset()
+        if self.plan is not None:
+            self.plan.invalidate()
 
     def connect_layers(self, from_name, to_name, weights):
         """
@@ -370,14 +1174,17 @@ class Network(object):
             The name of the originating layer.
         to_name : str
             The name of the terminating layer.
-        weights : np.array
-            The weight matrix used to connect both layers.
+        weights : np.array or Connection
+            The weight matrix used to connect both layers. Connections, such
+            as a UniformConnection, describe the weights without storing
+            them all.
 
         """
         to_layer = self.layers[to_name]
         from_layer = self.layers[from_name]
         to_layer.add_from_connection(from_layer, weights)
         from_layer.add_to_connection(to_layer)
+        self.invalidate()
 
     def __repr__(self):
         """Print the metameric."""
@@ -416,10 +1223,8 @@ class Network(object):
                 # connections.
                 s.append(self._collect_net())
                 # Check the monitor layers for convergence
-                if self.monitors:
-                    if np.all([np.any(l.activations > threshold)
-                               for l in self.monitors.values()]):
-                        break
+                if self._converged(threshold):
+                    break
 
             strengths.append(s)
 
@@ -447,10 +1252,10 @@ class Network(object):
                             continue
                         else:
                             raise e
-                mtr = c.weight_matrices[k]
+                mtr = columns(c.weight_matrices[k], i)
                 if k not in self.feature and k2 not in self.feature:
                     idxes = defaultdict(set)
-                    a, b = np.nonzero(mtr[:, i] > 0)
+                    a, b = np.nonzero(mtr > 0)
                     for x, y in zip(a, b):
                         idxes[y].add(x)
                     i = list(idxes.values())
@@ -459,7 +1264,7 @@ class Network(object):
                     else:
                         idxes = set.intersection(*list(idxes.values()))
                 else:
-                    idxes = np.nonzero(mtr[:, i] > 0)[0]
+                    idxes = np.nonzero(mtr > 0)[0]
                 item[k] = {v.idx2name[x] for x in idxes}
                 if mask is not None and k in self.feature:
                     feats = [(x, y) for x, y in v.node_names
@@ -0,0 +1,212 @@
+"""Run networks in multiple processes, with weights in shared memory."""
+import multiprocessing
+import numpy as np
+import os
+
+from itertools import islice
+from multiprocessing.shared_memory import SharedMemory
+from .connection import Connection, make_connection
+
+
+# The network of the current worker process.
+_network = None
+# The shared memory blocks the worker network is built on.
+_blocks = []
+
+
+def _attach(name):
+    """Attach to an existing shared memory block without owning it."""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before python 3.13, attaching also registers the block with the
+        # resource tracker. Workers share the tracker of the parent process,
+        # which unregisters the block when it is unlinked.
+        return SharedMemory(name=name)
+
+
+class SharedNetwork(object):
+    """
+    A network whose weights live in shared memory.
+
+    The network is exported into a specification, which contains the names
+    of the shared memory blocks instead of the arrays themselves. Worker
+    processes rebuild the network from this specification, with weight
+    matrices that are views into the shared blocks, so that the weights are
+    neither pickled nor duplicated for each worker.
+
+    The resting levels are also passed through shared memory, but every
+    worker copies them into its own layers and network state, like its
+    activations. They have a single value per node, so that this copy is
+    small compared to the weights.
+
+    Use this class as a context manager: the shared memory is released when
+    the context is exited.
+
+    Parameters
+    ----------
+    network : Network
+        The network to share.
+
+    """
+
+    def __init__(self, network):
+        """Init function."""
+        self.blocks = []
+        self.spec = self._export(network)
+
+    def _share(self, array):
+        """Copy an array into a new shared memory block."""
+        array = np.ascontiguousarray(array)
+        shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+        self.blocks.append(shm)
+        return (shm.name, array.shape, array.dtype.str)
+
+    def _export(self, network):
+        """Create a picklable description of the network."""
+        layers = []
+        connections = []
+        for k, layer in network.layers.items():
+            layers.append((k,
+                           self._share(layer.resting),
+                           layer.node_names,
+                           k in network.outputs,
+                           k in network.monitors,
+                           k in network.feature))
+            for src, mtr in zip(layer._from_connections, layer.weights):
+                if isinstance(mtr, Connection):
+                    arrays = {name: self._share(x)
+                              for name, x in mtr.arrays.items()}
+                    connections.append((src.name,
+                                        k,
+                                        mtr.kind,
+                                        (mtr.shape, mtr.params, arrays)))
+                else:
+                    connections.append((src.name, k, None, self._share(mtr)))
+
+        return {"minimum": network.minimum,
+                "step_size": network.step_size,
+                "decay_rate": network.decay_rate,
+                "dtype": network.dtype.str,
+                "node_mask": network.node_mask,
+                "layers": layers,
+                "connections": connections}
+
+    def close(self):
+        """Release the shared memory."""
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args):
+        """Exit the context, releasing the shared memory."""
+        self.close()
+
+
+def _view(block):
+    """Get an array which is a view into a shared memory block."""
+    name, shape, dtype = block
+    shm = _attach(name)
+    _blocks.append(shm)
+    return np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_worker(spec):
+    """Rebuild the shared network in a worker process."""
+    # Imported here to avoid a circular import.
+    from .network import Network
+
+    global _network
+    m = Network(minimum=spec["minimum"],
+                step_size=spec["step_size"],
+                decay_rate=spec["decay_rate"],
+                dtype=spec["dtype"])
+    for name, resting, node_names, output, monitor, feature in spec["layers"]:
+        m.create_layer(name, _view(resting), node_names, output, monitor,
+                       feature)
+    for src, dest, kind, weights in spec["connections"]:
+        if kind is None:
+            mtr = _view(weights)
+        else:
+            shape, params, arrays = weights
+            arrays = {name: _view(x) for name, x in arrays.items()}
+            mtr = make_connection(kind, shape, params, arrays, spec["dtype"])
+        m.connect_layers(src, dest, mtr)
+    # The resting levels were copied from a network with this mask.
+    m.node_mask = spec["node_mask"]
+    m.check()
+    _network = m
+
+
+def _run_chunk(args):
+    """Run a method of the worker network on a chunk of items."""
+    method, chunk, kwargs = args
+    result = getattr(_network, method)(chunk, **kwargs)
+    if method == "reaction_times":
+        return result
+    return list(result)
+
+
+def parallel_map(network,
+                 method,
+                 X,
+                 n_jobs=-1,
+                 chunksize=64,
+                 **kwargs):
+    """
+    Run a method of a network on X in multiple processes.
+
+    X is split into chunks, each of which is passed to the method in a
+    worker process. Results are returned as soon as they are ready, in the
+    order of X.
+
+    Parameters
+    ----------
+    network : Network
+        The network to run.
+    method : str
+        The name of the method to run, e.g. "activate" or "reaction_times".
+    X : iterable
+        The items to run.
+    n_jobs : int, optional, default -1
+        The number of worker processes. If this is -1, one process per
+        cpu is used.
+    chunksize : int, optional, default 64
+        The number of items sent to a worker at a time.
+    kwargs : dict
+        Keyword arguments passed to the method.
+
+    Returns
+    -------
+    results : generator
+        The result of the method for each chunk.
+
+    """
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if n_jobs <= 0:
+        raise ValueError("n_jobs should be > 0 or -1, is now "
+                         "{}".format(n_jobs))
+    kwargs["show_progressbar"] = False
+
+    X = iter(X)
+    chunks = iter(lambda: list(islice(X, chunksize)), [])
+    tasks = ((method, chunk, kwargs) for chunk in chunks)
+
+    with SharedNetwork(network) as shared:
+        pool = multiprocessing.Pool(n_jobs,
+                                    initializer=_init_worker,
+                                    initargs=(shared.spec,))
+        try:
+            for result in pool.imap(_run_chunk, tasks):
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,242 @@
+"""Compiled execution plans for networks."""
+import numpy as np
+
+from .metric import propagate, update
+from .state import NetworkState
+
+
+class BlockOperator(object):
+    """
+    A block-structured weight operator over the flat state of a network.
+
+    Every connection in the network is a single block, which maps a slice
+    of the state vector onto another slice of the state vector. Applying the
+    operator adds the input of all positive nodes to the net input of the
+    nodes they are connected to.
+
+    The blocks are applied one after another, with one kernel call per
+    block, rather than by a single fused kernel. Every kind of connection
+    has its own kernel, and a fused kernel would have to know all of them,
+    for both floating point types, so that connections could no longer be
+    added through make_connection. A network has a handful of blocks, and
+    calling a kernel costs about 2 microseconds, which is small compared
+    to the work the kernels do.
+
+    Parameters
+    ----------
+    blocks : list of tuples
+        Each block is a tuple of (from slice, to slice, weight matrix).
+        Blocks with the same destination are applied in the order in which
+        they are passed. A bound block without a weight matrix adds a
+        precomputed input instead, see ExecutionPlan.
+
+    """
+
+    def __init__(self, blocks):
+        """Init function."""
+        self.blocks = blocks
+
+    def bind(self, x, out):
+        """Precompute the views on x and out used by each block."""
+        return [(out[dest], x[src], mtr) for src, dest, mtr in self.blocks]
+
+    @staticmethod
+    def apply(bound):
+        """Apply a bound operator."""
+        for net, c, mtr in bound:
+            if mtr is None:
+                net += c
+            else:
+                propagate(net, c, mtr)
+
+
+class ExecutionPlan(object):
+    """
+    A network, frozen into a fixed order of operations.
+
+    The plan consists of the flat state of the network, a single block
+    operator over this state, and precomputed slices for the output and
+    monitor layers. A single cycle is one application of the operator,
+    followed by the nonlinearity over all non-static nodes.
+
+    Static layers only change through their external input. Once a cycle
+    leaves their activations unchanged, they stay the same until their
+    external input changes, so the input they send is computed once, and
+    added as a constant in all following cycles. Whenever the activations
+    or external input of static layers are changed outside of step, such
+    as when an item is clamped or clamp_cycles expires, invalidate has to
+    be called.
+
+    Folding the input of static layers into a constant does not change the
+    order in which the input of a node is summed, so that the results are
+    identical to those without folding. This is only the case for the
+    static blocks which come before all other blocks into the same layer,
+    and only while that layer has no external input. Other static blocks
+    are applied in every cycle, as usual.
+
+    Parameters
+    ----------
+    network : Network
+        The network to compile.
+
+    Attributes
+    ----------
+    state : NetworkState
+        The flat state of the network.
+    operator : BlockOperator
+        The weights of the network.
+    outputs : dict
+        A mapping from output layer names to their slice of the state.
+    monitors : list
+        The slices of the monitor layers.
+
+    """
+
+    def __init__(self, network):
+        """Init function."""
+        self.network = network
+        self.state = state = NetworkState(network.layers)
+        state.bind()
+
+        blocks = []
+        for k, dest in sorted(state.slices.items(), key=lambda x: x[1].start):
+            layer = network.layers[k]
+            for src, mtr in zip(layer._from_connections, layer.weights):
+                blocks.append((state.slices[src.name], dest, mtr))
+
+        self.operator = BlockOperator(blocks)
+        self.outputs = {k: state.slices[k] for k in network.outputs}
+        self.monitors = [state.slices[k] for k in network.monitors]
+
+        # Views which are used in every cycle.
+        dynamic = slice(state.n_static, len(state))
+        self._bound = self.operator.bind(state.activations, state.net)
+        self._static_net = state.net[:state.n_static]
+        self._net = state.net[dynamic]
+        self._activations = state.activations[dynamic]
+        self._resting = state.resting[dynamic]
+        self._monitors = [state.activations[sl] for sl in self.monitors]
+        self._previous = np.zeros_like(state.activations)
+        self._delta = np.zeros_like(state.activations)
+
+        # The positions of the nodes which are masked out, if any.
+        masked = [np.flatnonzero(~m) + state.slices[k].start
+                  for k, m in (network.node_mask or {}).items()]
+        masked = np.concatenate(masked) if masked else []
+        self._masked = masked if len(masked) else None
+
+        # For every layer, the static blocks which come before all other
+        # blocks into that layer, and the constant input they are replaced
+        # by while the static layers do not change.
+        groups = {}
+        for idx, (src, dest, _) in enumerate(blocks):
+            group = groups.setdefault(dest.start, [dest, [], True])
+            group[2] = group[2] and src.stop <= state.n_static
+            if group[2]:
+                group[1].append(idx)
+        self._static = [(state.ext_input[dest], indices,
+                         np.zeros_like(state.net[dest]))
+                        for dest, indices, _ in groups.values() if indices]
+        self._folded_bound = self._bound
+        self._folded_blocks = list(range(len(blocks)))
+        self._folded = False
+        self._static_activations = state.activations[:state.n_static]
+        self._static_previous = np.zeros_like(self._static_activations)
+        self._static_changed = np.zeros(state.n_static, dtype=bool)
+
+    def step(self, track=False):
+        """
+        Perform a single synchronous cycle.
+
+        Parameters
+        ----------
+        track : bool, optional, default False
+            Whether to keep the activations from before the cycle, so that
+            the change during the cycle can be retrieved using change.
+
+        """
+        network = self.network
+        state = self.state
+        check = bool(self._static) and not self._folded
+
+        if check:
+            self._static_previous[:] = self._static_activations
+        if track:
+            self._previous[:] = state.activations
+        state.net[:] = state.ext_input
+        # Static layers only receive external input.
+        self._static_net *= network.step_size
+        self.operator.apply(self._folded_bound if self._folded
+                            else self._bound)
+        update(self._net,
+               self._activations,
+               self._resting,
+               network.minimum,
+               network.decay_rate,
+               network.step_size)
+
+        state.activations += state.net
+        np.clip(state.activations,
+                network.minimum,
+                1.0,
+                out=state.activations)
+        if self._masked is not None:
+            state.activations[self._masked] = network.minimum
+        if check and self._static_unchanged():
+            self._fold()
+
+    def _static_unchanged(self):
+        """Check whether the last cycle left the static layers unchanged."""
+        np.not_equal(self._static_previous,
+                     self._static_activations,
+                     out=self._static_changed)
+        return not self._static_changed.any()
+
+    def _fold(self):
+        """Compute the constant input of the static layers."""
+        folded = {}
+        for ext_input, indices, constant in self._static:
+            # The net input of a layer starts at its external input, which
+            # would be summed in a different order.
+            if ext_input.any():
+                continue
+            constant[:] = 0
+            for idx in indices:
+                _, c, mtr = self._bound[idx]
+                propagate(constant, c, mtr)
+                folded[idx] = None
+            net, _, _ = self._bound[indices[0]]
+            folded[indices[0]] = (net, constant, None)
+        # The index of the first block each bound block replaces.
+        self._folded_blocks = [idx for idx in range(len(self._bound))
+                               if folded.get(idx, True) is not None]
+        self._folded_bound = [folded.get(idx, self._bound[idx])
+                              for idx in self._folded_blocks]
+        self._folded = True
+
+    def invalidate(self):
+        """
+        Stop using the constant input of the static layers.
+
+        This has to be called whenever the activations or external input of
+        static layers are changed outside of step.
+        """
+        self._folded = False
+
+    def change(self):
+        """
+        The maximum absolute change in activation during the last cycle.
+
+        This is only valid if the last cycle was performed with track=True.
+        """
+        np.subtract(self.state.activations, self._previous, out=self._delta)
+        return np.abs(self._delta, out=self._delta).max()
+
+    def converged(self, threshold):
+        """Check whether all monitor layers have crossed the threshold."""
+        if not self._monitors:
+            return False
+        for x in self._monitors:
+            if not x.max() > threshold:
+                return False
+        return True
@@ -0,0 +1,374 @@
+"""Policies for recording the activations of a network during a run."""
+import numpy as np
+
+from collections import namedtuple
+
+
+Outcome = namedtuple("Outcome", ["cycles", "winner", "activation"])
+
+
+class Rows(object):
+    """
+    A buffer of rows which grows as rows are written.
+
+    Most items converge long before max_cycles, so that allocating a row
+    for every possible cycle up front wastes a lot of memory for large
+    layers. Instead, the buffer starts small, and doubles whenever a row
+    past its end is written, up to max_rows.
+
+    Parameters
+    ----------
+    width : int
+        The number of values in a row.
+    dtype : np.dtype
+        The type of the values.
+    max_rows : int
+        The largest number of rows which will be written.
+
+    """
+
+    initial = 32
+
+    def __init__(self, width, dtype, max_rows):
+        """Init function."""
+        self.max_rows = max_rows
+        self.data = np.zeros((min(self.initial, max_rows), width),
+                             dtype=dtype)
+
+    def reserve(self, rows):
+        """Make sure the buffer has at least this number of rows."""
+        if rows <= len(self.data):
+            return
+        if rows > self.max_rows:
+            raise IndexError("Can not write row {} of a buffer with {} "
+                             "rows".format(rows - 1, self.max_rows))
+        size = min(max(rows, 2 * len(self.data)), self.max_rows)
+        data = np.zeros((size,) + self.data.shape[1:], dtype=self.data.dtype)
+        data[:len(self.data)] = self.data
+        self.data = data
+
+    def row(self, idx):
+        """Get a writable view of a row."""
+        self.reserve(idx + 1)
+        return self.data[idx]
+
+    def __setitem__(self, idx, value):
+        """Write a row, or a slice of rows."""
+        if isinstance(idx, slice):
+            self.reserve(idx.stop)
+        else:
+            self.reserve(idx + 1)
+        self.data[idx] = value
+
+    def head(self, rows):
+        """Get a copy of the first rows."""
+        return np.copy(self.data[:rows])
+
+
+class Recorder(object):
+    """
+    Base class for recording the output layers of a network.
+
+    A recorder is started once per run, which allocates all buffers it
+    needs. Before each item, the recorder is reset, after which record is
+    called once after every cycle. When the item is finished, result returns
+    the recorded data for each output layer.
+    Subclasses implement _allocate, _record and _result. Recorders which
+    only use the state after the last cycle set per_cycle to False, so that
+    record does not have to be called.
+    """
+
+    per_cycle = True
+
+    def start(self, network, max_cycles):
+        """
+        Allocate the buffers for a run.
+
+        Parameters
+        ----------
+        network : Network
+            The network to record. Must be compiled.
+        max_cycles : int
+            The maximum number of cycles an item can run for.
+
+        """
+        self.layers = {k: v for k, v in network.outputs.items()}
+        self.max_cycles = max_cycles
+        self.buffers = {k: self._allocate(layer, max_cycles)
+                        for k, layer in self.layers.items()}
+
+    def reset(self):
+        """Start recording a new item."""
+        pass
+
+    def record(self, cycle):
+        """Record the state of the network after a cycle."""
+        for k, layer in self.layers.items():
+            self._record(self.buffers[k], layer, cycle)
+
+    def pad(self, start, stop):
+        """
+        Record the current state for all cycles from start up to stop.
+
+        This is used when the network has reached a steady state, and the
+        remaining cycles would all record the same state.
+        """
+        for k, layer in self.layers.items():
+            self._pad(self.buffers[k], layer, start, stop)
+
+    def result(self, cycles):
+        """
+        Return the result of the current item.
+
+        Parameters
+        ----------
+        cycles : int
+            The number of cycles the current item was run for.
+
+        Returns
+        -------
+        result : dict
+            The recorded data for each output layer.
+
+        """
+        return {k: self._result(self.buffers[k], layer, cycles)
+                for k, layer in self.layers.items()}
+
+    def _allocate(self, layer, max_cycles):
+        raise NotImplementedError()
+
+    def _record(self, buffer, layer, cycle):
+        raise NotImplementedError()
+
+    def _result(self, buffer, layer, cycles):
+        raise NotImplementedError()
+
+    def _pad(self, buffer, layer, start, stop):
+        for cycle in range(start, stop):
+            self._record(buffer, layer, cycle)
+
+
+class Full(Recorder):
+    """
+    Record the activations of all nodes at every cycle.
+
+    The result for each layer is a cycles * nodes array.
+    """
+
+    def _allocate(self, layer, max_cycles):
+        return Rows(len(layer.activations),
+                    layer.activations.dtype,
+                    max_cycles)
+
+    def _record(self, buffer, layer, cycle):
+        buffer[cycle] = layer.activations
+
+    def _pad(self, buffer, layer, start, stop):
+        buffer[start:stop] = layer.activations
+
+    def _result(self, buffer, layer, cycles):
+        return buffer.head(cycles)
+
+
+class Every(Recorder):
+    """
+    Record the activations of all nodes every k cycles.
+
+    The first cycle is always recorded, so that the result for each layer is
+    equal to taking every k-th row of the result of the Full recorder.
+
+    Parameters
+    ----------
+    k : int
+        The interval at which to record.
+
+    """
+
+    def __init__(self, k):
+        """Init function."""
+        if k <= 0:
+            raise ValueError("k should be > 0, is now {}".format(k))
+        self.k = k
+
+    def _allocate(self, layer, max_cycles):
+        return Rows(len(layer.activations),
+                    layer.activations.dtype,
+                    -(-max_cycles // self.k))
+
+    def _record(self, buffer, layer, cycle):
+        if cycle % self.k == 0:
+            buffer[cycle // self.k] = layer.activations
+
+    def _result(self, buffer, layer, cycles):
+        return buffer.head(-(-cycles // self.k))
+
+
+class Final(Recorder):
+    """
+    Record only the activations after the last cycle.
+
+    The result for each layer is an array with the activation of each node.
+    """
+
+    per_cycle = False
+
+    def _allocate(self, layer, max_cycles):
+        return None
+
+    def _record(self, buffer, layer, cycle):
+        pass
+
+    def _result(self, buffer, layer, cycles):
+        return np.copy(layer.activations)
+
+
+class Winner(Recorder):
+    """
+    Record only the number of cycles and the winning node.
+
+    The result for each layer is an Outcome, which contains the number of
+    cycles, the name of the most active node, and its activation.
+    """
+
+    per_cycle = False
+
+    def _allocate(self, layer, max_cycles):
+        return None
+
+    def _record(self, buffer, layer, cycle):
+        pass
+
+    def _result(self, buffer, layer, cycles):
+        idx = layer.activations.argmax()
+        return Outcome(cycles, layer.idx2name[idx], layer.activations[idx])
+
+
+class TopK(Recorder):
+    """
+    Record the k most active nodes at every cycle.
+
+    The result for each layer is a tuple of two cycles * k arrays: the
+    indices of the k most active nodes, and their activations, both sorted
+    by descending activation.
+
+    Parameters
+    ----------
+    k : int
+        The number of nodes to record.
+
+    """
+
+    def __init__(self, k):
+        """Init function."""
+        if k <= 0:
+            raise ValueError("k should be > 0, is now {}".format(k))
+        self.k = k
+
+    def _allocate(self, layer, max_cycles):
+        k = min(self.k, len(layer.activations))
+        return (Rows(k, np.intp, max_cycles),
+                Rows(k, layer.activations.dtype, max_cycles))
+
+    def _record(self, buffer, layer, cycle):
+        indices, values = buffer
+        k = indices.data.shape[1]
+        a = layer.activations
+        if k < len(a):
+            top = np.argpartition(a, -k)[-k:]
+        else:
+            top = np.arange(len(a))
+        top = top[np.argsort(-a[top], kind="stable")]
+        indices[cycle] = top
+        values[cycle] = a[top]
+
+    def _result(self, buffer, layer, cycles):
+        indices, values = buffer
+        return indices.head(cycles), values.head(cycles)
+
+
+class Subset(Recorder):
+    """
+    Record the activations of a fixed set of nodes at every cycle.
+
+    The result for each layer is a cycles * nodes array, in which the
+    columns are in the order in which the nodes were passed. Output layers
+    for which no nodes are passed are not recorded.
+
+    Parameters
+    ----------
+    nodes : dict
+        A dictionary with the names of output layers as keys, and lists of
+        node names as values.
+
+    """
+
+    def __init__(self, nodes):
+        """Init function."""
+        self.nodes = nodes
+
+    def start(self, network, max_cycles):
+        """Allocate the buffers for a run."""
+        diff = set(self.nodes) - set(network.outputs)
+        if diff:
+            raise ValueError("{} were not output layers".format(diff))
+        super(Subset, self).start(network, max_cycles)
+        self.layers = {k: v for k, v in self.layers.items()
+                       if k in self.nodes}
+        self.idx = {k: np.array([v.name2idx[x] for x in self.nodes[k]],
+                                dtype=np.intp)
+                    for k, v in self.layers.items()}
+
+    def _allocate(self, layer, max_cycles):
+        if layer.name not in self.nodes:
+            return None
+        return Rows(len(self.nodes[layer.name]),
+                    layer.activations.dtype,
+                    max_cycles)
+
+    def _record(self, buffer, layer, cycle):
+        np.take(layer.activations,
+                self.idx[layer.name],
+                out=buffer.row(cycle))
+
+    def _result(self, buffer, layer, cycles):
+        return buffer.head(cycles)
+
+
+class Active(Recorder):
+    """
+    Record the names and activations of all positive nodes at every cycle.
+
+    This is the recording policy of a shallow run. The result for each layer
+    is a list with, for every cycle, a list of (name, activation) tuples.
+    """
+
+    def _allocate(self, layer, max_cycles):
+        return []
+
+    def reset(self):
+        """Start recording a new item."""
+        for v in self.buffers.values():
+            del v[:]
+
+    def _record(self, buffer, layer, cycle):
+        buffer.append(list(layer.active()))
+
+    def _result(self, buffer, layer, cycles):
+        return list(buffer)
+
+
+RECORDERS = {"full": Full,
+             "final": Final,
+             "winner": Winner,
+             "active": Active}
+
+
+def get_recorder(record):
+    """Get a recorder from a name or a Recorder instance."""
+    if isinstance(record, Recorder):
+        return record
+    try:
+        return RECORDERS[record]()
+    except KeyError:
+        raise ValueError("record should be a Recorder or one of {}, is now "
+                         "{}".format(", ".join(RECORDERS), record))
@@ -0,0 +1,236 @@
+"""Continuous batching of simulations."""
+import numpy as np
+
+from tqdm import tqdm
+from .batch import BatchState
+from .network import RT_DTYPE
+from .record import get_recorder
+
+
+class Scheduler(object):
+    """
+    Run a network on a fixed-size pool of in-flight simulations.
+
+    Items converge after very different numbers of cycles, so a static batch
+    spends most of its time waiting for its slowest item. The scheduler
+    instead retires an item as soon as it crosses the threshold or reaches
+    max_cycles, and immediately loads the next pending item into the freed
+    slot. Results are still returned in input order.
+
+    The pool is a BatchState, so that every item gets exactly the same
+    result as with Network.activate. Items which finish before all earlier
+    items have finished are kept until they can be returned, which is why
+    run records only the winner by default, and reaction_times keeps no
+    recording at all.
+
+    Parameters
+    ----------
+    network : Network
+        The network to run.
+    pool_size : int, optional, default 64
+        The number of items which are simulated at the same time.
+
+    Attributes
+    ----------
+    occupancy : np.array
+        The number of occupied slots at each cycle of the last run.
+
+    """
+
+    def __init__(self, network, pool_size=64):
+        """Init function."""
+        if pool_size <= 0:
+            raise ValueError("pool_size must be > 0, is now "
+                             "{}".format(pool_size))
+        self.network = network
+        self.pool_size = pool_size
+        self.occupancy = np.zeros(0, dtype=np.intp)
+
+    @property
+    def utilization(self):
+        """The mean proportion of occupied slots during the last run."""
+        if not len(self.occupancy):
+            return .0
+        return self.occupancy.mean() / self.pool_size
+
+    def run(self,
+            X,
+            max_cycles=30,
+            clamp_cycles=None,
+            threshold=.7,
+            strict=True,
+            inputs=None,
+            show_progressbar=True,
+            record="winner"):
+        """
+        Activate the network on all items in X.
+
+        The parameters and results are identical to those of
+        Network.activate_batch, except that only the winner is recorded by
+        default.
+
+        Parameters
+        ----------
+        X : list of dictionaries
+            The inputs to the model. The dictionaries have layer names as their
+            keys, and tuples of symbols as their values.
+        max_cycles : int, optional, default 30
+            The maximum number of cycles to run the activation for.
+        clamp_cycles : int or float, optional, default None
+            The number of cycles to clamp the input for. See activate.
+        threshold : float, optional, default .7
+            The activation threshold. Once one of the output layers reaches
+            this activation level, the item is retired.
+        strict : bool
+            Whether to halt execution if the threshold is not reached when
+            max_cycles have passed.
+        inputs : tuple of strings
+            Use this field to override the behavior of the network and to
+            specify your own inputs.
+        show_progressbar : bool, optional, default True
+            Whether to show the progress bar.
+        record : str or Recorder, optional, default "winner"
+            The policy with which the output layers are recorded. See
+            Network.activate.
+
+        """
+        recorder = get_recorder(record)
+
+        def retire(state, slot, recognized):
+            return state.retire(slot)
+
+        return self._run(X,
+                         max_cycles,
+                         clamp_cycles,
+                         threshold,
+                         strict,
+                         inputs,
+                         show_progressbar,
+                         recorder,
+                         retire)
+
+    def reaction_times(self,
+                       X,
+                       max_cycles=30,
+                       clamp_cycles=None,
+                       threshold=.7,
+                       inputs=None,
+                       layer=None,
+                       show_progressbar=True):
+        """
+        Get the number of cycles it takes for each item to be recognized.
+
+        This gives the same results as Network.reaction_times without
+        steady state detection. Nothing is recorded during a run, and only
+        a single record is kept for every item.
+
+        Parameters
+        ----------
+        X : list of dictionaries
+            The inputs to the model. The dictionaries have layer names as their
+            keys, and tuples of symbols as their values.
+        max_cycles : int, optional, default 30
+            The maximum number of cycles to run the activation for.
+        clamp_cycles : int or float, optional, default None
+            The number of cycles to clamp the input for. See activate.
+        threshold : float, optional, default .7
+            The activation threshold. Once all monitor layers reach this
+            activation level, the item is recognized.
+        inputs : tuple of strings
+            Use this field to override the behavior of the network and to
+            specify your own inputs.
+        layer : str, optional, default None
+            The layer from which to take the winning node. If this is None,
+            the first output layer is used.
+        show_progressbar : bool, optional, default True
+            Whether to show the progress bar.
+
+        Returns
+        -------
+        result : np.recarray
+            A record array with one row per item. See
+            Network.reaction_times.
+
+        """
+        if layer is None:
+            layer = next(iter(self.network.outputs))
+
+        def retire(state, slot, recognized):
+            activations = state.activations[slot, state.slices[layer]]
+            winner = activations.argmax()
+            result = (state.cycles[slot],
+                      winner,
+                      activations[winner],
+                      not recognized,
+                      False)
+            state.retire(slot)
+            return result
+
+        result = list(self._run(X,
+                                max_cycles,
+                                clamp_cycles,
+                                threshold,
+                                False,
+                                inputs,
+                                show_progressbar,
+                                None,
+                                retire))
+        return np.rec.array(np.array(result, dtype=RT_DTYPE))
+
+    def _run(self,
+             X,
+             max_cycles,
+             clamp_cycles,
+             threshold,
+             strict,
+             inputs,
+             show_progressbar,
+             recorder,
+             retire):
+        """Run all items, and yield the result of retire for each in order."""
+        network = self.network
+        clamp_cycles = network._check_run(max_cycles, clamp_cycles, threshold)
+        input_layers = network._input_layers(inputs)
+        network._check_items(X, input_layers)
+
+        try:
+            total = len(X)
+        except TypeError:
+            total = None
+        X = enumerate(X)
+        state = BatchState(network, self.pool_size, recorder, max_cycles)
+        # The index of the item in each slot.
+        index = np.zeros(self.pool_size, dtype=np.intp)
+        # Finished results, waiting to be returned in order.
+        finished = {}
+        next_out = 0
+        occupancy = []
+        exhausted = False
+
+        with tqdm(total=total, disable=not show_progressbar) as bar:
+            while True:
+                # Fill all free slots with pending items.
+                if not exhausted:
+                    for slot in np.flatnonzero(~state.live):
+                        try:
+                            index[slot], x = next(X)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        state.load(slot, x, input_layers)
+
+                if not state.rows:
+                    self.occupancy = np.array(occupancy, dtype=np.intp)
+                    break
+                occupancy.append(np.count_nonzero(state.live))
+                state.step(clamp_cycles)
+                slots, recognized = state.finished(threshold,
+                                                   max_cycles,
+                                                   strict)
+                for slot, r in zip(slots, recognized):
+                    finished[index[slot]] = retire(state, slot, r)
+
+                while next_out in finished:
+                    yield finished.pop(next_out)
+                    next_out += 1
+                    bar.update(1)
@@ -0,0 +1,181 @@
+"""Flat storage for the mutable state of a network."""
+import numpy as np
+
+from collections import namedtuple, OrderedDict
+
+
+Snapshot = namedtuple("Snapshot", ["activations", "ext_input"])
+
+
+class NetworkState(object):
+    """
+    The state of all layers of a network, stored in flat buffers.
+
+    The activations, resting levels and external inputs of all layers are
+    concatenated into single preallocated vectors. After binding, the arrays
+    of each layer are views into these vectors, so that updating the flat
+    buffers in place updates the layers, and vice versa.
+    Static layers are stored before all other layers, so that the nodes
+    which are updated through the strength kernel form a single block.
+
+    Parameters
+    ----------
+    layers : dict
+        A dictionary of Layers.
+
+    Attributes
+    ----------
+    activations : np.array
+        The activations of all nodes.
+    resting : np.array
+        The resting level activations of all nodes.
+    ext_input : np.array
+        The external input of all nodes.
+    net : np.array
+        A scratch buffer into which the change in activation of all nodes is
+        computed during a cycle.
+    slices : dict
+        A mapping from layer names to the slice of the buffers they occupy.
+    n_static : int
+        The number of nodes in static layers, which precede all other nodes.
+
+    """
+
+    def __init__(self, layers):
+        """Init function."""
+        order = sorted(layers.items(), key=lambda x: not x[1].static)
+        self.slices = {}
+        offset = 0
+        self.n_static = 0
+        for k, layer in order:
+            n = len(layer.resting)
+            self.slices[k] = slice(offset, offset + n)
+            offset += n
+            if layer.static:
+                self.n_static = offset
+
+        self.layers = layers
+        dtype = np.result_type(*[x.dtype for x in layers.values()])
+        self.activations = np.zeros(offset, dtype=dtype)
+        self.resting = np.zeros(offset, dtype=dtype)
+        self.ext_input = np.zeros(offset, dtype=dtype)
+        self.net = np.zeros(offset, dtype=dtype)
+
+    def __len__(self):
+        """The total number of nodes."""
+        return len(self.activations)
+
+    def bind(self):
+        """Copy the state of the layers and turn their arrays into views."""
+        for k, sl in self.slices.items():
+            layer = self.layers[k]
+            self.activations[sl] = layer.activations
+            self.resting[sl] = layer.resting
+            self.ext_input[sl] = layer.ext_input
+            layer.activations = self.activations[sl]
+            layer.resting = self.resting[sl]
+            layer.ext_input = self.ext_input[sl]
+
+    def snapshot(self):
+        """
+        Copy the mutable state.
+
+        Returns
+        -------
+        snapshot : Snapshot
+            A copy of the activations and external input of all nodes.
+
+        """
+        return Snapshot(np.copy(self.activations), np.copy(self.ext_input))
+
+    def restore(self, snapshot):
+        """
+        Overwrite the mutable state with a snapshot.
+
+        Parameters
+        ----------
+        snapshot : Snapshot
+            A snapshot of a state with the same layout.
+
+        """
+        if len(snapshot.activations) != len(self):
+            raise ValueError("The snapshot has {} nodes, but the state has "
+                             "{}".format(len(snapshot.activations),
+                                         len(self)))
+        self.activations[:] = snapshot.activations
+        self.ext_input[:] = snapshot.ext_input
+
+
+class SnapshotCache(object):
+    """
+    A cache of snapshots, bounded by the memory they use.
+
+    When adding a value would exceed the memory bound, the least recently
+    used values are removed until the value fits.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The maximum number of bytes the cached values can use.
+
+    Attributes
+    ----------
+    nbytes : int
+        The number of bytes the cached values currently use.
+    hits : int
+        The number of successful lookups.
+    misses : int
+        The number of failed lookups.
+
+    """
+
+    def __init__(self, max_bytes):
+        """Init function."""
+        if max_bytes < 0:
+            raise ValueError("max_bytes should be >= 0, is now "
+                             "{}".format(max_bytes))
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+
+    def __len__(self):
+        """The number of cached values."""
+        return len(self._values)
+
+    def get(self, key):
+        """Get a value, or None if key is not in the cache."""
+        try:
+            value, nbytes = self._values[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, nbytes):
+        """
+        Add a value to the cache.
+
+        Parameters
+        ----------
+        key : hashable
+            The key of the value.
+        value : object
+            The value to cache.
+        nbytes : int
+            The number of bytes the value uses. Values which are larger than
+            max_bytes are not cached.
+
+        """
+        if key in self._values:
+            self.nbytes -= self._values.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+        while self.nbytes + nbytes > self.max_bytes:
+            _, (_, removed) = self._values.popitem(last=False)
+            self.nbytes -= removed
+        self._values[key] = (value, nbytes)
+        self.nbytes += nbytes
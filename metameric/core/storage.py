@@ -0,0 +1,184 @@
+"""
+Saving and loading networks.
+
+A network is saved as a directory, which contains a manifest.json and one
+.npy file per array. The manifest has the following fields:
+
+    format: the version of the format, currently 2.
+    minimum, step_size, decay_rate: the parameters of the network.
+    dtype: the name of the floating point type of the network.
+    checked: whether the network was checked.
+    layers: a list with, for each layer, its name, its node names, whether
+    it is an output, monitor or feature layer, and the name of the .npy
+    file with its resting levels. Layers with an RLA profile also have the
+    name of the .npy file with the profile.
+    connections: a list with, for each connection, the names of the layer
+    it comes from and goes to, and the name of the .npy file with its
+    weight matrix. Connections which are not dense matrices, such as a
+    UniformConnection, instead have a kind, a shape, their scalar
+    parameters, and the names of the .npy files with their arrays.
+    Connections whose weights were adapted to the number of slots have the
+    number of slots as adaptation.
+    global_rla: the global resting level activation, or null.
+
+Format 1 is the same as format 2, but only has dense weight matrices.
+
+Node names which are tuples, such as the slot-based nodes of letter and
+feature layers, are stored as lists, and turned back into tuples when
+loading.
+"""
+import json
+import numpy as np
+import os
+
+from .connection import Connection, make_connection
+
+
+FORMAT = 2
+
+
+def _to_tuple(x):
+    """Recursively turn lists into tuples."""
+    if isinstance(x, list):
+        return tuple(_to_tuple(y) for y in x)
+    return x
+
+
+def _default(x):
+    """Turn numpy scalars in node names into python scalars."""
+    if isinstance(x, np.generic):
+        return x.item()
+    raise TypeError("{} can not be saved".format(type(x)))
+
+
+def save_network(network, path):
+    """
+    Save a network to a directory.
+
+    Parameters
+    ----------
+    network : Network
+        The network to save.
+    path : str
+        The directory to save the network to. It is created if it does not
+        exist, and existing files are overwritten.
+
+    """
+    if network.node_mask is not None:
+        raise ValueError("Masked networks can not be saved. Remove the mask "
+                         "using set_mask(None) first.")
+    os.makedirs(path, exist_ok=True)
+    layers = []
+    connections = []
+    for idx, (k, layer) in enumerate(network.layers.items()):
+        resting = "resting_{}.npy".format(idx)
+        np.save(os.path.join(path, resting), layer.resting)
+        layers.append({"name": k,
+                       "nodes": list(layer.node_names),
+                       "output": k in network.outputs,
+                       "monitor": k in network.monitors,
+                       "feature": k in network.feature,
+                       "resting": resting})
+        if k in network.rla_profile:
+            layers[-1]["profile"] = "profile_{}.npy".format(idx)
+            np.save(os.path.join(path, layers[-1]["profile"]),
+                    network.rla_profile[k])
+        for src, mtr in zip(layer._from_connections, layer.weights):
+            c = {"from": src.name, "to": k}
+            if (src.name, k) in network.adaptation:
+                c["adaptation"] = network.adaptation[(src.name, k)]
+            if isinstance(mtr, Connection):
+                arrays = {}
+                for name, x in mtr.arrays.items():
+                    arrays[name] = "{}_{}.npy".format(name, len(connections))
+                    np.save(os.path.join(path, arrays[name]), x)
+                c.update({"kind": mtr.kind,
+                          "shape": list(mtr.shape),
+                          "params": mtr.params,
+                          "arrays": arrays})
+            else:
+                c["weights"] = "weights_{}.npy".format(len(connections))
+                np.save(os.path.join(path, c["weights"]), mtr)
+            connections.append(c)
+
+    manifest = {"format": FORMAT,
+                "minimum": float(network.minimum),
+                "step_size": float(network.step_size),
+                "decay_rate": float(network.decay_rate),
+                "dtype": network.dtype.name,
+                "global_rla": network.global_rla,
+                "checked": network.checked,
+                "layers": layers,
+                "connections": connections}
+
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, default=_default)
+
+
+def load_network(path, mmap=True):
+    """
+    Load a network from a directory.
+
+    Parameters
+    ----------
+    path : str
+        The directory the network was saved to.
+    mmap : bool, optional, default True
+        Whether to memory-map the weight matrices instead of reading them.
+        Memory-mapped weights are read-only, and are only read from disk
+        when they are used, so that loading is almost instant.
+
+    Returns
+    -------
+    network : Network
+        The loaded network.
+
+    """
+    # Imported here to avoid a circular import.
+    from .network import Network
+
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("format") not in (1, FORMAT):
+        raise ValueError("{} has format {}, but only formats 1 and {} can "
+                         "be loaded.".format(path, manifest.get("format"),
+                                             FORMAT))
+
+    m = Network(minimum=manifest["minimum"],
+                step_size=manifest["step_size"],
+                decay_rate=manifest["decay_rate"],
+                dtype=manifest["dtype"])
+    for layer in manifest["layers"]:
+        resting = np.load(os.path.join(path, layer["resting"]))
+        m.create_layer(layer["name"],
+                       resting,
+                       [_to_tuple(x) for x in layer["nodes"]],
+                       layer["output"],
+                       layer["monitor"],
+                       layer["feature"])
+        if "profile" in layer:
+            m.rla_profile[layer["name"]] = np.load(os.path.join(
+                path, layer["profile"]))
+    m.global_rla = manifest.get("global_rla")
+
+    mmap_mode = "r" if mmap else None
+    for c in manifest["connections"]:
+        if "kind" in c:
+            arrays = {k: np.load(os.path.join(path, v), mmap_mode=mmap_mode)
+                      for k, v in c["arrays"].items()}
+            weights = make_connection(c["kind"],
+                                      c["shape"],
+                                      c["params"],
+                                      arrays,
+                                      manifest["dtype"])
+        else:
+            weights = np.load(os.path.join(path, c["weights"]),
+                              mmap_mode=mmap_mode)
+        m.connect_layers(c["from"], c["to"], weights)
+        if "adaptation" in c:
+            m.adaptation[(c["from"], c["to"])] = c["adaptation"]
+
+    if manifest["checked"]:
+        m.check()
+
+    return m
@@ -50,6 +50,22 @@ if __name__ == "__main__":
                         help="If this flag is passed, any words which can "
                              "not be featurized will be deleted. Use with "
                              "caution.")
+    parser.add_argument("--disable_schema",
+                        action='store_const',
+                        default=True,
+                        const=False,
+                        help="If this flag is passed, no schema row is "
+                             "written below the header. The schema row "
+                             "declares the kind of each column, so that it "
+                             "does not have to be inferred when building a "
+                             "model.")
+
+    parser.add_argument("--max_length",
+                        type=int,
+                        help="The length to pad decomposed fields to with "
+                             "spaces. If this is not passed, it is the "
+                             "length of the longest value, which is "
+                             "computed in a first pass over the input.")
 
     args = parser.parse_args()
 
@@ -73,4 +89,6 @@ if __name__ == "__main__":
                       args.decomposable_names,
                       args.add_features,
                       args.feature_sets,
-                      args.disable_strict)
+                      args.disable_strict,
+                      args.disable_schema,
+                      args.max_length)
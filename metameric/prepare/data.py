@@ -1,6 +1,5 @@
 """Prepare word lists for analysis."""
 import numpy as np
-from copy import deepcopy
 from csv import reader, writer
 from itertools import chain
 from wordkit.features import (fourteen,
@@ -53,9 +52,14 @@ POS_FEATURES = {"fourteen": convert_feature_set(fourteen, False),
                 "patpho_bin": convert_feature_set(patpho_bin, False)}
 
 
-def read_input_file(f):
-    """Read an input file."""
-    items = []
+def iter_input_file(f):
+    """
+    Read an input file one row at a time.
+
+    Every field of every row is a list of the whitespace separated values
+    in that field. Unlike read_input_file, fields are never turned into
+    single values, as this depends on all rows.
+    """
     if 'b' in f.mode:
         f = reader((x.decode('utf-8') for x in f))
     else:
@@ -64,55 +68,210 @@ def read_input_file(f):
     for line in f:
         if not line:
             continue
-        item = {}
-        for k, v in zip(header, line):
-            item[k] = v.split()
-        items.append(item)
+        # Skip the schema row, see make_schema.
+        if all([x.startswith("#") for x in line]):
+            continue
+        yield {k: v.split() for k, v in zip(header, line)}
 
-    for k in header:
-        if all([len(i[k]) == 1 for i in items]):
-            for i in items:
-                i[k] = i[k][0]
+
+def read_input_file(f):
+    """Read an input file."""
+    items = list(iter_input_file(f))
+    if items:
+        for k in items[0]:
+            if all([len(i[k]) == 1 for i in items]):
+                for i in items:
+                    i[k] = i[k][0]
 
     return items
 
 
-def write_file(items, file):
-    """Writes an output file."""
-    header = list(items[0].keys())
-    w = writer(file)
-    w.writerow(header)
+def _tokens(value):
+    """Get the values of a field, which can be a single string."""
+    if isinstance(value, str):
+        return (value,)
+    return value
 
-    for item in items:
-        row = []
-        for h in header:
-            i = item[h]
-            if isinstance(i[0], tuple):
-                row.append(" ".join(["-".join([str(z) for z in x])
-                                     for x in i]))
-            elif isinstance(i, tuple):
-                row.append(" ".join(i))
-            else:
-                row.append(i)
 
-        w.writerow(row)
+def max_lengths(items, fields):
+    """
+    Get the length of the longest value of each field.
+
+    This is the only quantity of a list of items which is needed before
+    decomposing any of them, as decomposed fields are padded with spaces
+    to this length. Only the fields are read, so that this is a cheap
+    first pass over a file read with iter_input_file.
+
+    Parameters
+    ----------
+    items : iterable of dict
+        The items.
+    fields : tuple of str
+        The fields to measure.
 
+    Returns
+    -------
+    lengths : dict
+        A mapping from fields to the length of their longest value.
 
-def decompose(items, field, name, length_adaptation=True):
-    """Adds letter features to words."""
-    items = deepcopy(items)
-    max_length = max([max([len(x) for x in item[field]]) for item in items])
+    """
+    lengths = {k: 0 for k in fields}
     for item in items:
+        for k in fields:
+            if k not in item:
+                raise ValueError("Could not decompose '{}', as it was not "
+                                 "in the set of keys of your items."
+                                 "".format(k))
+            for x in _tokens(item[k]):
+                lengths[k] = max(lengths[k], len(x))
+
+    return lengths
+
+
+def make_schema(items, slot_layers=(), feature_layers=(), num_slots=None):
+    """
+    Declare the kind of each field of the items.
+
+    The schema is written as the row below the header of a prepared file,
+    so that the kinds of the columns do not have to be inferred when the
+    file is read with metameric.run.read_input_file.
+
+    Parameters
+    ----------
+    items : list of dict
+        The items.
+    slot_layers : tuple, optional, default ()
+        The fields whose values are (symbol, slot index) tuples.
+    feature_layers : tuple, optional, default ()
+        The slot layers which have more than one value per slot.
+    num_slots : dict, optional, default None
+        The number of slots of slot and feature layers. Layers which are
+        not in num_slots get the number of slots of the items.
+
+    Returns
+    -------
+    schema : dict
+        A mapping from field names to their kind, e.g. "plain", "slot:4" or
+        "feature:4".
+
+    """
+    schema = {}
+    for k in items[0]:
+        if k in feature_layers or k in slot_layers:
+            kind = "feature" if k in feature_layers else "slot"
+            if num_slots is not None and k in num_slots:
+                n = num_slots[k]
+            else:
+                n = max([idx for i in items for _, idx in i[k]]) + 1
+            schema[k] = "{}:{}".format(kind, n)
+        else:
+            schema[k] = "plain"
+
+    return schema
+
+
+def _format(value):
+    """Turn the value of a field into a string."""
+    if isinstance(value, str):
+        return value
+    if value and isinstance(value[0], tuple):
+        return " ".join(["-".join([str(z) for z in x]) for x in value])
+    return " ".join([str(x) for x in value])
+
+
+def write_file(items, file, schema=None):
+    """
+    Writes an output file.
+
+    The items can be any iterable, such as a generator, and every item is
+    written as soon as it is produced. The header is taken from the first
+    item. If a schema is passed, it is written as the row below the
+    header.
+    """
+    items = iter(items)
+    first = next(items, None)
+    if first is None:
+        return
+    header = list(first.keys())
+    w = writer(file)
+    w.writerow(header)
+    if schema is not None:
+        w.writerow(["#{}".format(schema.get(h, "plain")) for h in header])
+
+    for item in chain((first,), items):
+        w.writerow([_format(item[h]) for h in header])
+
+
+def _max_length(items, field, max_length, length_adaptation):
+    """Get the length to pad a field to, or None if it is not padded."""
+    if not length_adaptation:
+        return None
+    if isinstance(max_length, dict):
+        max_length = max_length.get(field)
+    if max_length is not None:
+        return max_length
+    if iter(items) is items:
+        raise ValueError("The items are an iterator, so that the length "
+                         "to pad '{}' to can not be computed without "
+                         "consuming them. Pass max_length, for example "
+                         "from max_lengths.".format(field))
+    return max_lengths(items, (field,))[field]
+
+
+def decompose(items,
+              field,
+              name,
+              length_adaptation=True,
+              max_length=None):
+    """
+    Adds letter features to words.
+
+    Items are processed one at a time, and are not copied: every item is
+    a shallow copy of the input item with the decomposed field added.
+
+    Parameters
+    ----------
+    items : iterable of dict
+        The items.
+    field : str
+        The field to decompose.
+    name : str
+        The name of the decomposed field.
+    length_adaptation : bool, optional, default True
+        Whether to pad the decomposed field with spaces to max_length.
+    max_length : int or dict, optional, default None
+        The length to pad to, or a mapping from fields to this length. If
+        this is None, it is computed from the items, which then can not be
+        an iterator.
+
+    Returns
+    -------
+    items : generator of dict
+        The items with the decomposed field.
+
+    """
+    max_length = _max_length(items, field, max_length, length_adaptation)
+    return _decompose(items, field, name, max_length)
+
+
+def _decompose(items, field, name, max_length):
+    """Decompose items one at a time."""
+    for item in items:
+        item = dict(item)
         item[name] = []
-        for sub_item in item[field]:
+        for sub_item in _tokens(item[field]):
             length = len(sub_item)
+            if max_length is not None and length > max_length:
+                raise ValueError("'{}' is longer than the max_length of "
+                                 "'{}', {}.".format(sub_item,
+                                                    field,
+                                                    max_length))
             item[name].extend([(l.lower(), idx)
                                for idx, l in enumerate(sub_item)])
-            if length_adaptation:
+            if max_length is not None:
                 item[name].extend([(" ", idx)
                                    for idx in range(length, max_length)])
-
-    return items
+        yield item
 
 
 def add_features(items,
@@ -120,35 +279,59 @@ def add_features(items,
                  feature_name='features',
                  field='letters',
                  strict=True):
-    """Adds features to words."""
-    items = deepcopy(items)
-    new_items = []
+    """
+    Adds features to words.
+
+    Items are processed one at a time, and are not copied: every item is
+    a shallow copy of the input item with the features added. If strict
+    is False, items with symbols which are not in the feature set are
+    skipped.
+    """
     for item in items:
-        item[feature_name] = []
+        feats = []
         for idx, sub_item in enumerate(item[field]):
             try:
-                feats = feature_set[sub_item[0]]
+                f = feature_set[sub_item[0]]
             except KeyError as e:
                 if not strict:
                     break
                 raise e
-            item[feature_name].extend([(f, idx) for f in feats])
+            feats.extend([(x, idx) for x in f])
         else:
-            new_items.append(item)
-
-    return new_items
-
-
-def process_data(items,
-                 decomposable=(),
-                 decomposable_names=(),
-                 feature_layers=(),
-                 feature_sets=(),
-                 negative_features=True,
-                 length_adaptation=True,
-                 strict=True):
-    """Process data, add fields, and add them to the item."""
-    item_keys = set(chain.from_iterable([x.keys() for x in items]))
+            item = dict(item)
+            item[feature_name] = feats
+            yield item
+
+
+def iter_process_data(items,
+                      decomposable=(),
+                      decomposable_names=(),
+                      feature_layers=(),
+                      feature_sets=(),
+                      negative_features=True,
+                      length_adaptation=True,
+                      strict=True,
+                      max_length=None):
+    """
+    Process items one at a time.
+
+    This is the streaming version of process_data: the items can be any
+    iterable, such as the rows of iter_input_file, and are decomposed and
+    featurized one at a time, without copying them, so that memory use
+    does not depend on the number of items.
+
+    The length of the longest value of each decomposable field is needed
+    to pad decomposed fields with spaces. If max_length is None, it is
+    computed in a first pass over the items, which then can not be an
+    iterator. Otherwise, it is either a single length, or a mapping from
+    decomposable fields to their length, as returned by max_lengths.
+
+    Returns
+    -------
+    items : generator of dict
+        The processed items.
+
+    """
     if isinstance(decomposable, str):
         decomposable = (decomposable,)
     if isinstance(decomposable_names, str):
@@ -157,33 +340,23 @@ def process_data(items,
         feature_layers = (feature_layers,)
     if isinstance(feature_sets, str):
         feature_sets = (feature_sets,)
-    for x in decomposable:
-        if x not in item_keys:
-            raise ValueError("Could not decompose '{}', as it was not in the "
-                             "set of keys of your items.".format(x))
     if feature_sets and set(feature_sets) - set(FEATURES.keys()):
         raise ValueError("Your feature sets were not one of: {}"
                          "".format(", ".join(FEATURES.keys())))
-    for x in feature_layers:
-        if x not in item_keys and x not in decomposable_names:
-            raise ValueError("Feature layer '{}' was not in your items, but "
-                             "also was not a decomposable layer.".format(x))
-
-    if decomposable_names:
-        d = zip(decomposable, decomposable_names)
-    else:
-        d = zip(decomposable, ["{}-decomposed" for x in decomposable])
 
-    for key in decomposable:
-        for i in items:
-            if isinstance(i[key], str):
-                i[key] = (i[key],)
+    if not decomposable_names:
+        decomposable_names = ["{}-decomposed".format(x)
+                              for x in decomposable]
+    lengths = {x: _max_length(items, x, max_length, length_adaptation)
+               for x in decomposable}
 
-    for field, new_name in d:
-        items = decompose(items,
-                          field,
-                          new_name,
-                          length_adaptation)
+    items = _check_fields(items, decomposable, decomposable_names,
+                          feature_layers)
+    for field, new_name in zip(decomposable, decomposable_names):
+        items = _decompose(items,
+                           field,
+                           new_name,
+                           lengths[field])
 
     for layer_name, name in zip(feature_layers, feature_sets):
         feats = FEATURES[name] if negative_features else POS_FEATURES[name]
@@ -196,20 +369,121 @@ def process_data(items,
     return items
 
 
+def _check_fields(items, decomposable, decomposable_names, feature_layers):
+    """Check whether every item has the fields which are processed."""
+    for item in items:
+        for x in decomposable:
+            if x not in item:
+                raise ValueError("Could not decompose '{}', as it was not "
+                                 "in the set of keys of your items."
+                                 "".format(x))
+        for x in feature_layers:
+            if x not in item and x not in decomposable_names:
+                raise ValueError("Feature layer '{}' was not in your items, "
+                                 "but also was not a decomposable layer."
+                                 "".format(x))
+        item = dict(item)
+        for x in decomposable:
+            if isinstance(item[x], str):
+                item[x] = (item[x],)
+        yield item
+
+
+def process_data(items,
+                 decomposable=(),
+                 decomposable_names=(),
+                 feature_layers=(),
+                 feature_sets=(),
+                 negative_features=True,
+                 length_adaptation=True,
+                 strict=True,
+                 max_length=None):
+    """
+    Process data, add fields, and add them to the item.
+
+    The input items are not changed. See iter_process_data for a version
+    which does not keep all items in memory.
+    """
+    return list(iter_process_data(items,
+                                  decomposable,
+                                  decomposable_names,
+                                  feature_layers,
+                                  feature_sets,
+                                  negative_features,
+                                  length_adaptation,
+                                  strict,
+                                  max_length))
+
+
 def process_and_write(input_file,
                       output_path,
                       decomposable,
                       decomposable_names,
                       feature_layers,
                       feature_sets,
-                      strict):
-    """Process data and write it to a file."""
-    items = read_input_file(input_file)
-
-    items = process_data(items,
-                         decomposable,
-                         decomposable_names,
-                         feature_layers,
-                         feature_sets,
-                         strict=strict)
-    write_file(items, output_path)
+                      strict,
+                      schema=True,
+                      max_length=None):
+    """
+    Process data and write it to a file.
+
+    The file is read, processed and written one row at a time, so that
+    memory use does not depend on the size of the file. Unless max_length
+    is passed, the length to pad decomposed fields to is computed in a
+    first pass over the file, which then has to be seekable.
+
+    If schema is True, a schema row is written below the header, see
+    make_schema.
+    """
+    if isinstance(decomposable, str):
+        decomposable = (decomposable,)
+    if isinstance(decomposable_names, str):
+        decomposable_names = (decomposable_names,)
+    if isinstance(feature_layers, str):
+        feature_layers = (feature_layers,)
+    decomposable = decomposable or ()
+    feature_layers = feature_layers or ()
+    if not decomposable_names:
+        decomposable_names = ["{}-decomposed".format(x)
+                              for x in decomposable]
+    fields = dict(zip(decomposable_names, decomposable))
+
+    if max_length is None and decomposable:
+        max_length = max_lengths(iter_input_file(input_file), decomposable)
+        input_file.seek(0)
+    # Feature layers which are not decomposed have as many slots as they
+    # have values, which needs another pass if a schema is written.
+    counts = {x: 0 for x in feature_layers if x not in fields}
+    if schema and counts:
+        for row in iter_input_file(input_file):
+            for x in counts:
+                counts[x] = max(counts[x], len(row.get(x, ())))
+        input_file.seek(0)
+
+    items = iter_process_data(iter_input_file(input_file),
+                              decomposable,
+                              decomposable_names,
+                              feature_layers,
+                              feature_sets,
+                              strict=strict,
+                              max_length=max_length)
+    if schema:
+        first = next(items, None)
+        if first is None:
+            return
+        items = chain((first,), items)
+        lengths = {x: max_length.get(fields[x])
+                   if isinstance(max_length, dict) else max_length
+                   for x in decomposable_names}
+        num_slots = dict(lengths)
+        for x in feature_layers:
+            num_slots["{}-features".format(x)] = (lengths[x] if x in fields
+                                                  else counts[x])
+        schema = make_schema([first],
+                             decomposable_names,
+                             ["{}-features".format(x)
+                              for x in feature_layers],
+                             num_slots)
+    else:
+        schema = None
+    write_file(items, output_path, schema)
@@ -1,9 +1,12 @@
 """Make an IA run."""
+import csv
 import numpy as np
+import os
 import pandas as pd
 
 from .prepare.weights import IA_WEIGHTS
-from .builder import Builder
+from .builder import Builder, parse_schema
+from .core import Network
 from itertools import chain
 from collections import Counter
 
@@ -28,12 +31,81 @@ def is_slot(x):
     return True
 
 
-def read_input_file(f):
-    """Read an input file."""
-    df = pd.read_csv(f, keep_default_na=False)
+def read_schema(f):
+    """
+    Read the schema row of an input file.
+
+    The schema row is the row below the header, in which every cell starts
+    with a "#", followed by the kind of the column, e.g. "#plain" or
+    "#slot:4". See builder.parse_schema for the kinds.
+
+    Parameters
+    ----------
+    f : str or file
+        The path to the input file, or the input file itself. Files are
+        read from their current position, which is restored afterwards,
+        and can be opened in text or binary mode.
+
+    Returns
+    -------
+    schema : dict or None
+        A mapping from column names to their kind, or None if the file does
+        not have a schema row.
+
+    """
+    if isinstance(f, (str, os.PathLike)):
+        with open(f, newline="") as handle:
+            header, row = _first_rows(handle)
+    else:
+        position = f.tell()
+        try:
+            header, row = _first_rows(f)
+        finally:
+            f.seek(position)
+    if not row or not all([x.startswith("#") for x in row]):
+        return None
+    return dict(zip(header, [x[1:] for x in row]))
+
+
+def _first_rows(f):
+    """Read the header and the row below it."""
+    rows = csv.reader(x.decode("utf-8") if isinstance(x, bytes) else x
+                      for x in f)
+    return next(rows, []), next(rows, [])
+
+
+def read_input_file(f, schema=None):
+    """
+    Read an input file.
+
+    If a schema is passed, or the file has a schema row, the kind of every
+    column is taken from the schema. Otherwise, columns whose values all
+    look like "symbol-index" are inferred to be slot-based.
+    """
+    return _read_input_file(f, schema)[0]
+
+
+def _read_input_file(f, schema=None):
+    """Read an input file, and get the schema it was read with."""
+    declared = read_schema(f)
+    if schema is None:
+        schema = declared
+    df = pd.read_csv(f,
+                     keep_default_na=False,
+                     skiprows=[1] if declared is not None else None)
     dtypes = [col for col, dtype in zip(df.columns, df.dtypes)
               if dtype == object]
     items = df.to_dict('records')
+    if schema is not None:
+        parsed = parse_schema(schema)
+        for d in dtypes:
+            kind, _ = parsed.get(d, ("plain", None))
+            for i in items:
+                i[d] = i[d].split()
+                if kind != "plain":
+                    i[d] = list(make_slot(i[d]))
+        return items, schema
+
     for d in dtypes:
         slot_feature = []
         for i in items:
@@ -43,7 +115,7 @@ def read_input_file(f):
             for i in items:
                 i[d] = list(make_slot(i[d]))
 
-    return items
+    return items, None
 
 
 def write_output_file(path, items, columns):
@@ -87,12 +159,13 @@ def get_model(items_file,
               step_size,
               decay_rate,
               minimum_activation,
-              adapt_weights):
+              adapt_weights,
+              dtype=np.float64):
     if parameters is None:
         print("Defaulting to standard IA parameters.")
         weights = IA_WEIGHTS
 
-    items = read_input_file(items_file)
+    items, schema = _read_input_file(items_file)
 
     names = set(chain.from_iterable(weights))
     rla = {k: 'global' if k not in rla_layers
@@ -106,7 +179,9 @@ def get_model(items_file,
                 step_size=step_size,
                 decay_rate=decay_rate,
                 minimum=minimum_activation,
-                weight_adaptation=adapt_weights).build_model(items)
+                weight_adaptation=adapt_weights,
+                dtype=dtype,
+                schema=schema).build_model(items)
 
     return m
 
@@ -125,34 +200,45 @@ def make_run(items_file,
              max_cycles,
              decay_rate,
              minimum_activation,
-             adapt_weights):
+             adapt_weights,
+             dtype=np.float64,
+             tolerance=None,
+             cache=None,
+             model_path=None,
+             save_path=None):
     """Method for running."""
     test_items = read_input_file(test_items_file)
-    m = get_model(items_file,
-                  parameters,
-                  rla_variable,
-                  rla_layers,
-                  output_layers,
-                  monitor_layers,
-                  global_rla,
-                  step_size,
-                  decay_rate,
-                  minimum_activation,
-                  adapt_weights)
+    if model_path is not None:
+        m = Network.load(model_path)
+    else:
+        m = get_model(items_file,
+                      parameters,
+                      rla_variable,
+                      rla_layers,
+                      output_layers,
+                      monitor_layers,
+                      global_rla,
+                      step_size,
+                      decay_rate,
+                      minimum_activation,
+                      adapt_weights,
+                      dtype)
+    if save_path is not None:
+        m.save(save_path)
 
     keys_items = Counter(chain.from_iterable(test_items))
     columns = [k for k, v in keys_items.items() if v == len(test_items)]
     columns.append("cycles")
 
-    results = m.activate(test_items,
-                         max_cycles=max_cycles,
-                         threshold=threshold,
-                         strict=False)
+    results = m.reaction_times(test_items,
+                               max_cycles=max_cycles,
+                               threshold=threshold,
+                               layer=next(iter(m.outputs)),
+                               tolerance=tolerance,
+                               cache=cache)
 
-    cycles = [len(x[output_layers[0]]) for x in results]
-    cycles = np.array(cycles)
-    right = cycles < max_cycles
-    cycles[~right] = -1
+    cycles = results.cycles
+    cycles[results.timed_out] = -1
 
     for i, c in zip(test_items, cycles):
         i["cycles"] = c
@@ -0,0 +1,23 @@
+"""Shared fixtures for the tests."""
+import pytest
+
+from helpers import EXAMPLE, make_builder
+from metameric.run import read_input_file
+
+
+@pytest.fixture(scope="session")
+def example():
+    """The path to example.csv."""
+    return EXAMPLE
+
+
+@pytest.fixture(scope="session")
+def items():
+    """The items of example.csv."""
+    return read_input_file(EXAMPLE)
+
+
+@pytest.fixture(scope="session")
+def network(items):
+    """The IA model on example.csv. Tests should not change it."""
+    return make_builder().build_model(items)
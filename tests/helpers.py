@@ -0,0 +1,40 @@
+"""Helpers which are shared by the tests."""
+import os
+import numpy as np
+
+from itertools import chain
+from metameric.builder import Builder
+from metameric.prepare.weights import IA_WEIGHTS
+
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                       "example.csv")
+RLA = {k: "global" for k in set(chain.from_iterable(IA_WEIGHTS))}
+RLA["orthography"] = "frequency"
+MAX_CYCLES = 350
+
+
+def make_builder(cls=Builder, weights=IA_WEIGHTS, global_rla=-.05, **kwargs):
+    """Create a builder for the IA model on example.csv."""
+    kwargs.setdefault("step_size", .5)
+    return cls(weights,
+               RLA,
+               global_rla,
+               outputs=("orthography",),
+               monitors=("orthography",),
+               **kwargs)
+
+
+def reaction_times(network, X, **kwargs):
+    """Get the reaction times of a network without a progressbar."""
+    return network.reaction_times(X,
+                                  max_cycles=MAX_CYCLES,
+                                  show_progressbar=False,
+                                  **kwargs)
+
+
+def assert_same_outcome(a, b, atol=0.0):
+    """Check that two reaction time results agree."""
+    assert np.array_equal(a.cycles, b.cycles)
+    assert np.array_equal(a.timed_out, b.timed_out)
+    assert np.allclose(a.activation, b.activation, rtol=0, atol=atol)
@@ -0,0 +1,42 @@
+"""Tests for active-set simulation."""
+import numpy as np
+import pytest
+
+from helpers import make_builder, reaction_times
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_active_set_matches_full(items, dtype):
+    X = items[:200]
+    network = make_builder(dtype=dtype).build_model(items)
+    a = reaction_times(network, X)
+    b = reaction_times(network, X, active_set="orthography")
+    assert network.plan.layers == ("orthography",)
+    assert np.array_equal(a.cycles, b.cycles)
+    assert np.array_equal(a.winner, b.winner)
+    assert np.array_equal(a.timed_out, b.timed_out)
+    error = network.active_set_error
+    assert 0 < error < 1e-3
+    assert np.abs(a.activation - b.activation).max() <= error
+
+    # The network can be used as usual afterwards.
+    c = reaction_times(network, X)
+    assert np.array_equal(a, c)
+
+
+def test_active_set_checks(items):
+    X = items[:1]
+    network = make_builder().build_model(items)
+    for kwargs in ({"tolerance": 1e-6}, {"n_jobs": 2}):
+        with pytest.raises(ValueError):
+            reaction_times(network, X, active_set="orthography", **kwargs)
+    # Not a layer, a static layer, and a layer with a block-diagonal
+    # connection.
+    for layer in ("words", "letters-features", "letters"):
+        with pytest.raises(ValueError):
+            network.compile(layer)
+    mask = np.ones(len(network.layers["orthography"].resting), dtype=bool)
+    mask[0] = False
+    network.set_mask({"orthography": mask})
+    with pytest.raises(ValueError):
+        network.compile("orthography")
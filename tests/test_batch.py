@@ -0,0 +1,40 @@
+"""Tests for simulating batches of items at once."""
+import numpy as np
+
+from metameric.core.record import Final
+
+
+def test_activate_batch_matches_activate(network, items):
+    X = items[:60]
+    single = list(network.activate(X,
+                                   max_cycles=100,
+                                   strict=False,
+                                   show_progressbar=False))
+    batch = list(network.activate_batch(X,
+                                        batch_size=16,
+                                        max_cycles=100,
+                                        strict=False,
+                                        show_progressbar=False))
+    assert len(single) == len(batch)
+    for a, b in zip(single, batch):
+        a, b = np.asarray(a["orthography"]), np.asarray(b["orthography"])
+        assert a.shape == b.shape
+        assert np.array_equal(a, b)
+
+
+def test_activate_batch_record(network, items):
+    X = items[:40]
+    kwargs = dict(max_cycles=100, strict=False, show_progressbar=False)
+    single = list(network.activate(X, record="winner", **kwargs))
+    batch = list(network.activate_batch(X,
+                                        batch_size=8,
+                                        record="winner",
+                                        **kwargs))
+    assert single == batch
+    single = list(network.activate(X, record=Final(), **kwargs))
+    batch = list(network.activate_batch(X,
+                                        batch_size=8,
+                                        record=Final(),
+                                        **kwargs))
+    for a, b in zip(single, batch):
+        assert np.array_equal(a["orthography"], b["orthography"])
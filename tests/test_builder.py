@@ -0,0 +1,57 @@
+"""Tests for building networks."""
+import numpy as np
+import pytest
+
+from helpers import make_builder
+
+
+def _dense(mtr):
+    return mtr.toarray() if hasattr(mtr, "toarray") else np.asarray(mtr)
+
+
+def _expected(builder, network, items, a, b):
+    """Build the weights from a to b one item at a time."""
+    layer_a, layer_b = network.layers[a], network.layers[b]
+    pos, neg = builder.adapted_weights(a, b)
+    mtr = np.full((len(layer_a.resting), len(layer_b.resting)), neg)
+    for item in items:
+        for x in item[a]:
+            for y in item[b]:
+                mtr[layer_a.name2idx[x], layer_b.name2idx[y]] = pos
+    return mtr
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"parametric": True}])
+def test_build_matches_items(items, kwargs):
+    items = items[:300]
+    builder = make_builder(**kwargs)
+    network = builder.build_model(items)
+    slot_layers = builder.slot_layers
+    checked = 0
+    for b, layer in network.layers.items():
+        for src, mtr in zip(layer._from_connections, layer.weights):
+            a = src.name
+            mtr = _dense(mtr)
+            if a not in slot_layers or b not in slot_layers:
+                expected = _expected(builder, network, items, a, b)
+                assert np.allclose(mtr, expected, rtol=0, atol=1e-12)
+                checked += 1
+                continue
+            # Slot layers are only connected within a slot, and all slots
+            # have the same weights.
+            pos, neg = builder.adapted_weights(a, b)
+            slot_a = np.array([x[1] for x in src.node_names])
+            slot_b = np.array([x[1] for x in layer.node_names])
+            assert np.all(mtr[slot_a[:, None] != slot_b[None, :]] == 0)
+            x, y = np.sum(slot_a == 0), np.sum(slot_b == 0)
+            for s in range(1, builder.num_slots[a]):
+                assert np.array_equal(mtr[x * s:x * (s + 1),
+                                          y * s:y * (s + 1)], mtr[:x, :y])
+            for item in items:
+                for u in item[a]:
+                    for v in item[b]:
+                        if u[1] == v[1]:
+                            assert mtr[src.name2idx[u],
+                                       layer.name2idx[v]] == pos
+            assert np.isin(mtr[:x, :y], (pos, neg)).all()
+    assert checked == 3
@@ -0,0 +1,54 @@
+"""Tests for the persistent cache of reaction times."""
+import numpy as np
+
+from metameric.core.cache import ResultCache
+from helpers import make_builder, reaction_times, assert_same_outcome
+
+
+def test_result_cache(items, tmp_path):
+    X = items[:50]
+    network = make_builder().build_model(items)
+    cache = ResultCache(str(tmp_path))
+    uncached = reaction_times(network, X)
+    first = reaction_times(network, X, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 50)
+    second = reaction_times(network, X, cache=cache)
+    assert (cache.hits, cache.misses) == (50, 50)
+    assert_same_outcome(uncached, first)
+    assert_same_outcome(uncached, second)
+    assert np.array_equal(first.winner, second.winner)
+
+
+def test_result_cache_invalidation(items, tmp_path):
+    X = items[:50]
+    network = make_builder().build_model(items)
+    cache = ResultCache(str(tmp_path))
+    reaction_times(network, X, cache=cache)
+    fingerprint = network.fingerprint()
+
+    network.set_params(global_rla=-.1)
+    changed = network.fingerprint()
+    assert changed != fingerprint
+    result = reaction_times(network, X, cache=cache)
+    assert cache.misses == 100
+    assert_same_outcome(result, reaction_times(network, X))
+
+    mask = np.ones(len(network.layers["orthography"].resting), dtype=bool)
+    mask[::2] = False
+    network.set_mask({"orthography": mask})
+    assert network.fingerprint() not in (fingerprint, changed)
+    result = reaction_times(network, X, cache=cache)
+    assert cache.misses == 150
+    assert_same_outcome(result, reaction_times(network, X))
+
+    # Removing the mask returns the network to a state which was cached.
+    network.set_mask(None)
+    assert network.fingerprint() == changed
+    reaction_times(network, X, cache=cache)
+    assert (cache.hits, cache.misses) == (50, 150)
+
+
+def test_result_cache_eviction(network, items, tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    reaction_times(network, items[:100], cache=cache)
+    assert 0 < cache.nbytes <= 1000
@@ -0,0 +1,194 @@
+"""Tests for connections which are not stored as dense matrices."""
+import numpy as np
+import pytest
+
+from metameric.core.connection import (UniformConnection,
+                                       MaskConnection,
+                                       SparseConnection,
+                                       BlockDiagonalConnection,
+                                       make_connection)
+from metameric.core.metric import propagate
+from metameric.prepare.weights import IA_WEIGHTS
+from helpers import make_builder, reaction_times, assert_same_outcome
+
+
+# Different weights for all connections of the IA model.
+WEIGHTS = {("letters", "orthography"): [.2, -.02],
+           ("orthography", "letters"): [.8, -.01],
+           ("orthography", "orthography"): [.01, -.15],
+           ("letters-features", "letters"): [.01, -.1]}
+
+
+def _connections(network, kind):
+    """Get all connections of a kind in a network."""
+    for layer in network.layers.values():
+        for idx, mtr in enumerate(layer.weights):
+            if isinstance(mtr, kind):
+                yield layer, idx, mtr
+
+
+def _densify(network, kind):
+    """Replace all connections of a kind by dense matrices."""
+    connections = list(_connections(network, kind))
+    assert connections
+    for layer, idx, mtr in connections:
+        layer.weights[idx] = mtr.toarray()
+    network.invalidate()
+    return network
+
+
+def _check_kernel(mtr, tol):
+    """Check a connection against its dense matrix."""
+    rng = np.random.RandomState(0)
+    dense = mtr.toarray()
+    assert dense.shape == mtr.shape
+    c = rng.uniform(-.2, 1.0, mtr.shape[0]).astype(mtr.dtype)
+    net = rng.uniform(-1.0, 1.0, mtr.shape[1]).astype(mtr.dtype)
+    expected = net + np.maximum(c, 0).dot(dense)
+    propagate(net, c, mtr)
+    assert np.allclose(net, expected, rtol=tol, atol=tol)
+    assert np.allclose(mtr.dot(c), c.dot(dense), rtol=tol, atol=tol)
+    batch = np.stack([c, c[::-1]])
+    assert np.allclose(mtr.dot(batch), batch.dot(dense), rtol=tol, atol=tol)
+    # The batch kernel gives every row exactly the result of propagate.
+    # The first columns of c and net belong to other layers.
+    c_batch = np.zeros((3, 5 + mtr.shape[0]), dtype=mtr.dtype)
+    c_batch[:, 5:] = [c, c[::-1], -c]
+    net_batch = np.zeros((3, 3 + mtr.shape[1]), dtype=mtr.dtype)
+    src, dest = slice(5, c_batch.shape[1]), slice(3, net_batch.shape[1])
+    mtr.propagate_batch(net_batch, c_batch, dest, src, 2)
+    for idx in range(2):
+        row = np.zeros(mtr.shape[1], dtype=mtr.dtype)
+        propagate(row, c_batch[idx, src], mtr)
+        assert np.array_equal(net_batch[idx, dest], row)
+    assert not net_batch[2].any()
+    assert not net_batch[:, :3].any()
+
+
+@pytest.mark.parametrize("dtype,tol", [(np.float64, 1e-12),
+                                       (np.float32, 1e-5)])
+def test_uniform_kernel(items, dtype, tol):
+    network = make_builder(dtype=dtype).build_model(items)
+    connections = list(_connections(network, UniformConnection))
+    assert connections
+    for _, _, mtr in connections:
+        _check_kernel(mtr, tol)
+
+
+def test_uniform_matches_dense(network, items):
+    X = items[:100]
+    dense = _densify(make_builder().build_model(items), UniformConnection)
+    a = reaction_times(network, X)
+    b = reaction_times(dense, X)
+    assert np.array_equal(a.winner, b.winner)
+    assert_same_outcome(a, b, atol=1e-12)
+
+
+@pytest.mark.parametrize("dtype,tol", [(np.float64, 1e-12),
+                                       (np.float32, 1e-5)])
+def test_mask_kernel(items, dtype, tol):
+    network = make_builder(dtype=dtype, parametric=True).build_model(items)
+    connections = list(_connections(network, MaskConnection))
+    assert connections
+    for _, _, mtr in connections:
+        _check_kernel(mtr, tol)
+        mtr.set_weights(.5, -.25)
+        _check_kernel(mtr, tol)
+
+
+def test_mask_codes():
+    mask = np.array([[0, 1], [2, 7]])
+    with pytest.raises(ValueError):
+        MaskConnection(mask, .5, -.25)
+    with pytest.raises(ValueError):
+        MaskConnection(-mask, .5, -.25)
+    with pytest.raises(ValueError):
+        make_connection("mask", mask.shape, {"pos": .5, "neg": -.25},
+                        {"mask": mask})
+    mtr = MaskConnection(mask.clip(0, 2), .5, -.25)
+    assert np.array_equal(mtr.toarray(), [[0, -.25], [.5, .5]])
+
+
+def test_parametric_matches_dense(network, items):
+    X = items[:100]
+    parametric = make_builder(parametric=True).build_model(items)
+    a = reaction_times(network, X)
+    b = reaction_times(parametric, X)
+    assert np.array_equal(a.winner, b.winner)
+    assert_same_outcome(a, b, atol=1e-12)
+
+
+def test_set_params_matches_rebuild(items):
+    X = items[:100]
+    params = {"global_rla": -.1, "decay_rate": .1, "step_size": .4}
+    network = make_builder(parametric=True).build_model(items)
+    network.set_params(weights=WEIGHTS, **params)
+    rebuilt = make_builder(weights=WEIGHTS,
+                           parametric=True,
+                           **params).build_model(items)
+    assert network.fingerprint() == rebuilt.fingerprint()
+    a = reaction_times(network, X)
+    b = reaction_times(rebuilt, X)
+    assert np.array_equal(a.winner, b.winner)
+    assert_same_outcome(a, b)
+
+    # Changing the parameters back gives the original network.
+    network.set_params(weights=IA_WEIGHTS, global_rla=-.05,
+                       decay_rate=.07, step_size=.5)
+    original = make_builder(parametric=True).build_model(items)
+    assert network.fingerprint() == original.fingerprint()
+
+
+def test_set_params_needs_parametric(items):
+    network = make_builder().build_model(items)
+    with pytest.raises(ValueError):
+        network.set_params(weights={("letters-features", "letters"):
+                                    [.01, -.1]})
+    with pytest.raises(ValueError):
+        network.set_params(step_size=0)
+
+
+@pytest.mark.parametrize("dtype,tol", [(np.float64, 1e-12),
+                                       (np.float32, 1e-5)])
+def test_sparse_kernel(items, dtype, tol):
+    network = make_builder(dtype=dtype).build_model(items)
+    connections = list(_connections(network, SparseConnection))
+    assert connections
+    for _, _, mtr in connections:
+        _check_kernel(mtr, tol)
+
+
+def test_sparse_matches_dense(network, items):
+    # The sparse kernel sums in a different order than the dense kernel, so
+    # that activations can differ by a rounding error.
+    X = items[:100]
+    dense = make_builder(sparse_density=0).build_model(items)
+    assert not list(_connections(dense, SparseConnection))
+    densified = _densify(make_builder().build_model(items), SparseConnection)
+    a = reaction_times(network, X)
+    for other in (dense, densified):
+        b = reaction_times(other, X)
+        assert np.array_equal(a.winner, b.winner)
+        assert_same_outcome(a, b, atol=1e-12)
+
+
+@pytest.mark.parametrize("dtype,tol", [(np.float64, 1e-12),
+                                       (np.float32, 1e-5)])
+def test_block_diagonal_kernel(items, dtype, tol):
+    network = make_builder(dtype=dtype).build_model(items)
+    connections = list(_connections(network, BlockDiagonalConnection))
+    assert connections
+    for _, _, mtr in connections:
+        _check_kernel(mtr, tol)
+        # All slots share a single block.
+        assert mtr.nbytes * 4 <= mtr.toarray().nbytes
+
+
+def test_block_diagonal_matches_dense(network, items):
+    X = items[:100]
+    dense = _densify(make_builder().build_model(items),
+                     BlockDiagonalConnection)
+    a = reaction_times(network, X)
+    b = reaction_times(dense, X)
+    assert np.array_equal(a.winner, b.winner)
+    assert_same_outcome(a, b, atol=1e-12)
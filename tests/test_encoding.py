@@ -0,0 +1,35 @@
+"""Tests for encoded sets of inputs."""
+import numpy as np
+import pytest
+
+from metameric.core.encoding import EncodedSet
+from helpers import reaction_times, assert_same_outcome
+
+
+def test_encoded_set_round_trip(network, items, tmp_path):
+    X = items[:100]
+    encoded = network.encode(X)
+    assert len(encoded) == len(X)
+    path = str(tmp_path / "encoded.npz")
+    encoded.save(path)
+    loaded = EncodedSet.load(path)
+    assert loaded.layers == encoded.layers
+    assert loaded.signatures == encoded.signatures
+    for a, b in zip(encoded, loaded):
+        assert a.keys() == b.keys()
+        for k in a:
+            assert np.array_equal(a[k], b[k])
+
+    plain = reaction_times(network, X)
+    assert_same_outcome(plain, reaction_times(network, encoded))
+    assert_same_outcome(plain, reaction_times(network, loaded))
+    assert_same_outcome(plain[10:20], reaction_times(network, loaded[10:20]))
+
+
+def test_encoded_set_slices(network, items):
+    encoded = network.encode(items[:10])
+    assert len(encoded[3:3]) == 0
+    with pytest.raises(ValueError):
+        encoded[::2]
+    with pytest.raises(IndexError):
+        encoded[10]
@@ -0,0 +1,56 @@
+"""Tests for adding items to a network."""
+import numpy as np
+import pytest
+
+from metameric.builder import IncrementalBuilder
+from metameric.builder.builder import MetaMericError
+from helpers import make_builder, reaction_times
+
+
+def _dense(mtr):
+    return mtr.toarray() if hasattr(mtr, "toarray") else np.asarray(mtr)
+
+
+def _order(a, b):
+    """The positions of the nodes of layer a in layer b."""
+    return np.array([b.name2idx[x] for x in a.node_names], dtype=np.intp)
+
+
+@pytest.mark.parametrize("parametric", [False, True])
+def test_add_items_matches_build(items, parametric):
+    full = make_builder(parametric=parametric).build_model(items)
+    builder = make_builder(IncrementalBuilder, parametric=parametric)
+    network = builder.build_model(items[:1500])
+    builder.add_items(network, items[1500:])
+
+    assert set(network.layers) == set(full.layers)
+    for k, layer in network.layers.items():
+        other = full.layers[k]
+        order = _order(layer, other)
+        assert sorted(layer.node_names) == sorted(other.node_names)
+        assert np.allclose(layer.resting, other.resting[order],
+                           rtol=0, atol=1e-12)
+        for src, mtr in zip(layer._from_connections, layer.weights):
+            idx = other._from_connections.index(full.layers[src.name])
+            src_order = _order(src, full.layers[src.name])
+            expected = _dense(other.weights[idx])[np.ix_(src_order, order)]
+            assert np.array_equal(_dense(mtr), expected)
+
+    X = items[:100]
+    a = reaction_times(full, X)
+    b = reaction_times(network, X)
+    names = full.layers["orthography"].idx2name
+    other = network.layers["orthography"].idx2name
+    assert np.array_equal(a.cycles, b.cycles)
+    assert [names[x] for x in a.winner] == [other[x] for x in b.winner]
+    assert np.allclose(a.activation, b.activation, rtol=0, atol=1e-12)
+
+
+def test_add_items_new_symbols(items):
+    builder = make_builder(IncrementalBuilder)
+    letter = min(x for x, _ in items[0]["letters"] if x != " ")
+    without = [x for x in items
+               if letter not in {y for y, _ in x["letters"]}]
+    network = builder.build_model(without)
+    with pytest.raises(MetaMericError):
+        builder.add_items(network, items)
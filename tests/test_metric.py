@@ -0,0 +1,73 @@
+"""Tests for the kernels which compute the net input of a layer."""
+import numpy as np
+import pytest
+
+from metameric.core.metric import (strength,
+                                   propagate,
+                                   propagate_batch,
+                                   update,
+                                   update_batch)
+
+
+def _reference(net, activations, resting, conn, mtrs, minimum, decay,
+               step_size):
+    for c, mtr in zip(conn, mtrs):
+        net = net + np.maximum(c, 0).dot(mtr)
+    net = np.where(net > 0,
+                   net * (1.0 - activations),
+                   net * (activations - minimum))
+    net -= decay * (activations - resting)
+    return net * step_size
+
+
+@pytest.mark.parametrize("dtype,tol", [(np.float64, 1e-12),
+                                       (np.float32, 1e-5)])
+def test_strength(dtype, tol):
+    rng = np.random.RandomState(0)
+    # Most presynaptic nodes are below 0, and do not send input.
+    conn = [rng.uniform(-.2, .1, (8, n)).astype(dtype) for n in (50, 7)]
+    mtrs = [rng.uniform(-1, 1, (c.shape[1], 30)).astype(dtype) for c in conn]
+    net = rng.uniform(-.1, .1, (8, 30)).astype(dtype)
+    activations = rng.uniform(-.2, 1, (8, 30)).astype(dtype)
+    resting = rng.uniform(-.1, 0, 30).astype(dtype)
+    conn[1][:] = -.1
+    args = (-.2, .07, .5)
+
+    expected = _reference(net, activations, resting, conn, mtrs, *args)
+    for idx in range(8):
+        result = strength(net[idx].copy(),
+                          activations[idx],
+                          resting,
+                          [c[idx] for c in conn],
+                          mtrs,
+                          *args)
+        assert result.dtype == dtype
+        assert np.allclose(result, expected[idx], rtol=tol, atol=tol)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_batch_kernels(dtype):
+    rng = np.random.RandomState(0)
+    # Two layers of 20 and 30 nodes, with a batch of 6 rows of which the
+    # first 4 are updated.
+    src, dest = slice(0, 20), slice(20, 50)
+    mtr = rng.uniform(-1, 1, (20, 30)).astype(dtype)
+    activations = rng.uniform(-.2, 1, (6, 50)).astype(dtype)
+    resting = rng.uniform(-.1, 0, 30).astype(dtype)
+    net = rng.uniform(-.1, .1, (6, 50)).astype(dtype)
+    args = (-.2, .07, .5)
+
+    batch = net.copy()
+    propagate_batch(batch, activations, mtr, dest, src, 4)
+    update_batch(batch, activations, resting, *args, dest, 4)
+    for idx in range(4):
+        row = net[idx].copy()
+        propagate(row[dest], activations[idx, src], mtr)
+        update(row[dest], activations[idx, dest], resting, *args)
+        assert np.array_equal(batch[idx], row)
+    assert np.array_equal(batch[4:], net[4:])
+
+    with pytest.raises(ValueError):
+        propagate_batch(batch, activations, mtr, dest, src, 7)
+    with pytest.raises(ValueError):
+        propagate_batch(batch, activations, mtr, slice(20, 40), src, 4)
@@ -0,0 +1,32 @@
+"""Tests for process-parallel simulation."""
+import numpy as np
+
+from metameric.core.record import TopK
+from helpers import reaction_times, assert_same_outcome
+
+
+def test_parallel_matches_serial(network, items):
+    X = items[:100]
+    serial = reaction_times(network, X)
+    parallel = reaction_times(network, X, n_jobs=2)
+    assert_same_outcome(serial, parallel)
+    assert (serial.winner == parallel.winner).all()
+
+
+def test_parallel_activate_record(network, items):
+    # Items which converge at different cycles come back in order.
+    X = items[:40]
+    kwargs = dict(max_cycles=100, strict=False, show_progressbar=False)
+    serial = list(network.activate(X, record=TopK(3), **kwargs))
+    parallel = list(network.activate(X, record=TopK(3), n_jobs=2, **kwargs))
+    assert len(serial) == len(parallel)
+    lengths = {len(x["orthography"][0]) for x in serial}
+    assert len(lengths) > 1
+    for a, b in zip(serial, parallel):
+        for x, y in zip(a["orthography"], b["orthography"]):
+            assert np.array_equal(x, y)
+
+
+def test_parallel_progressbar(network, items, capsys):
+    network.reaction_times(items[:50], max_cycles=350, n_jobs=2)
+    assert "50/50" in capsys.readouterr().err
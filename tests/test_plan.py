@@ -0,0 +1,152 @@
+"""Tests for compiled execution plans."""
+import numpy as np
+import pytest
+
+from helpers import make_builder
+
+
+def _run(network, X, fold, inputs=None):
+    plan = network.compile()
+    if not fold:
+        plan._fold = lambda: None
+    rt = network.reaction_times(X,
+                                max_cycles=350,
+                                inputs=inputs,
+                                show_progressbar=False)
+    trajectories = list(network.activate(X[:10],
+                                         max_cycles=350,
+                                         strict=False,
+                                         inputs=inputs,
+                                         show_progressbar=False))
+    assert plan._folded == fold
+    return rt, trajectories
+
+
+def _assert_close(a, b):
+    rt_a, trajectories_a = a
+    rt_b, trajectories_b = b
+    assert np.array_equal(rt_a.cycles, rt_b.cycles)
+    assert np.array_equal(rt_a.winner, rt_b.winner)
+    np.testing.assert_allclose(rt_a.activation,
+                               rt_b.activation,
+                               rtol=0,
+                               atol=1e-12)
+    for x, y in zip(trajectories_a, trajectories_b):
+        assert x["orthography"].shape == y["orthography"].shape
+        np.testing.assert_allclose(x["orthography"],
+                                   y["orthography"],
+                                   rtol=0,
+                                   atol=1e-12)
+
+
+@pytest.mark.parametrize("parametric", [False, True])
+def test_fold_matches_unfolded(items, parametric):
+    X = items[:100]
+    network = make_builder(parametric=parametric).build_model(items)
+    _assert_close(_run(network, X, True), _run(network, X, False))
+
+
+def test_fold_other_connection_order(items):
+    # If the static layer is not the first input of a layer, its input is
+    # not folded.
+    X = items[:100]
+    network = make_builder().build_model(items)
+    expected = _run(network, X, False)
+    letters = network.layers["letters"]
+    letters._from_connections.reverse()
+    letters.weights.reverse()
+    network.invalidate()
+    assert not network.compile()._static
+    _assert_close(expected, _run(network, X, False))
+
+
+def test_fold_with_external_input(items):
+    # Layers with external input are not folded.
+    X = items[:100]
+    inputs = ("letters-features", "letters")
+    network = make_builder().build_model(items)
+    _assert_close(_run(network, X, True, inputs),
+                  _run(network, X, False, inputs))
+    plan = network.compile()
+    network.reaction_times(X[:1],
+                           max_cycles=350,
+                           inputs=inputs,
+                           show_progressbar=False)
+    assert len(plan._folded_bound) == len(plan._bound)
+    assert all(x is y for x, y in zip(plan._folded_bound, plan._bound))
+
+
+def _assert_views(network, plan):
+    """Check that the arrays of all layers are views of the plan's state."""
+    state = plan.state
+    for k, sl in state.slices.items():
+        layer = network.layers[k]
+        for name in ("activations", "resting", "ext_input"):
+            x = getattr(layer, name)
+            assert x.base is getattr(state, name)
+            assert np.shares_memory(x, getattr(state, name)[sl])
+
+
+def test_layers_stay_views(items):
+    # Runs only write to the state in place, and never rebind the arrays
+    # of the layers.
+    X = items[:5]
+    network = make_builder().build_model(items)
+    plan = network.compile()
+    _assert_views(network, plan)
+    list(network.activate(X,
+                          max_cycles=50,
+                          strict=False,
+                          show_progressbar=False))
+    _assert_views(network, plan)
+    network.prime(X, items[10:15], max_cycles=50, strict=False)
+    _assert_views(network, plan)
+    network.diagnostic_run(X, max_cycles=5)
+    _assert_views(network, plan)
+
+
+def test_plan_is_reused(items):
+    X = items[:5]
+    network = make_builder().build_model(items)
+    plan = network.compile()
+    operator = plan.operator
+    list(network.activate(X,
+                          max_cycles=50,
+                          strict=False,
+                          show_progressbar=False))
+    assert network.plan is plan
+    network.prime(X, items[10:15], max_cycles=50, strict=False)
+    assert network.plan is plan
+    network.diagnostic_run(X, max_cycles=5)
+    assert network.plan is plan
+    network.reaction_times(X, max_cycles=50, show_progressbar=False)
+    assert network.plan is plan
+    assert plan.operator is operator
+
+
+@pytest.mark.parametrize("change", ["create_layer",
+                                    "connect_layers",
+                                    "set_params",
+                                    "set_mask"])
+def test_changes_drop_plan(items, change):
+    network = make_builder().build_model(items)
+    plan = network.compile()
+    letters = len(network.layers["letters"].resting)
+    words = len(network.layers["orthography"].resting)
+    if change == "create_layer":
+        network.create_layer("extra", np.zeros(3), ["a", "b", "c"])
+    elif change == "connect_layers":
+        network.connect_layers("letters",
+                               "letters",
+                               np.zeros((letters, letters)))
+    elif change == "set_params":
+        network.set_params(global_rla=-.1)
+    else:
+        network.set_mask({"orthography": np.arange(words) % 2 == 0})
+    assert network.plan is None
+
+    network.reaction_times(items[:5], max_cycles=50, show_progressbar=False)
+    assert network.plan is not None and network.plan is not plan
+    _assert_views(network, network.plan)
+    assert len(network.plan.operator.blocks) == \
+        len(plan.operator.blocks) + (change == "connect_layers")
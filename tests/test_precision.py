@@ -0,0 +1,16 @@
+"""Tests for single-precision simulation."""
+import numpy as np
+
+from helpers import make_builder, reaction_times
+
+
+def test_float32_matches_float64(network, items):
+    X = items[:100]
+    single = make_builder(dtype=np.float32).build_model(items)
+    assert all(layer.resting.dtype == np.float32
+               for layer in single.layers.values())
+    a = reaction_times(network, X)
+    b = reaction_times(single, X)
+    assert np.array_equal(a.winner, b.winner)
+    assert np.array_equal(a.cycles, b.cycles)
+    assert np.allclose(a.activation, b.activation, rtol=0, atol=1e-5)
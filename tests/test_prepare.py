@@ -0,0 +1,96 @@
+"""Tests for preparing word lists."""
+import io
+import pytest
+
+from metameric.prepare import process_data, iter_process_data
+from metameric.prepare.data import (iter_input_file,
+                                    read_input_file,
+                                    max_lengths,
+                                    process_and_write,
+                                    write_file)
+
+
+WORDS = ("orthography,frequency,tags\n"
+         "zero,21.45,a b\n"
+         "zest,0.69,c\n"
+         "ab,3,\n")
+ARGS = (("orthography",), ("letters",), ("letters",), ("fourteen",))
+
+
+def _prepare(tmp_path, text, *args, **kwargs):
+    path = tmp_path / "words.csv"
+    path.write_text(text)
+    out = io.StringIO()
+    with open(str(path)) as f:
+        process_and_write(f, out, *(args or ARGS), True, **kwargs)
+    return out.getvalue().splitlines()
+
+
+def _read(tmp_path, text):
+    path = tmp_path / "words.csv"
+    path.write_text(text)
+    with open(str(path)) as f:
+        return read_input_file(f)
+
+
+def test_streaming_matches_process_data(tmp_path):
+    items = _read(tmp_path, WORDS)
+    before = [dict(x) for x in items]
+    expected = process_data(items, *ARGS)
+    # The input items are not changed.
+    assert items == before
+    assert list(iter_process_data(items, *ARGS)) == expected
+    lengths = max_lengths(items, ("orthography",))
+    assert lengths == {"orthography": 4}
+    assert list(iter_process_data(iter(items),
+                                  *ARGS,
+                                  max_length=lengths)) == expected
+    assert list(iter_process_data(iter(items),
+                                  *ARGS,
+                                  max_length=4)) == expected
+
+    out = io.StringIO()
+    write_file(expected, out)
+    assert _prepare(tmp_path, WORDS, schema=False) == \
+        out.getvalue().splitlines()
+
+
+def test_process_and_write(tmp_path):
+    lines = _prepare(tmp_path, WORDS)
+    assert lines[0] == "orthography,frequency,tags,letters,letters-features"
+    assert lines[1] == "#plain,#plain,#plain,#slot:4,#feature:4"
+    # Fields with more than one value are written space-separated.
+    rows = [x.split(",") for x in lines[2:]]
+    assert [x[:4] for x in rows] == [["zero", "21.45", "a b",
+                                      "z-0 e-1 r-2 o-3"],
+                                     ["zest", "0.69", "c",
+                                      "z-0 e-1 s-2 t-3"],
+                                     ["ab", "3", "",
+                                      "a-0 b-1  -2  -3"]]
+    with open(str(tmp_path / "words.csv")) as f:
+        assert len(list(iter_input_file(f))) == 3
+
+
+def test_default_decomposed_name(tmp_path):
+    lines = _prepare(tmp_path, WORDS, ("orthography",), (), (), ())
+    assert lines[0] == "orthography,frequency,tags,orthography-decomposed"
+    assert lines[1] == "#plain,#plain,#plain,#slot:4"
+
+
+def test_max_length(tmp_path):
+    lines = _prepare(tmp_path, WORDS, max_length=6)
+    assert lines[1] == "#plain,#plain,#plain,#slot:6,#feature:6"
+    assert lines[2].split(",")[3] == "z-0 e-1 r-2 o-3  -4  -5"
+    with pytest.raises(ValueError):
+        _prepare(tmp_path, WORDS, max_length=3)
+
+
+def test_iterator_needs_max_length(tmp_path):
+    items = _read(tmp_path, WORDS)
+    with pytest.raises(ValueError):
+        list(iter_process_data(iter(items), *ARGS))
+    # Without padding, no length is needed.
+    result = list(iter_process_data(iter(items),
+                                    *ARGS,
+                                    length_adaptation=False))
+    assert result[2]["letters"] == [("a", 0), ("b", 1)]
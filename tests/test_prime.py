@@ -0,0 +1,36 @@
+"""Tests for priming with cached prefixes."""
+import numpy as np
+
+from metameric.core.state import SnapshotCache
+
+
+def test_prime_cache_matches_uncached(network, items):
+    X = items[:30]
+    # Every prime is shared by ten targets.
+    primes = [items[100 + i % 3] for i in range(len(X))]
+    cached = network.prime(X, primes, max_cycles=100, strict=False)
+    uncached = network.prime(X,
+                             primes,
+                             max_cycles=100,
+                             strict=False,
+                             max_memory=0)
+    assert len(cached) == len(uncached) == len(X)
+    for a, b in zip(cached, uncached):
+        assert a.keys() == b.keys()
+        for k in a:
+            assert np.array_equal(a[k], b[k])
+
+
+def test_snapshot_cache_evicts_least_recently_used():
+    cache = SnapshotCache(10)
+    cache.put("a", 1, 4)
+    cache.put("b", 2, 4)
+    assert cache.get("a") == 1
+    cache.put("c", 3, 4)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.nbytes == 8
+    cache.put("d", 4, 11)
+    assert cache.get("d") is None
+    assert (cache.hits, cache.misses) == (3, 2)
@@ -0,0 +1,25 @@
+"""Tests for the reaction time fast path."""
+import numpy as np
+
+from metameric.core.record import Final
+from helpers import reaction_times
+
+
+def test_reaction_times_match_activate(network, items):
+    X = items[:60]
+    rt = reaction_times(network, X)
+    full = list(network.activate(X,
+                                 max_cycles=350,
+                                 strict=False,
+                                 record=Final(),
+                                 show_progressbar=False))
+    lengths = [len(x["orthography"]) for x in
+               network.activate(X,
+                                max_cycles=350,
+                                strict=False,
+                                show_progressbar=False)]
+    assert np.array_equal(rt.cycles, lengths)
+    final = np.stack([x["orthography"] for x in full])
+    assert np.array_equal(rt.winner, final.argmax(1))
+    assert np.array_equal(rt.activation, final.max(1))
+    assert np.array_equal(rt.timed_out, rt.activation <= .7)
@@ -0,0 +1,51 @@
+"""Tests for the recording policies."""
+import numpy as np
+import pytest
+
+from metameric.core.record import Rows, Full, Every, TopK, Subset, Final
+
+
+def _activate(network, X, record):
+    return list(network.activate(X,
+                                 max_cycles=350,
+                                 strict=False,
+                                 record=record,
+                                 show_progressbar=False))
+
+
+def test_rows_grow():
+    rows = Rows(3, np.float64, 100)
+    assert len(rows.data) == Rows.initial
+    rows[40] = 1
+    assert len(rows.data) == 64
+    rows[70:100] = 2
+    assert len(rows.data) == 100
+    assert np.all(rows.row(40) == 1)
+    assert np.all(rows.head(100)[70:] == 2)
+    with pytest.raises(IndexError):
+        rows[100] = 3
+
+
+def test_recorders_match_full(network, items):
+    X = items[:20]
+    full = _activate(network, X, Full())
+    # Some items run for longer than the initial size of the buffers.
+    assert max(len(x["orthography"]) for x in full) > Rows.initial
+    layer = network.outputs["orthography"]
+    names = [layer.idx2name[i] for i in (0, 5, 3)]
+
+    every = _activate(network, X, Every(4))
+    top = _activate(network, X, TopK(5))
+    subset = _activate(network, X, Subset({"orthography": names}))
+    final = _activate(network, X, Final())
+    columns = [layer.name2idx[x] for x in names]
+
+    for f, e, t, s, n in zip(full, every, top, subset, final):
+        f = f["orthography"]
+        assert np.array_equal(e["orthography"], f[::4])
+        indices, values = t["orthography"]
+        assert indices.shape == values.shape == (len(f), 5)
+        assert np.array_equal(np.take_along_axis(f, indices, 1), values)
+        assert np.array_equal(values[:, 0], f.max(1))
+        assert np.array_equal(s["orthography"], f[:, columns])
+        assert np.array_equal(n["orthography"], f[-1])
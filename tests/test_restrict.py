@@ -0,0 +1,87 @@
+"""Tests for restricting a network to a subset of its items."""
+import numpy as np
+import pytest
+
+from metameric.builder.builder import MetaMericError
+from helpers import make_builder, reaction_times
+
+
+BUILDS = [{}, {"parametric": True}, {"dtype": np.float32}]
+
+
+def _subset(items, size, seed):
+    rng = np.random.RandomState(seed)
+    idx = np.sort(rng.choice(len(items), size, replace=False))
+    return [items[i] for i in idx]
+
+
+@pytest.mark.parametrize("kwargs", BUILDS)
+def test_restrict_matches_build(items, kwargs):
+    builder = make_builder(**kwargs)
+    full = builder.build_model(items)
+    unrestricted = reaction_times(full, items[:50])
+
+    for seed in range(2):
+        subset = _subset(items, 500, seed)
+        X = subset[:50]
+        builder.restrict(full, subset)
+        expected = make_builder(**kwargs).build_model(subset)
+
+        a = reaction_times(full, X)
+        b = reaction_times(expected, X)
+        names = full.layers["orthography"].idx2name
+        other = expected.layers["orthography"].idx2name
+        assert np.array_equal(a.cycles, b.cycles)
+        assert np.array_equal(a.timed_out, b.timed_out)
+        assert [names[x] for x in a.winner] == [other[x] for x in b.winner]
+        assert np.array_equal(a.activation, b.activation)
+
+        # The activations of the nodes of the subset are the same, and all
+        # other nodes stay at the minimum.
+        for k, layer in expected.layers.items():
+            columns = [full.layers[k].name2idx[x] for x in layer.node_names]
+            masked = np.ones(len(full.layers[k].resting), dtype=bool)
+            masked[columns] = False
+            assert np.array_equal(full.layers[k].resting[columns],
+                                  layer.resting)
+            resting = full.layers[k].resting
+            assert np.all(resting[masked] == resting.dtype.type(full.minimum))
+        a = full.activate(X[:10],
+                          max_cycles=350,
+                          strict=False,
+                          show_progressbar=False)
+        b = expected.activate(X[:10],
+                              max_cycles=350,
+                              strict=False,
+                              show_progressbar=False)
+        layer = expected.layers["orthography"]
+        columns = [full.layers["orthography"].name2idx[x]
+                   for x in layer.node_names]
+        for x, y in zip(a, b):
+            assert np.array_equal(x["orthography"][:, columns],
+                                  y["orthography"])
+
+    # Removing the mask gives the results of the whole network.
+    builder.restrict(full, None)
+    assert np.array_equal(reaction_times(full, items[:50]), unrestricted)
+
+
+def test_restrict_slot_mismatch(items):
+    builder = make_builder()
+    full = builder.build_model(items)
+    # The subset only has three slots, the network has four.
+    subset = [dict(x,
+                   letters=[y for y in x["letters"] if y[1] < 3],
+                   **{"letters-features": [y for y in x["letters-features"]
+                                           if y[1] < 3]})
+              for x in items[:100]]
+    with pytest.raises(MetaMericError):
+        builder.restrict(full, subset)
+    assert full.node_mask is None
+
+
+def test_restrict_new_nodes(items):
+    builder = make_builder()
+    full = builder.build_model(items[:1000])
+    with pytest.raises(MetaMericError):
+        builder.restrict(full, items[900:1100])
@@ -0,0 +1,65 @@
+"""Tests for reading input files."""
+import io
+import pytest
+
+from metameric.builder import parse_schema
+from metameric.run import read_input_file, read_schema
+from helpers import make_builder
+
+
+SCHEMA = {"orthography": "plain",
+          "letters": "slot:4",
+          "letters-features": "feature:4"}
+
+
+def _with_schema(example):
+    """The contents of example.csv, with a schema row."""
+    with open(example) as f:
+        header = next(f)
+        rest = f.read()
+    columns = header.strip().split(",")
+    row = ",".join(["#" + SCHEMA.get(x, "plain") for x in columns])
+    return header + row + "\n" + rest
+
+
+def test_read_file_objects(example, items):
+    with open(example) as f:
+        text = f.read()
+    assert read_input_file(io.StringIO(text)) == items
+    assert read_input_file(io.BytesIO(text.encode("utf-8"))) == items
+    with open(example, "rb") as f:
+        assert read_input_file(f) == items
+
+
+def test_read_schema(example, items, tmp_path):
+    text = _with_schema(example)
+    path = tmp_path / "schema.csv"
+    path.write_text(text)
+    expected = dict(SCHEMA, frequency="plain")
+    assert read_schema(str(path)) == expected
+    assert read_schema(example) is None
+
+    f = io.BytesIO(text.encode("utf-8"))
+    f.seek(0)
+    assert read_schema(f) == expected
+    assert f.tell() == 0
+    assert read_input_file(f) == items
+    assert read_input_file(str(path)) == items
+    assert read_input_file(io.StringIO(text)) == items
+
+
+def test_schema_matches_inference(network, items):
+    built = make_builder(schema=SCHEMA).build_model(items)
+    assert built.fingerprint() == network.fingerprint()
+
+
+def test_parse_schema():
+    assert parse_schema({"a": "slot:4", "b": "plain", "c": "feature"}) == \
+        {"a": ("slot", 4), "b": ("plain", None), "c": ("feature", None)}
+    assert parse_schema({"a": ("plain", None)}) == {"a": ("plain", None)}
+    with pytest.raises(ValueError):
+        parse_schema({"a": "letters"})
+    with pytest.raises(ValueError):
+        parse_schema({"a": "plain:3"})
+    with pytest.raises(ValueError):
+        parse_schema({"a": ("plain", 3)})
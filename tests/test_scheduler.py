@@ -0,0 +1,62 @@
+"""Tests for the continuous batching scheduler."""
+import numpy as np
+import pytest
+
+from metameric import Scheduler
+
+
+def test_scheduler_matches_activate(network, items):
+    X = items[:60]
+    single = list(network.activate(X,
+                                   max_cycles=100,
+                                   strict=False,
+                                   show_progressbar=False))
+    scheduler = Scheduler(network, pool_size=8)
+    scheduled = list(scheduler.run(X,
+                                   max_cycles=100,
+                                   strict=False,
+                                   show_progressbar=False,
+                                   record="full"))
+    assert len(single) == len(scheduled)
+    for a, b in zip(single, scheduled):
+        assert np.array_equal(a["orthography"], b["orthography"])
+    assert 0 < scheduler.utilization <= 1
+
+
+def test_scheduler_records_winner(network, items):
+    X = items[:60]
+    single = list(network.activate(X,
+                                   max_cycles=100,
+                                   strict=False,
+                                   show_progressbar=False,
+                                   record="winner"))
+    scheduled = list(Scheduler(network, pool_size=8).run(
+        X,
+        max_cycles=100,
+        strict=False,
+        show_progressbar=False))
+    assert single == scheduled
+
+
+def test_scheduler_reaction_times(network, items):
+    X = items[:60]
+    # Some items time out.
+    kwargs = dict(max_cycles=40, show_progressbar=False)
+    expected = network.reaction_times(X, **kwargs)
+    result = Scheduler(network, pool_size=8).reaction_times(X, **kwargs)
+    assert expected.timed_out.any() and not expected.timed_out.all()
+    assert np.array_equal(result, expected)
+    empty = Scheduler(network).reaction_times([], **kwargs)
+    assert len(empty) == 0
+
+
+def test_scheduler_strict(network, items):
+    with pytest.raises(ValueError):
+        list(Scheduler(network, pool_size=8).run(items[:20],
+                                                 max_cycles=5,
+                                                 show_progressbar=False))
+
+
+def test_scheduler_pool_size():
+    with pytest.raises(ValueError):
+        Scheduler(None, pool_size=0)
@@ -0,0 +1,59 @@
+"""Tests for steady state detection."""
+import numpy as np
+import pytest
+
+from helpers import reaction_times
+
+
+def test_steady_keeps_recognized_items(network, items):
+    X = items[:100]
+    a = reaction_times(network, X)
+    b = reaction_times(network, X, tolerance=1e-6)
+    recognized = ~b.timed_out
+    assert np.array_equal(a.cycles[recognized], b.cycles[recognized])
+    assert np.array_equal(a.winner[recognized], b.winner[recognized])
+    assert not b.steady[recognized].any()
+    assert np.array_equal(a.timed_out, b.timed_out)
+
+
+def test_steady_exact_padding(network, items):
+    # No item reaches this threshold. With a tolerance of 0, an item only
+    # settles at an exact fixed point, which takes about 770 cycles.
+    X = items[:10]
+    kwargs = dict(max_cycles=1000,
+                  threshold=.8,
+                  strict=False,
+                  show_progressbar=False)
+    full = list(network.activate(X, **kwargs))
+    padded = list(network.activate(X, tolerance=0, patience=1, **kwargs))
+    for a, b in zip(full, padded):
+        assert np.array_equal(a["orthography"], b["orthography"])
+
+    a = network.reaction_times(X, max_cycles=1000, threshold=.8,
+                               show_progressbar=False)
+    b = network.reaction_times(X, max_cycles=1000, threshold=.8,
+                               show_progressbar=False, tolerance=0,
+                               patience=1)
+    assert b.steady.all()
+    assert np.array_equal(a.cycles, b.cycles)
+    assert np.array_equal(a.winner, b.winner)
+    assert np.array_equal(a.activation, b.activation)
+    assert np.array_equal(a.timed_out, b.timed_out)
+
+
+def test_steady_approximate_padding(network, items):
+    # A positive tolerance pads with a state which is close to, but not
+    # the same as, the state of a full run.
+    X = items[:30]
+    a = reaction_times(network, X, threshold=.8)
+    b = reaction_times(network, X, threshold=.8, tolerance=1e-6)
+    assert b.steady.all()
+    assert b.timed_out.all()
+    assert np.array_equal(a.cycles, b.cycles)
+    assert np.array_equal(a.winner, b.winner)
+    assert not np.array_equal(a.activation, b.activation)
+
+
+def test_steady_tolerance(network, items):
+    with pytest.raises(ValueError):
+        reaction_times(network, items[:1], tolerance=-1)
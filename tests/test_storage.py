@@ -0,0 +1,61 @@
+"""Tests for saving and loading networks."""
+import numpy as np
+import pytest
+
+from metameric import Network
+from metameric.run import make_run
+from helpers import make_builder, reaction_times
+
+
+@pytest.mark.parametrize("kwargs", [{},
+                                    {"parametric": True},
+                                    {"dtype": np.float32}])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_load(items, kwargs, mmap, tmp_path):
+    X = items[:100]
+    network = make_builder(**kwargs).build_model(items)
+    path = str(tmp_path / "model")
+    network.save(path)
+    loaded = Network.load(path, mmap=mmap)
+    assert loaded.fingerprint() == network.fingerprint()
+    a = reaction_times(network, X)
+    b = reaction_times(loaded, X)
+    assert np.array_equal(a, b)
+
+
+def test_make_run_from_saved_model(example, tmp_path):
+    test_file = str(tmp_path / "test.csv")
+    with open(example) as f:
+        lines = [next(f) for _ in range(31)]
+    with open(test_file, "w") as f:
+        f.writelines(lines)
+
+    def run(items_file, output, **kwargs):
+        make_run(items_file,
+                 test_file,
+                 output,
+                 None,
+                 .7,
+                 "frequency",
+                 ("orthography",),
+                 kwargs.pop("outputs", ("orthography",)),
+                 ("orthography",),
+                 -.05,
+                 .5,
+                 350,
+                 .07,
+                 -.2,
+                 True,
+                 **kwargs)
+        with open(output) as f:
+            return f.read()
+
+    model = str(tmp_path / "model")
+    built = run(example, str(tmp_path / "built.csv"), save_path=model)
+    # The output layers of a loaded model are those it was saved with.
+    loaded = run(None,
+                 str(tmp_path / "loaded.csv"),
+                 outputs=("letters",),
+                 model_path=model)
+    assert built == loaded
+    assert len(built.splitlines()) == 31